@@ -0,0 +1,454 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from fuzzy_match import COUNTRY_ALIASES, FuzzyMatcher, report
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+TRAVEL_ADVISORY_URL = "https://cadataapi.state.gov/api/TravelAdvisories"
+
+# Local exports of the other governments' advisory feeds.
+ADVISORY_DIR = os.path.join(BASE_DIR, "data", "advisories")
+CACHE_DIR = os.path.join(BASE_DIR, "data", "cache", "advisories")
+
+
+
+def level_to_overall(level):
+    """1–4 advisory level -> overall_risk label used in processed.json."""
+    if level == 1:
+        return "low"
+    if level == 2:
+        return "medium"
+    if level in (3, 4):
+        return "high"
+    return "unknown"
+
+
+def normalize_country_name(name):
+    """Normalize an advisory country title for matching."""
+    if not name:
+        return ""
+    name = name.replace("Travel Advisory", "").strip()
+    name = re.sub(r"\s*\([^)]*\)", "", name)
+    name = re.sub(r"^the\s+", "", name, flags=re.IGNORECASE)
+    name = re.sub(r"\s+", " ", name).strip()
+    name = name.lower()
+
+    if "," in name or "&" in name:
+        first_part = name.split(",")[0].split("&")[0].strip()
+        first_part = re.sub(r"\bmainland\b", "", first_part, flags=re.IGNORECASE).strip()
+        first_part = re.sub(r"\bsee summaries\b", "", first_part, flags=re.IGNORECASE).strip()
+        if first_part:
+            name = first_part
+    return name
+
+
+def build_name_index(rest_countries):
+    """{lowercased name or alias: ISO2} for every country in REST Countries."""
+    name_to_code = {}
+    for code, c in rest_countries.items():
+        name_lower = (c["name"] or "").strip().lower()
+        if name_lower:
+            name_to_code[name_lower] = code
+    for alias, code in COUNTRY_ALIASES.items():
+        if code in rest_countries:
+            name_to_code[alias.lower()] = code
+    return name_to_code
+
+
+def country_matcher(rest_countries, namespace):
+    """Fuzzy fallback over REST Countries names (plus aliases) for one source."""
+    candidates = {}
+    for code, c in rest_countries.items():
+        if c["name"]:
+            # Both the full name and the form advisory titles are reduced to,
+            # e.g. "Cocos (Keeling) Islands" and "cocos islands".
+            candidates[c["name"]] = code
+            candidates.setdefault(normalize_country_name(c["name"]), code)
+    return FuzzyMatcher(
+        candidates,
+        regions={code: c.get("region") for code, c in rest_countries.items()},
+        namespace=namespace,
+    )
+
+
+def match_country_code(normalized_name, name_to_code, matcher=None, matches=None):
+    """
+    Exact, then alias-substring, then name-substring match, then (with a
+    matcher) blocked fuzzy matching. None if nothing fits; fuzzy decisions
+    are appended to `matches` for reporting.
+    """
+    code = name_to_code.get(normalized_name)
+    if code:
+        return code
+    for key, val in COUNTRY_ALIASES.items():
+        if normalized_name == key or normalized_name in key or key in normalized_name:
+            return val
+    for key, val in name_to_code.items():
+        if normalized_name in key or key in normalized_name:
+            return val
+    if matcher is None or not normalized_name:
+        return None
+    m = matcher.match(normalized_name)
+    if matches is not None:
+        matches.append(m)
+    return m.code
+
+
+def match_source_country(name, matcher, matches=None):
+    """
+    Whole-name matching for the foreign adapters: the title as given, and
+    only if that doesn't resolve, its normalized form (which drops anything
+    after a comma). Each is tried as an exact name or alias, then fuzzy
+    matched with the matcher's margin. There are no substring rules, so
+    "Congo" or "Congo (Brazzaville)" can't land on DR Congo.
+    """
+    m = None
+    for query in dict.fromkeys([(name or "").strip(), normalize_country_name(name)]):
+        if not query:
+            continue
+        m = matcher.match(query)
+        if m.code:
+            break
+    if m is None:
+        return None
+    if matches is not None and m.method != "exact":
+        matches.append(m)
+    return m.code
+
+
+def fetch_travel_advisories():
+    try:
+        print("Fetching US travel advisory data...")
+        resp = requests.get(TRAVEL_ADVISORY_URL, timeout=20)
+        resp.raise_for_status()
+        data = resp.json()
+        print(f"Got {len(data)} advisory records.")
+        return data
+    except Exception as e:
+        print(f"[WARN] Failed to fetch advisory API: {e}")
+        return []
+
+
+def build_advisory_index(records, rest_countries):
+    """Build an index: {ISO2: {overall, raw, summary, link, level}}."""
+    index = {}
+    name_to_code = build_name_index(rest_countries)
+    matcher = country_matcher(rest_countries, "us_state_dept")
+    matches = []
+
+    for item in records:
+        title = item.get("Title") or ""
+        if not title:
+            continue
+
+        if " - Level" in title:
+            parts = title.split(" - Level")
+            country_name = parts[0].strip()
+            level_part = "Level" + parts[1]  # "Level 4: Do Not Travel"
+        else:
+            continue
+
+        level_num = None
+        for n in ["1", "2", "3", "4"]:
+            if f"Level {n}" in level_part:
+                level_num = int(n)
+                break
+
+        if level_num is None:
+            continue
+
+        code = match_country_code(
+            normalize_country_name(country_name), name_to_code, matcher, matches
+        )
+        if not code:
+            continue
+
+        index[code] = {
+            "raw": level_part.strip(),
+            "overall": level_to_overall(level_num),
+            "summary": item.get("Summary") or "",
+            "link": item.get("Link") or "",
+            "level": level_num,
+        }
+
+    matcher.save()
+    print(f"Built advisory index for {len(index)} countries.")
+    report(matches, "advisories")
+    return index
+
+
+class AdvisoryAdapter:
+    """
+    One government's advisory feed.
+
+    load() returns the raw payload (or None when the source is unavailable)
+    and parse() maps it onto {ISO2: {overall, raw, summary, link, level}}.
+    Bump `version` whenever parse() changes so cached output is rebuilt.
+    """
+
+    name = ""
+    version = 1
+    filename = None
+
+    def __init__(self, path: str = None):
+        self.path = path or (os.path.join(ADVISORY_DIR, self.filename) if self.filename else None)
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return None
+        with open(self.path, "r", encoding="utf-8-sig") as f:
+            return f.read()
+
+    def parse(self, raw, rest_countries) -> dict:
+        raise NotImplementedError
+
+    def _entry(self, level, raw, summary="", link=""):
+        return {
+            "raw": raw,
+            "overall": level_to_overall(level),
+            "summary": summary or "",
+            "link": link or "",
+            "level": level,
+        }
+
+
+class USStateDeptAdapter(AdvisoryAdapter):
+    """US State Department API (records can be passed in pre-fetched)."""
+
+    name = "us_state_dept"
+    version = 2
+
+    def __init__(self, records=None):
+        super().__init__()
+        self.records = records
+
+    def load(self):
+        records = self.records if self.records is not None else fetch_travel_advisories()
+        if not records:
+            raise RuntimeError("no advisory records")
+        return records
+
+    def parse(self, raw, rest_countries):
+        return build_advisory_index(raw, rest_countries)
+
+
+class UKFCDOAdapter(AdvisoryAdapter):
+    """
+    GOV.UK travel advice content export: a JSON list (or {"results": [...]})
+    of country pages carrying `details.alert_status`.
+    """
+
+    name = "uk_fcdo"
+    version = 3
+    filename = "uk_fcdo.json"
+
+    ALERT_LEVELS = {
+        "avoid_all_travel_to_whole_country": 4,
+        "avoid_all_but_essential_travel_to_whole_country": 3,
+        "avoid_all_travel_to_parts": 2,
+        "avoid_all_but_essential_travel_to_parts": 2,
+    }
+
+    def parse(self, raw, rest_countries):
+        data = json.loads(raw)
+        items = data.get("results", []) if isinstance(data, dict) else data
+        matcher = country_matcher(rest_countries, self.name)
+        matches = []
+        index = {}
+        for item in items:
+            details = item.get("details") or {}
+            name = (details.get("country") or {}).get("name") or item.get("country") or ""
+            if not name:
+                name = re.sub(r"\s+travel advice$", "", item.get("title") or "", flags=re.I)
+            code = match_source_country(name, matcher, matches)
+            if not code:
+                continue
+            statuses = details.get("alert_status", item.get("alert_status")) or []
+            level = max((self.ALERT_LEVELS.get(s, 1) for s in statuses), default=1)
+            link = item.get("web_url") or item.get("url") or ""
+            if not link and item.get("base_path"):
+                link = "https://www.gov.uk" + item["base_path"]
+            index[code] = self._entry(
+                level,
+                ", ".join(statuses) or "No FCDO travel warnings",
+                details.get("summary") or item.get("description") or "",
+                link,
+            )
+        matcher.save()
+        report(matches, f"{self.name} advisories")
+        return index
+
+
+class CanadaAdapter(AdvisoryAdapter):
+    """travel.gc.ca open-data export: {"data": {ISO2: {"advisory-state": 0-3, "eng": {...}}}}."""
+
+    name = "ca_travel"
+    filename = "ca_travel.json"
+
+    def parse(self, raw, rest_countries):
+        data = json.loads(raw)
+        index = {}
+        for key, item in (data.get("data") or {}).items():
+            code = (item.get("country-iso") or key or "").upper()
+            if code not in rest_countries:
+                continue
+            try:
+                level = int(item.get("advisory-state")) + 1
+            except (TypeError, ValueError):
+                continue
+            eng = item.get("eng") or {}
+            slug = eng.get("url-slug")
+            index[code] = self._entry(
+                min(max(level, 1), 4),
+                eng.get("advisory-text") or "",
+                eng.get("recent-updates") or "",
+                f"https://travel.gc.ca/destinations/{slug}" if slug else "",
+            )
+        return index
+
+
+class AustraliaAdapter(AdvisoryAdapter):
+    """Smartraveller export CSV: country, advice_level (1–4 or the level wording), summary, url."""
+
+    name = "au_smartraveller"
+    version = 3
+    filename = "au_smartraveller.csv"
+
+    LEVEL_PHRASES = {
+        "do not travel": 4,
+        "reconsider your need to travel": 3,
+        "exercise a high degree of caution": 2,
+        "exercise normal safety precautions": 1,
+    }
+
+    def _level(self, value):
+        value = (value or "").strip().lower()
+        if value and value[0] in "1234":
+            return int(value[0])
+        for phrase, level in self.LEVEL_PHRASES.items():
+            if phrase in value:
+                return level
+        return None
+
+    def parse(self, raw, rest_countries):
+        matcher = country_matcher(rest_countries, self.name)
+        matches = []
+        index = {}
+        for row in csv.DictReader(io.StringIO(raw)):
+            level = self._level(row.get("advice_level"))
+            code = match_source_country(row.get("country"), matcher, matches)
+            if level is None or not code:
+                continue
+            index[code] = self._entry(
+                level, (row.get("advice_level") or "").strip(), row.get("summary"), row.get("url")
+            )
+        matcher.save()
+        report(matches, f"{self.name} advisories")
+        return index
+
+
+FILE_ADAPTERS = [UKFCDOAdapter, CanadaAdapter, AustraliaAdapter]
+
+
+def default_adapters(us_records=None):
+    return [USStateDeptAdapter(us_records)] + [cls() for cls in FILE_ADAPTERS]
+
+
+def _fingerprint(adapter, raw, countries_key) -> str:
+    text = raw if isinstance(raw, str) else json.dumps(raw, sort_keys=True, ensure_ascii=False)
+    h = hashlib.sha256()
+    h.update(f"{adapter.name}:{adapter.version}:{countries_key}\n".encode("utf-8"))
+    h.update(text.encode("utf-8"))
+    return h.hexdigest()
+
+
+def _run_adapter(adapter, rest_countries, countries_key, cache_dir):
+    cache_path = os.path.join(cache_dir, f"{adapter.name}.json")
+    cached = None
+    if os.path.exists(cache_path):
+        with open(cache_path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+
+    try:
+        raw = adapter.load()
+    except Exception as e:
+        print(f"[WARN] {adapter.name}: load failed ({e}); using cached parse.")
+        return cached["index"] if cached else None
+    if raw is None:
+        return None
+
+    key = _fingerprint(adapter, raw, countries_key)
+    if cached and cached.get("key") == key:
+        return cached["index"]
+
+    index = adapter.parse(raw, rest_countries)
+    tmp = cache_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"key": key, "index": index}, f, ensure_ascii=False)
+    os.replace(tmp, cache_path)
+    return index
+
+
+def run_adapters(adapters, rest_countries, cache_dir: str = None, workers: int = None) -> dict:
+    """
+    Load and parse every adapter in parallel: {source name: advisory index}.
+
+    A source's parsed output is cached under data/cache/advisories/ and only
+    re-parsed when its raw payload (or the country list) changes. Sources
+    that are unavailable are left out.
+    """
+    cache_dir = cache_dir or CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    countries_key = hashlib.sha256(
+        "|".join(f"{code}={rest_countries[code]['name']}" for code in sorted(rest_countries)).encode("utf-8")
+    ).hexdigest()
+
+    with ThreadPoolExecutor(max_workers=workers or len(adapters) or 1) as pool:
+        futures = {
+            a.name: pool.submit(_run_adapter, a, rest_countries, countries_key, cache_dir)
+            for a in adapters
+        }
+        indexes = {}
+        for name, fut in futures.items():
+            try:
+                index = fut.result()
+            except Exception as e:
+                print(f"[WARN] {name}: parse failed: {e}")
+                continue
+            if index is not None:
+                indexes[name] = index
+    return indexes
+
+
+def consensus_levels(indexes: dict) -> dict:
+    """
+    Per-country consensus across sources: {ISO2: {level, overall, sources, spread}}.
+
+    The consensus level is the median of the sources' 1–4 levels; with an
+    even number of sources the higher (more cautious) middle value wins.
+    """
+    per_code = {}
+    for source, index in indexes.items():
+        for code, entry in index.items():
+            if entry.get("level"):
+                per_code.setdefault(code, {})[source] = int(entry["level"])
+
+    out = {}
+    for code, sources in per_code.items():
+        levels = sorted(sources.values())
+        level = levels[len(levels) // 2]
+        out[code] = {
+            "level": level,
+            "overall": level_to_overall(level),
+            "sources": dict(sorted(sources.items())),
+            "spread": levels[-1] - levels[0],
+        }
+    return out
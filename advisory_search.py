@@ -0,0 +1,246 @@
+import argparse
+import math
+import os
+import re
+import time
+from collections import Counter
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+INDEX_PATH = os.path.join(BASE_DIR, "data", "advisory_index.npz")
+
+# BM25 parameters (standard defaults).
+K1 = 1.2
+B = 0.75
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have",
+    "in", "is", "it", "its", "of", "on", "or", "that", "the", "their", "there",
+    "this", "to", "was", "were", "will", "with",
+}
+OPERATORS = {"AND", "OR", "NOT", "(", ")"}
+
+
+def tokenize(text: str):
+    """Lowercase word tokens without stopwords (advisory text is already de-HTML'd)."""
+    return [t for t in re.findall(r"[a-z0-9]+", (text or "").lower()) if t not in STOPWORDS]
+
+
+class AdvisoryIndexBuilder:
+    """Collects one document per country while build_country_safety streams records."""
+
+    def __init__(self):
+        self.codes = []
+        self.names = []
+        self.regions = []
+        self.risks = []
+        self.lengths = []
+        self.postings = {}
+
+    def add(self, code: str, text: str, name: str = "", region: str = "", overall_risk: str = ""):
+        tokens = tokenize(text)
+        if not tokens:
+            return
+        doc = len(self.codes)
+        self.codes.append(code)
+        self.names.append(name or code)
+        self.regions.append(region or "")
+        self.risks.append(overall_risk or "")
+        self.lengths.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            self.postings.setdefault(term, []).append((doc, tf))
+
+    def build(self) -> "AdvisorySearchIndex":
+        terms = sorted(self.postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        docs, tfs = [], []
+        for i, term in enumerate(terms):
+            plist = self.postings[term]
+            offsets[i + 1] = offsets[i] + len(plist)
+            docs.extend(d for d, _ in plist)
+            tfs.extend(tf for _, tf in plist)
+        return AdvisorySearchIndex(
+            terms=np.array(terms, dtype=str),
+            offsets=offsets,
+            docs=np.array(docs, dtype=np.int32),
+            tfs=np.array(tfs, dtype=np.uint16),
+            codes=np.array(self.codes, dtype=str),
+            names=np.array(self.names, dtype=str),
+            regions=np.array(self.regions, dtype=str),
+            risks=np.array(self.risks, dtype=str),
+            lengths=np.array(self.lengths, dtype=np.int32),
+        )
+
+
+class AdvisorySearchIndex:
+    """
+    BM25-ranked inverted index over every country's advisory text.
+
+    Stored as flat arrays (sorted vocabulary, CSR-style postings of doc ids and
+    term frequencies) so it saves to one compressed .npz and loads without
+    rebuilding. Queries support AND / OR / NOT and parentheses; adjacent bare
+    terms are ANDed.
+    """
+
+    def __init__(self, terms, offsets, docs, tfs, codes, names, regions, risks, lengths):
+        self.terms = terms
+        self.offsets = offsets
+        self.docs = docs
+        self.tfs = tfs
+        self.codes = codes
+        self.names = names
+        self.regions = regions
+        self.risks = risks
+        self.lengths = lengths
+        self.n_docs = len(codes)
+        self.avgdl = float(lengths.mean()) if len(lengths) else 0.0
+        self._norm = K1 * (1 - B + B * lengths / self.avgdl) if self.avgdl else np.ones(len(lengths))
+
+    def save(self, path: str = None) -> str:
+        path = path or INDEX_PATH
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.savez_compressed(
+            path,
+            terms=self.terms,
+            offsets=self.offsets,
+            docs=self.docs,
+            tfs=self.tfs,
+            codes=self.codes,
+            names=self.names,
+            regions=self.regions,
+            risks=self.risks,
+            lengths=self.lengths,
+        )
+        return path
+
+    @classmethod
+    def load(cls, path: str = None):
+        with np.load(path or INDEX_PATH, allow_pickle=False) as data:
+            return cls(**{k: data[k] for k in data.files})
+
+    def _postings(self, term: str):
+        i = int(np.searchsorted(self.terms, term))
+        if i >= len(self.terms) or self.terms[i] != term:
+            return np.array([], dtype=np.int32), np.array([], dtype=np.uint16)
+        lo, hi = self.offsets[i], self.offsets[i + 1]
+        return self.docs[lo:hi], self.tfs[lo:hi]
+
+    def term_scores(self, term: str) -> np.ndarray:
+        """Dense BM25 contribution of one term to every document (0 where absent)."""
+        docs, tfs = self._postings(term)
+        scores = np.zeros(self.n_docs)
+        if len(docs):
+            idf = math.log(1 + (self.n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            tf = tfs.astype(float)
+            scores[docs] = idf * tf * (K1 + 1) / (tf + self._norm[docs])
+        return scores
+
+    def _parse(self, query: str):
+        """
+        Recursive-descent parse into (match mask, positive terms).
+        Precedence: NOT > AND (explicit or implicit) > OR.
+        """
+        tokens = re.findall(r"\(|\)|[^\s()]+", query)
+        pos = 0
+
+        def peek():
+            return tokens[pos] if pos < len(tokens) else None
+
+        def take():
+            nonlocal pos
+            pos += 1
+            return tokens[pos - 1]
+
+        def atom():
+            tok = peek()
+            if tok is None:
+                return np.ones(self.n_docs, dtype=bool), []
+            if tok == "NOT":
+                take()
+                mask, _ = atom()
+                return ~mask, []
+            if tok == "(":
+                take()
+                result = expr()
+                if peek() == ")":
+                    take()
+                return result
+            take()
+            words = tokenize(tok)
+            mask = np.ones(self.n_docs, dtype=bool)
+            for w in words:
+                hit = np.zeros(self.n_docs, dtype=bool)
+                hit[self._postings(w)[0]] = True
+                mask &= hit
+            return mask, words
+
+        def conj():
+            mask, terms = atom()
+            while peek() is not None and peek() not in {"OR", ")"}:
+                if peek() == "AND":
+                    take()
+                m, t = atom()
+                mask, terms = mask & m, terms + t
+            return mask, terms
+
+        def expr():
+            mask, terms = conj()
+            while peek() == "OR":
+                take()
+                m, t = conj()
+                mask, terms = mask | m, terms + t
+            return mask, terms
+
+        return expr()
+
+    def search(self, query: str, k: int = 10, region=None, overall_risk=None):
+        """
+        Ranked matches for a boolean query, optionally restricted to regions
+        and overall_risk levels (a string or a list of strings each).
+        """
+        mask, terms = self._parse(query)
+        if region is not None:
+            mask &= np.isin(self.regions, [region] if isinstance(region, str) else list(region))
+        if overall_risk is not None:
+            risks = [overall_risk] if isinstance(overall_risk, str) else list(overall_risk)
+            mask &= np.isin(self.risks, risks)
+
+        scores = np.zeros(self.n_docs)
+        for term in set(terms):
+            scores += self.term_scores(term)
+
+        hits = np.flatnonzero(mask)
+        order = hits[np.lexsort((self.codes[hits], -scores[hits]))][:k]
+        return [
+            {
+                "code": str(self.codes[i]),
+                "name": str(self.names[i]),
+                "region": str(self.regions[i]),
+                "overall_risk": str(self.risks[i]),
+                "score": round(float(scores[i]), 4),
+            }
+            for i in order
+        ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Full-text search over advisory text.")
+    parser.add_argument("query", help='e.g. "kidnapping AND border", "terrorism OR unrest NOT capital"')
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--region", action="append")
+    parser.add_argument("--risk", action="append", help="overall_risk: low / medium / high / unknown")
+    args = parser.parse_args(argv)
+
+    index = AdvisorySearchIndex.load()
+    start = time.perf_counter()
+    results = index.search(args.query, k=args.k, region=args.region, overall_risk=args.risk)
+    elapsed = (time.perf_counter() - start) * 1000
+    for r in results:
+        print(f"{r['score']:8.3f}  {r['code']}  {r['name']:<28} {r['region']:<10} {r['overall_risk']}")
+    print(f"{len(results)} results in {elapsed:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+import json
+import os
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CUBE_PATH = os.path.join(BASE_DIR, "results", "aggregate_cube.json")
+
+DIMENSIONS = ["region", "subregion", "risk_tier", "overall_risk"]
+MEASURES = [
+    "TSI",
+    "homicide_rate",
+    "gpi_score",
+    "advisory_level",
+    "population",
+    "crime_score",
+    "political_score",
+    "health_score",
+    "natural_disaster_score",
+]
+# Correlations are only materialized for cells with enough members to mean anything.
+CORR_MIN_COUNT = 10
+
+ALL = "*"
+MISSING = "Unknown"
+
+
+def cube_rows(df_model: pd.DataFrame, safety: dict = None) -> pd.DataFrame:
+    """
+    One row per country with the cube dimensions and measures.
+
+    overall_risk and the 1–5 risk scores come from processed.json; everything
+    else from the results frame.
+    """
+    safety = safety or {}
+    rows = df_model.drop_duplicates(subset=["code_2"]).set_index("code_2")
+    out = pd.DataFrame(index=rows.index)
+    for dim in ["region", "subregion", "risk_tier"]:
+        out[dim] = rows[dim] if dim in rows.columns else None
+    out["overall_risk"] = [
+        (safety.get(code) or {}).get("overall_risk") for code in rows.index
+    ]
+    for col in ["TSI", "homicide_rate", "gpi_score", "advisory_level", "population"]:
+        out[col] = pd.to_numeric(rows[col], errors="coerce") if col in rows.columns else np.nan
+    for key in ["crime", "political", "health", "natural_disaster"]:
+        out[f"{key}_score"] = [
+            ((safety.get(code) or {}).get("risk_scores") or {}).get(key)
+            for code in rows.index
+        ]
+        out[f"{key}_score"] = pd.to_numeric(out[f"{key}_score"], errors="coerce")
+
+    for dim in DIMENSIONS:
+        out[dim] = out[dim].astype(object).where(out[dim].notna() & (out[dim] != ""), MISSING)
+    out.index.name = "code"
+    return out
+
+
+def _cell_stats(members: pd.DataFrame) -> dict:
+    n = len(members)
+    values = members[MEASURES].to_numpy(dtype=float)
+    present = ~np.isnan(values)
+    counts = present.sum(axis=0)
+
+    stats = {}
+    for j, measure in enumerate(MEASURES):
+        col = values[present[:, j], j]
+        c = int(counts[j])
+        stats[measure] = {
+            "count": c,
+            "sum": float(col.sum()) if c else None,
+            "mean": float(col.mean()) if c else None,
+            "median": float(np.median(col)) if c else None,
+            "std": float(col.std(ddof=1)) if c > 1 else None,
+            "coverage": c / n if n else 0.0,
+        }
+
+    cell = {"n": n, "codes": sorted(members.index.tolist()), "measures": stats}
+    if n >= CORR_MIN_COUNT:
+        corr = members[MEASURES].corr()
+        cell["corr"] = {
+            a: {b: (None if pd.isna(v) else round(float(v), 4)) for b, v in row.items()}
+            for a, row in corr.to_dict(orient="index").items()
+        }
+    return cell
+
+
+def _cell_key(grouping, values) -> str:
+    """Stable string key: "region=Europe|subregion=*|risk_tier=*|overall_risk=*"."""
+    parts = []
+    for dim in DIMENSIONS:
+        parts.append(f"{dim}={values[dim] if dim in grouping else ALL}")
+    return "|".join(parts)
+
+
+class AggregateCube:
+    """
+    Region × subregion × risk_tier × overall_risk cube with every rollup
+    (all 16 grouping sets) materialized.
+
+    Each cell carries count/sum/mean/median/std/coverage per measure, and the
+    correlation matrix for larger cells. The per-country rows are kept with
+    the cube so single-country changes only recompute the cells they touch.
+    """
+
+    GROUPINGS = [
+        tuple(g) for r in range(len(DIMENSIONS) + 1) for g in combinations(DIMENSIONS, r)
+    ]
+
+    def __init__(self, rows: pd.DataFrame, cells: dict = None):
+        # Rows stay sorted by code so full builds and incremental updates sum
+        # members in the same order and produce identical cells.
+        self.rows = rows.sort_index()
+        self.cells = cells if cells is not None else self._build_all()
+
+    @classmethod
+    def build(cls, df_model: pd.DataFrame, safety: dict = None):
+        return cls(cube_rows(df_model, safety))
+
+    def _build_all(self) -> dict:
+        cells = {}
+        for grouping in self.GROUPINGS:
+            if not grouping:
+                cells[_cell_key(grouping, {})] = _cell_stats(self.rows)
+                continue
+            for values, members in self.rows.groupby(list(grouping), sort=True):
+                values = values if isinstance(values, tuple) else (values,)
+                cells[_cell_key(grouping, dict(zip(grouping, values)))] = _cell_stats(members)
+        return cells
+
+    def cell(self, **dims):
+        """
+        Look up one precomputed cell, e.g. cell(region="Europe") or
+        cell(region="Asia", risk_tier="Safe"). Omitted dimensions are rolled up.
+        """
+        unknown = set(dims) - set(DIMENSIONS)
+        if unknown:
+            raise KeyError(f"Unknown dimensions: {sorted(unknown)}")
+        grouping = tuple(d for d in DIMENSIONS if d in dims)
+        return self.cells.get(_cell_key(grouping, dims))
+
+    def slice(self, *group_by: str) -> pd.DataFrame:
+        """Flat table of all cells for one grouping set, one row per cell."""
+        grouping = tuple(d for d in DIMENSIONS if d in group_by)
+        records = []
+        for key, cell in self.cells.items():
+            values = dict(part.split("=", 1) for part in key.split("|"))
+            if tuple(d for d in DIMENSIONS if values[d] != ALL) != grouping:
+                continue
+            row = {d: values[d] for d in grouping}
+            row["n"] = cell["n"]
+            for measure, s in cell["measures"].items():
+                for stat in ("mean", "median", "std", "coverage"):
+                    row[f"{measure}_{stat}"] = s[stat]
+            records.append(row)
+        return pd.DataFrame(records)
+
+    def update(self, changed: pd.DataFrame, removed=()):
+        """
+        Apply changed country rows (cube_rows() layout, indexed by code) and
+        removals, recomputing only the cells those countries belong to before
+        and after the change. Returns the set of touched cell keys.
+        """
+        removed = [c for c in removed if c in self.rows.index]
+        touched_codes = list(changed.index) + removed
+        old = self.rows.loc[self.rows.index.intersection(touched_codes)]
+
+        rows = self.rows.drop(index=removed)
+        rows = pd.concat([rows.drop(index=rows.index.intersection(changed.index)), changed])
+        self.rows = rows.sort_index()
+
+        dirty = set()
+        for frame in (old, changed):
+            for _, rec in frame[DIMENSIONS].iterrows():
+                for grouping in self.GROUPINGS:
+                    dirty.add((grouping, tuple(rec[d] for d in grouping)))
+
+        keys = set()
+        for grouping, values in dirty:
+            mask = np.ones(len(self.rows), dtype=bool)
+            for dim, value in zip(grouping, values):
+                mask &= (self.rows[dim] == value).to_numpy()
+            key = _cell_key(grouping, dict(zip(grouping, values)))
+            keys.add(key)
+            if mask.any():
+                self.cells[key] = _cell_stats(self.rows[mask])
+            else:
+                self.cells.pop(key, None)
+        return keys
+
+    def save(self, path: str = None) -> str:
+        path = path or CUBE_PATH
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        rows = self.rows.reset_index()
+        data = {
+            "dimensions": DIMENSIONS,
+            "measures": MEASURES,
+            "rows": json.loads(rows.to_json(orient="records")),
+            "cells": self.cells,
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        return path
+
+    @classmethod
+    def load(cls, path: str = None):
+        with open(path or CUBE_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        rows = pd.DataFrame(data["rows"])
+        if rows.empty:
+            rows = pd.DataFrame(columns=["code"] + DIMENSIONS + MEASURES)
+        rows = rows.set_index("code")
+        for measure in MEASURES:
+            rows[measure] = pd.to_numeric(rows[measure], errors="coerce")
+        return cls(rows, data["cells"])
+
+
+if __name__ == "__main__":
+    cube = AggregateCube.load()
+    print(cube.slice("region")[["region", "n", "TSI_mean", "homicide_rate_coverage"]].to_string(index=False))
@@ -0,0 +1,277 @@
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from fuzzy_match import FuzzyMatcher
+from processed_store import open_processed
+from run_full_analysis import normalize_name
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+ANNOTATION_COLUMNS = ["ts_code", "TSI", "risk_tier", "overall_risk", "advisory_level"]
+
+_LOOKUP = None
+
+
+class CountryLookup:
+    """
+    Country key -> annotation row, built once from the pipeline outputs.
+
+    Keys may be ISO2 codes, ISO3 codes or country names in any spelling that
+    normalize_name() reduces to the REST Countries common name. Names that
+    still miss go through the blocked fuzzy matcher (aliases, typos).
+    """
+
+    def __init__(self, df_final: pd.DataFrame, safety: dict = None):
+        safety = safety or {}
+        df = df_final.drop_duplicates(subset=["code_2"]).reset_index(drop=True)
+        self.codes = df["code_2"].astype(str).str.upper().tolist()
+        self.values = pd.DataFrame(
+            {
+                "ts_code": self.codes,
+                "TSI": pd.to_numeric(df["TSI"], errors="coerce"),
+                "risk_tier": df["risk_tier"],
+                "overall_risk": [
+                    (safety.get(c) or {}).get("overall_risk") for c in self.codes
+                ],
+                "advisory_level": (
+                    pd.to_numeric(df["advisory_level"], errors="coerce")
+                    if "advisory_level" in df.columns
+                    else np.nan
+                ),
+            }
+        )
+
+        self._by_key = {}
+        for row, code in enumerate(self.codes):
+            self._by_key[code] = row
+            code_3 = str(df.at[row, "code_3"]).upper() if "code_3" in df.columns else ""
+            if code_3:
+                self._by_key.setdefault(code_3, row)
+        names = df["name_norm"] if "name_norm" in df.columns else df["country"].map(normalize_name)
+        for row, name in enumerate(names):
+            if name:
+                self._by_key.setdefault(str(name), row)
+        for code, rec in safety.items():
+            row = self._by_key.get(code)
+            if row is not None and rec.get("name"):
+                self._by_key.setdefault(normalize_name(rec["name"]), row)
+
+        self._matcher = None
+        self._sent = set()
+        self._resolve_cached = lru_cache(maxsize=200_000)(self._resolve_key)
+
+    @classmethod
+    def from_outputs(cls, results_csv: str = None, processed_json: str = None):
+        results_csv = results_csv or os.path.join(
+            BASE_DIR, "results", "TravelSafe_Final_Analysis.csv"
+        )
+        processed_json = processed_json or os.path.join(BASE_DIR, "data", "processed.json")
+        df = pd.read_csv(results_csv, keep_default_na=False, na_values=[""])
+        safety = open_processed(processed_json)
+        return cls(df, safety)
+
+    def resolve(self, key) -> int:
+        """Row index for a raw key, or -1. Results are memoized per process."""
+        return self._resolve_cached(key if isinstance(key, str) else str(key))
+
+    def _resolve_key(self, key: str) -> int:
+        raw = key.strip()
+        if not raw or raw.lower() == "nan":
+            return -1
+        upper = raw.upper()
+        if len(upper) in (2, 3) and upper in self._by_key:
+            return self._by_key[upper]
+        row = self._by_key.get(normalize_name(raw))
+        if row is not None:
+            return row
+        code = self.matcher.match(raw).code
+        return self._by_key[code] if code else -1
+
+    @property
+    def matcher(self) -> FuzzyMatcher:
+        """Fuzzy matcher over the name keys, built on first use."""
+        if self._matcher is None:
+            self._matcher = FuzzyMatcher(
+                {k: self.codes[r] for k, r in self._by_key.items() if len(k) > 3},
+                namespace="annotate",
+            )
+            self._sent = set(self._matcher.decisions)
+        return self._matcher
+
+    def new_decisions(self) -> dict:
+        """Fuzzy decisions made since the last call (for a worker to hand back)."""
+        if self._matcher is None:
+            return {}
+        fresh = {k: v for k, v in self._matcher.decisions.items() if k not in self._sent}
+        self._sent.update(fresh)
+        return fresh
+
+    def annotate(self, chunk: pd.DataFrame, key_col: str, save: bool = True) -> pd.DataFrame:
+        """
+        Append annotation columns to a chunk.
+
+        Only the distinct keys in the chunk are resolved; rows are then
+        filled with a single vectorized take. With save=False, new fuzzy
+        decisions are kept in memory (see new_decisions).
+        """
+        keys = chunk[key_col].astype(object)
+        inverse, uniques = pd.factorize(keys, use_na_sentinel=False)
+        rows = np.fromiter((self.resolve(k) for k in uniques), dtype=np.int64, count=len(uniques))
+        rows = rows[inverse]
+        if save and self._matcher is not None:
+            self._matcher.save()
+
+        found = rows >= 0
+        picked = self.values.take(np.where(found, rows, 0)).reset_index(drop=True)
+        picked.loc[~found, :] = None
+
+        out = chunk.reset_index(drop=True).copy()
+        for col in ANNOTATION_COLUMNS:
+            out[col] = picked[col].to_numpy()
+        return out
+
+
+def _init_worker(results_csv, processed_json):
+    global _LOOKUP
+    _LOOKUP = CountryLookup.from_outputs(results_csv, processed_json)
+
+
+def _annotate_in_worker(args):
+    """Annotate a chunk; new fuzzy decisions go back to the parent, which saves them once."""
+    chunk, key_col = args
+    out = _LOOKUP.annotate(chunk, key_col, save=False)
+    return out, _LOOKUP.new_decisions()
+
+
+def _iter_chunks(path: str, chunksize: int):
+    """Yield DataFrame chunks from a CSV or Parquet file."""
+    if path.lower().endswith((".parquet", ".pq")):
+        try:
+            import pyarrow.parquet as pq
+        except Exception as e:
+            raise RuntimeError(
+                "Missing dependency 'pyarrow'. Install with: pip install pyarrow"
+            ) from e
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(
+            path, chunksize=chunksize, dtype=str, keep_default_na=False, na_values=[""]
+        )
+
+
+class _ChunkWriter:
+    """Incremental CSV or Parquet writer (format picked from the output extension)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.parquet = path.lower().endswith((".parquet", ".pq"))
+        self._writer = None
+        self._fh = None
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def write(self, df: pd.DataFrame):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table.cast(self._writer.schema))
+        else:
+            first = self._fh is None
+            if first:
+                self._fh = open(self.path, "w", encoding="utf-8", newline="")
+            df.to_csv(self._fh, index=False, header=first)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self._fh is not None:
+            self._fh.close()
+
+
+def annotate_file(input_path: str, output_path: str, key_col: str,
+                  chunksize: int = 500_000, workers: int = None,
+                  results_csv: str = None, processed_json: str = None) -> dict:
+    """
+    Stream input_path through the country lookup and write annotated rows.
+
+    With workers > 1, chunks are annotated in a process pool; at most
+    2 * workers chunks are in flight so memory stays bounded, and output
+    order matches input order. Workers hand their fuzzy decisions back and
+    the parent writes the "annotate" cache once, at the end.
+    """
+    workers = workers if workers is not None else max(1, (os.cpu_count() or 2) - 1)
+    writer = _ChunkWriter(output_path)
+    stats = {"rows": 0, "matched": 0, "chunks": 0}
+
+    decisions = {}
+
+    def record(df, new_decisions=None):
+        decisions.update(new_decisions or {})
+        writer.write(df)
+        stats["rows"] += len(df)
+        stats["matched"] += int(df["ts_code"].notna().sum())
+        stats["chunks"] += 1
+
+    try:
+        if workers <= 1:
+            lookup = CountryLookup.from_outputs(results_csv, processed_json)
+            for chunk in _iter_chunks(input_path, chunksize):
+                record(lookup.annotate(chunk, key_col))
+        else:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(results_csv, processed_json),
+            ) as pool:
+                pending = deque()
+                for chunk in _iter_chunks(input_path, chunksize):
+                    pending.append(pool.submit(_annotate_in_worker, (chunk, key_col)))
+                    if len(pending) >= 2 * workers:
+                        record(*pending.popleft().result())
+                while pending:
+                    record(*pending.popleft().result())
+            if decisions:
+                matcher = CountryLookup.from_outputs(results_csv, processed_json).matcher
+                matcher.update(decisions)
+                matcher.save()
+    finally:
+        writer.close()
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Append TSI, risk tier, overall risk and advisory level to a large CSV/Parquet file."
+    )
+    parser.add_argument("input", help="Input .csv or .parquet file")
+    parser.add_argument("output", help="Output .csv or .parquet file")
+    parser.add_argument("--key", required=True, help="Column holding country name / ISO2 / ISO3")
+    parser.add_argument("--chunksize", type=int, default=500_000)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    stats = annotate_file(
+        args.input, args.output, args.key, chunksize=args.chunksize, workers=args.workers
+    )
+    elapsed = time.perf_counter() - start
+    pct = stats["matched"] / stats["rows"] * 100 if stats["rows"] else 0.0
+    print(
+        f"✓ Annotated {stats['rows']} rows in {stats['chunks']} chunks "
+        f"({pct:.1f}% matched) in {elapsed:.1f}s. Saved to {args.output}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,422 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import fuzzy_match
+from advisories import build_advisory_index
+from run_full_analysis import assign_risk_tiers, compute_tsi, merge_sources, normalize_name
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Timings are machine-specific, so the baseline is recorded locally
+# (--update-baseline) and not committed.
+BASELINE_PATH = os.path.join(BASE_DIR, "results", "benchmark_baseline.json")
+
+# 1x is roughly today's input: ~250 countries.
+BASE_COUNTRIES = 250
+DEFAULT_SCALES = [1, 100]
+
+# A stage regresses when it is this much slower / bigger than its baseline.
+# The absolute slack keeps millisecond-sized stages from failing on noise.
+TIME_TOLERANCE = 0.5
+TIME_SLACK_SECONDS = 0.02
+MEMORY_TOLERANCE = 0.25
+MEMORY_SLACK_MB = 1.0
+
+REGIONS = {
+    "Africa": ["Northern Africa", "Western Africa", "Eastern Africa", "Southern Africa"],
+    "Americas": ["South America", "Caribbean", "Central America", "North America"],
+    "Asia": ["Western Asia", "Southern Asia", "South-Eastern Asia", "Eastern Asia"],
+    "Europe": ["Northern Europe", "Western Europe", "Southern Europe", "Eastern Europe"],
+    "Oceania": ["Polynesia", "Melanesia", "Micronesia", "Australia and New Zealand"],
+}
+
+SYLLABLES = [c + v for c in "bdfgklmnprstvz" for v in "aeiou"]
+ENDINGS = ["", "a", "ia", "land", "stan", "ova", "ar", "ine"]
+ACCENTS = str.maketrans({"a": "á", "e": "é", "o": "ô", "u": "ü", "i": "í"})
+ADVISORY_LABELS = {
+    1: "Exercise Normal Precautions",
+    2: "Exercise Increased Caution",
+    3: "Reconsider Travel",
+    4: "Do Not Travel",
+}
+
+
+def _letters(i: int, width: int) -> str:
+    out = []
+    for _ in range(width):
+        i, r = divmod(i, 26)
+        out.append(chr(65 + r))
+    return "".join(reversed(out))
+
+
+def _country_names(n: int, rng) -> list:
+    """
+    n distinct, pronounceable country names.
+
+    Each name spells a distinct number in base len(SYLLABLES) with two-letter
+    syllables, so names are unique by construction; the numbers are drawn
+    sparsely from the whole range so neighbouring names don't share prefixes.
+    Endings and multi-word forms are layered on top in roughly the
+    proportions real country lists have.
+    """
+    digits = 2
+    while len(SYLLABLES) ** digits < 20 * n:
+        digits += 1
+    names = []
+    for i in rng.choice(len(SYLLABLES) ** digits, size=n, replace=False):
+        parts = []
+        for _ in range(digits):
+            i, r = divmod(int(i), len(SYLLABLES))
+            parts.append(SYLLABLES[r])
+        stem = "".join(parts)
+        name = (stem + ENDINGS[int(rng.integers(len(ENDINGS)))]).capitalize()
+        form = rng.random()
+        if form < 0.04:
+            name = f"Saint {name}"
+        elif form < 0.08:
+            name = f"{name} Islands"
+        elif form < 0.11:
+            name = f"{name} and {SYLLABLES[int(rng.integers(len(SYLLABLES)))].capitalize()}go"
+        elif form < 0.14:
+            name = f"Central {name} Republic"
+        names.append(name)
+    return names
+
+
+def _typo(name: str, rng) -> str:
+    """Swap two adjacent letters away from the first character."""
+    if len(name) < 5:
+        return name
+    i = int(rng.integers(2, len(name) - 1))
+    return name[:i - 1] + name[i] + name[i - 1] + name[i + 1:]
+
+
+def _variant(name: str, rng, typo_rate: float) -> str:
+    """
+    A source's spelling of a country name: mostly verbatim, otherwise the
+    kinds of differences seen between REST Countries, Wikipedia and GPI
+    (articles, parenthesised qualifiers, footnote marks, accents, "&", case,
+    and the odd typo that only fuzzy matching recovers).
+    """
+    r = rng.random()
+    if r < typo_rate:
+        return _typo(name, rng)
+    r = rng.random()
+    if r < 0.60:
+        return name
+    if r < 0.67:
+        return f"The {name}"
+    if r < 0.74:
+        return f"{name} (Republic of)"
+    if r < 0.80:
+        return f"{name}*"
+    if r < 0.86:
+        return name.translate(ACCENTS)
+    if r < 0.90:
+        return name.replace(" and ", " & ")
+    if r < 0.95:
+        return name.upper()
+    return f"Republic of {name}"
+
+
+def generate_inputs(scale: int = 1, seed: int = 42, typo_rate: float = 0.02) -> dict:
+    """
+    Synthetic pipeline inputs at `scale` x today's ~250 countries.
+
+    Returns REST-Countries-, Wikipedia-homicide-, GPI- and advisory-shaped
+    frames (the layouts run_analysis accepts), State Dept API records and the
+    {ISO2: {name, region}} mapping build_advisory_index expects. The same
+    scale and seed always produce the same data.
+    """
+    rng = np.random.default_rng(seed)
+    n = BASE_COUNTRIES * scale
+    width = 2
+    while 26 ** width < n:
+        width += 1
+
+    names = _country_names(n, rng)
+    codes = [_letters(i, width) for i in range(n)]
+    region_names = list(REGIONS)
+    region_idx = rng.integers(len(region_names), size=n)
+    sub_idx = rng.integers(4, size=n)
+    regions = [region_names[r] for r in region_idx]
+
+    df_countries = pd.DataFrame(
+        {
+            "code_2": codes,
+            "code_3": [_letters(i, width + 1) for i in range(n)],
+            "country": names,
+            "region": regions,
+            "subregion": [REGIONS[region_names[r]][s] for r, s in zip(region_idx, sub_idx)],
+            "population": rng.lognormal(15, 2, size=n).astype(np.int64),
+            "capital": [f"{name.split()[-1]} City" for name in names],
+        }
+    )
+
+    def source_rows(coverage, extra):
+        """Names a source covers (shuffled), plus territories the master lacks."""
+        picked = rng.permutation(n)[: int(n * coverage)]
+        spelled = [_variant(names[i], rng, typo_rate) for i in picked]
+        spelled += [f"{SYLLABLES[int(rng.integers(len(SYLLABLES)))].capitalize()} Territory {i}"
+                    for i in range(int(n * extra))]
+        return spelled
+
+    wiki = source_rows(0.85, 0.04)
+    df_homicide = pd.DataFrame(
+        {
+            "country_wiki": wiki,
+            "homicide_rate": np.round(rng.lognormal(1.0, 1.1, size=len(wiki)).clip(0.1, 120), 1),
+        }
+    )
+
+    gpi = source_rows(0.65, 0.01)
+    gpi_score = np.round(rng.uniform(1.1, 3.5, size=len(gpi)), 3)
+    df_gpi = pd.DataFrame(
+        {
+            "country_gpi": gpi,
+            "gpi_score": gpi_score,
+            "gpi_rank": pd.Series(gpi_score).rank(method="min").astype(int).to_numpy(),
+        }
+    )
+
+    levels = rng.choice([1, 2, 3, 4], size=n, p=[0.45, 0.35, 0.12, 0.08])
+    covered = rng.random(n) < 0.85
+    df_advisory = pd.DataFrame(
+        {"code_2": np.array(codes)[covered], "advisory_level": levels[covered]}
+    )
+
+    records = []
+    for i in np.flatnonzero(rng.random(n) < 0.8):
+        name = names[i]
+        r = rng.random()
+        if r < typo_rate / 2:
+            name = _typo(name, rng)
+        elif r < 0.10:
+            name = f"The {name}"
+        elif r < 0.15:
+            name = f"{name} (Mainland)"
+        elif r < 0.18:
+            name = f"{name}, including {name.split()[-1]} Atoll"
+        level = int(levels[i])
+        records.append(
+            {
+                "Title": f"{name} - Level {level}: {ADVISORY_LABELS[level]}",
+                "Summary": f"<p>Exercise caution in {names[i]} due to crime.</p>",
+                "Link": f"https://travel.state.gov/{codes[i].lower()}.html",
+            }
+        )
+
+    rest_countries = {code: {"name": name, "region": region}
+                      for code, name, region in zip(codes, names, regions)}
+
+    return {
+        "countries": df_countries,
+        "homicide": df_homicide,
+        "gpi": df_gpi,
+        "advisory": df_advisory,
+        "advisory_records": records,
+        "rest_countries": rest_countries,
+    }
+
+
+def _fresh_cache_dir():
+    """Point fuzzy matching at an empty cache so every run measures the cold path."""
+    path = tempfile.mkdtemp(prefix="bench_fuzzy_")
+    fuzzy_match.CACHE_DIR = path
+    return path
+
+
+# (stage, function, inputs(data, outputs) -> args). Inputs are prepared outside
+# the timed region; outputs feed later stages.
+STAGES = [
+    (
+        "normalize_name",
+        lambda names: [normalize_name(x) for x in names],
+        lambda d, out: (
+            list(d["countries"]["country"]) + list(d["homicide"]["country_wiki"])
+            + list(d["gpi"]["country_gpi"]),
+        ),
+    ),
+    (
+        "merge_sources",
+        merge_sources,
+        lambda d, out: (d["countries"], d["homicide"], d["gpi"], d["advisory"]),
+    ),
+    ("compute_tsi", compute_tsi, lambda d, out: (out["merge_sources"],)),
+    ("assign_risk_tiers", assign_risk_tiers, lambda d, out: (out["compute_tsi"].copy(),)),
+    (
+        "build_advisory_index",
+        build_advisory_index,
+        lambda d, out: (d["advisory_records"], d["rest_countries"]),
+    ),
+]
+
+
+def _call(fn, args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args)
+
+
+def run_stages(data: dict, repeat: int = 3, memory: bool = True) -> dict:
+    """
+    Time every stage (best of `repeat` runs) and, separately, measure its
+    peak traced allocation, so tracemalloc overhead stays out of the timings.
+    """
+    results = {}
+    outputs = {}
+    saved_cache_dir = fuzzy_match.CACHE_DIR
+    try:
+        for name, fn, inputs in STAGES:
+            times = []
+            for _ in range(max(1, repeat)):
+                args = inputs(data, outputs)
+                cache = _fresh_cache_dir()
+                start = time.perf_counter()
+                outputs[name] = _call(fn, args)
+                times.append(time.perf_counter() - start)
+                shutil.rmtree(cache, ignore_errors=True)
+
+            entry = {"seconds": round(min(times), 6)}
+            if memory:
+                args = inputs(data, outputs)
+                cache = _fresh_cache_dir()
+                tracemalloc.start()
+                _call(fn, args)
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                shutil.rmtree(cache, ignore_errors=True)
+                entry["peak_mb"] = round(peak / 2**20, 3)
+            results[name] = entry
+    finally:
+        fuzzy_match.CACHE_DIR = saved_cache_dir
+    return results
+
+
+def run_suite(scales=None, repeat: int = 3, seed: int = 42, memory: bool = True) -> dict:
+    report = {}
+    for scale in scales or DEFAULT_SCALES:
+        start = time.perf_counter()
+        data = generate_inputs(scale, seed=seed)
+        gen_seconds = time.perf_counter() - start
+        print(f"[{scale}x] {len(data['countries'])} countries generated in {gen_seconds:.1f}s")
+        report[str(scale)] = run_stages(data, repeat=repeat, memory=memory)
+        for stage, r in report[str(scale)].items():
+            mem = f"  {r['peak_mb']:9.2f} MB" if "peak_mb" in r else ""
+            print(f"   {stage:<22} {r['seconds'] * 1000:10.1f} ms{mem}")
+    return report
+
+
+def machine_info() -> dict:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+    }
+
+
+def same_machine(baseline: dict) -> bool:
+    """Whether `baseline` was recorded on hardware/software like this one."""
+    recorded = baseline.get("machine") or {}
+    current = machine_info()
+    return all(recorded.get(k) == current[k] for k in ("platform", "cpus", "python"))
+
+
+def load_baseline(path: str = None) -> dict:
+    path = path or BASELINE_PATH
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(report: dict, path: str = None, seed: int = 42) -> str:
+    """Merge `report` into the stored baseline (other scales are kept)."""
+    path = path or BASELINE_PATH
+    baseline = load_baseline(path)
+    baseline["machine"] = machine_info()
+    baseline["seed"] = seed
+    baseline.setdefault("scales", {}).update(report)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, ensure_ascii=False, indent=2, sort_keys=True)
+    return path
+
+
+def compare(report: dict, baseline: dict) -> list:
+    """Regressions of `report` against `baseline`, as readable strings."""
+    regressions = []
+    for scale, stages in report.items():
+        base_stages = (baseline.get("scales") or {}).get(scale, {})
+        for stage, r in stages.items():
+            base = base_stages.get(stage)
+            if not base:
+                continue
+            limit = base["seconds"] * (1 + TIME_TOLERANCE) + TIME_SLACK_SECONDS
+            if r["seconds"] > limit:
+                regressions.append(
+                    f"{scale}x {stage}: {r['seconds'] * 1000:.1f} ms "
+                    f"(baseline {base['seconds'] * 1000:.1f} ms)"
+                )
+            if "peak_mb" in r and "peak_mb" in base:
+                limit = base["peak_mb"] * (1 + MEMORY_TOLERANCE) + MEMORY_SLACK_MB
+                if r["peak_mb"] > limit:
+                    regressions.append(
+                        f"{scale}x {stage}: peak {r['peak_mb']:.1f} MB "
+                        f"(baseline {base['peak_mb']:.1f} MB)"
+                    )
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Benchmark pipeline stages on synthetic inputs and check for regressions."
+    )
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES,
+                        help="Multiples of ~250 countries (e.g. 1 100 10000)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc pass")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help=f"Store these results as the baseline ({BASELINE_PATH})")
+    args = parser.parse_args(argv)
+
+    report = run_suite(args.scales, repeat=args.repeat, seed=args.seed, memory=not args.no_memory)
+
+    if args.update_baseline:
+        print(f"✓ Baseline saved to {save_baseline(report, seed=args.seed)}")
+        return 0
+
+    baseline = load_baseline()
+    if not baseline:
+        print("[WARN] No baseline yet; run with --update-baseline to store one.")
+        return 0
+    if not same_machine(baseline):
+        print("[WARN] Baseline was recorded on a different machine; skipping the regression check.")
+        print("       Run with --update-baseline to record one here.")
+        return 0
+    regressions = compare(report, baseline)
+    if regressions:
+        print(f"✗ {len(regressions)} regression(s):")
+        for r in regressions:
+            print(f"   {r}")
+        return 1
+    print("✓ No regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,24 @@
-import json
-import requests
+import argparse
 import re
 from html import unescape
 import os
 
-REST_COUNTRIES_URL = (
-    "https://restcountries.com/v3.1/all"
-    "?fields=name,cca2,region,subregion,population,capital"
+import pandas as pd
+
+from advisories import consensus_levels, default_adapters, run_adapters
+from advisory_search import AdvisoryIndexBuilder
+from country_reference import (
+    CountryRecords,
+    CountryReference,
+    cached_reference_items,
+    get_country_reference,
+    items_from_records,
+    write_frontend_reference,
 )
-
-TRAVEL_ADVISORY_URL = "https://cadataapi.state.gov/api/TravelAdvisories"
+from delta_publish import publish_delta
+from facet_index import FacetIndexBuilder
+from processed_store import ProcessedWriter, open_processed
+from static_pages import build_site
 
 TOURISM_CODES = [
     # Europe
@@ -135,180 +144,50 @@ def default_risk_scores_from_level(overall: str):
         return {"crime": 3, "political": 3, "health": 3, "natural_disaster": 3}
 
 
-def fetch_rest_countries():
+def fetch_rest_countries(codes=None):
     print("Fetching REST Countries data...")
-    resp = requests.get(REST_COUNTRIES_URL, timeout=20)
-    resp.raise_for_status()
-    data = resp.json()
-    by_code = {}
-    for item in data:
-        code = item.get("cca2")
-        if not code:
-            continue
-        name = item.get("name", {}).get("common", "")
-        region = item.get("region", "")
-        subregion = item.get("subregion", "")
-        by_code[code.upper()] = {
-            "code": code.upper(),
-            "name": name,
-            "region": region,
-            "subregion": subregion,
-            "population": item.get("population"),
-            "capital": (
-                item.get("capital") or ["N/A"]
-            )[0],
-        }
+    by_code = get_country_reference(codes=codes).by_code()
     print(f"Got {len(by_code)} countries from REST Countries.")
     return by_code
 
 
-def fetch_travel_advisories():
-    try:
-        print("Fetching US travel advisory data...")
-        resp = requests.get(TRAVEL_ADVISORY_URL, timeout=20)
-        resp.raise_for_status()
-        data = resp.json()
-        print(f"Got {len(data)} advisory records.")
-        return data
-    except Exception as e:
-        print(f"[WARN] Failed to fetch advisory API: {e}")
-        return []
-
-
-def build_advisory_index(records, rest_countries):
-    """Build an index: {ISO2: {overall, raw, summary, link}}."""
-    index = {}
-
-    name_to_code = {}
-    for code, c in rest_countries.items():
-        name_lower = (c["name"] or "").strip().lower()
-        if name_lower:
-            name_to_code[name_lower] = code
-    
-    aliases = {
-        "burma": "MM",  # Myanmar
-        "myanmar": "MM",
-        "east timor": "TL",  # Timor-Leste
-        "timor-leste": "TL",
-        "czech republic": "CZ",
-        "czechia": "CZ",
-        "russia": "RU",
-        "russian federation": "RU",
-        "south korea": "KR",
-        "republic of korea": "KR",
-        "north korea": "KP",
-        "democratic people's republic of korea": "KP",
-        "ivory coast": "CI",
-        "cote d'ivoire": "CI",
-        "cote d ivoire": "CI",
-        "cabo verde": "CV",
-        "cape verde": "CV",
-        "the bahamas": "BS",
-        "bahamas": "BS",
-        "the gambia": "GM",
-        "gambia": "GM",
-        "mexico": "MX",
-    }
-    for alias, code in aliases.items():
-        if code in rest_countries:
-            name_to_code[alias.lower()] = code
-
-    def normalize_country_name(name):
-        """Normalize country name for matching."""
-        if not name:
-            return ""
-        name = name.replace("Travel Advisory", "").strip()
-        name = re.sub(r"\s*\([^)]*\)", "", name)
-        name = re.sub(r"^the\s+", "", name, flags=re.IGNORECASE)
-        name = re.sub(r"\s+", " ", name).strip()
-        return name.lower()
-
-    matched_count = 0
-    unmatched = []
-
-    for item in records:
-        title = item.get("Title") or ""
-        if not title:
-            continue
-
-        if " - Level" in title:
-            parts = title.split(" - Level")
-            country_name = parts[0].strip()
-            level_part = "Level" + parts[1]  # "Level 4: Do Not Travel"
-        else:
-            continue
-
-        level_num = None
-        for n in ["1", "2", "3", "4"]:
-            if f"Level {n}" in level_part:
-                level_num = int(n)
-                break
-
-        if level_num is None:
-            continue
-
-        if level_num == 1:
-            overall = "low"
-        elif level_num == 2:
-            overall = "medium"
-        else:
-            overall = "high"
-
-        normalized_name = normalize_country_name(country_name)
-        
-        if "," in normalized_name or "&" in normalized_name:
-            first_part = normalized_name.split(",")[0].split("&")[0].strip()
-            first_part = re.sub(r'\bmainland\b', '', first_part, flags=re.IGNORECASE).strip()
-            first_part = re.sub(r'\bsee summaries\b', '', first_part, flags=re.IGNORECASE).strip()
-            if first_part:
-                normalized_name = first_part
-        
-        code = name_to_code.get(normalized_name)
-        
-        if not code:
-            for key, val in aliases.items():
-                if normalized_name == key or normalized_name in key or key in normalized_name:
-                    code = val
-                    break
-            
-            if not code:
-                for key, val in name_to_code.items():
-                    if normalized_name in key or key in normalized_name:
-                        code = val
-                        break
-        
-        if not code:
-            unmatched.append(country_name)
-            continue
-
-        matched_count += 1
-        index[code] = {
-            "raw": level_part.strip(),
-            "overall": overall,
-            "summary": item.get("Summary") or "",
-            "link": item.get("Link") or "",
-        }
-
-    print(f"Built advisory index for {len(index)} countries.")
-    if unmatched:
-        print(f"Unmatched ({len(unmatched)}): {', '.join(unmatched[:10])}")
-    return index
-
-
-def merge_country_safety():
-    rest_countries = fetch_rest_countries()
-    advisory_records = fetch_travel_advisories()
-    advisory_index = build_advisory_index(advisory_records, rest_countries)
-
-    result = {}
+def iter_country_safety(rest_countries=None, advisory_records=None, adapters=None, text_index=None,
+                        codes=None):
+    """
+    Yield (code, record) pairs merging REST Countries and advisories;
+    pre-fetched inputs skip the download. With a text_index (an
+    AdvisoryIndexBuilder), each country's full advisory text is added to it.
+    With codes, only those countries are merged and yielded.
+
+    Every advisory source (US, UK, Canada, Australia by default) is parsed in
+    parallel and overall_risk follows the cross-source consensus level. The
+    summary and link come from the first source that has one, US first.
+    """
+    if rest_countries is None:
+        rest_countries = fetch_rest_countries()
+    if adapters is None:
+        adapters = default_adapters(advisory_records)
+    # Sources are always matched against every country (and their parse
+    # cache is keyed on that list); only the lookups are cut to the subset.
+    indexes = run_adapters(adapters, rest_countries)
+    if codes is not None:
+        codes = {c.upper() for c in codes}
+        indexes = {name: {c: v for c, v in index.items() if c in codes} for name, index in indexes.items()}
+    consensus = consensus_levels(indexes)
 
     for code, base in rest_countries.items():
+        if codes is not None and code not in codes:
+            continue
         preset = MANUAL_SAFETY_PRESETS.get(code, {})
-        advisory = advisory_index.get(code)
+        advisory = next(
+            (index[code] for index in indexes.values() if code in index and index[code].get("summary")),
+            None,
+        ) or next((index[code] for index in indexes.values() if code in index), None)
+        agreed = consensus.get(code)
         is_core = code in TOURISM_CODES
 
-        if advisory and advisory.get("overall"):
-            overall_risk = advisory["overall"]
+        if agreed:
+            overall_risk = agreed["overall"]
         elif "overall_risk" in preset:
             overall_risk = preset["overall_risk"]
         else:
@@ -362,26 +241,118 @@ def merge_country_safety():
             "advisory_excerpt": preset.get("advisory_excerpt", excerpt),
             "advisory_link": advisory_link or preset.get("advisory_link", ""),
             "is_core_country": is_core,
+            "advisory_level": agreed["level"] if agreed else None,
+            "advisory_sources": agreed["sources"] if agreed else {},
+            "latlng": base.get("latlng"),
+            "capital_latlng": base.get("capital_latlng"),
         }
 
-        result[code] = merged
+        if text_index is not None:
+            full_text = " ".join(
+                html_to_text(index[code]["summary"])
+                for index in indexes.values()
+                if code in index and index[code].get("summary")
+            )
+            text_index.add(code, full_text or merged["advisory_excerpt"], base["name"],
+                           merged["region"], overall_risk)
+
+        yield code, merged
+
+
+def load_risk_tiers(results_csv: str = None) -> dict:
+    """{code: risk_tier} from the last run_full_analysis output, if any."""
+    results_csv = results_csv or os.path.join(BASE_DIR, "results", "TravelSafe_Final_Analysis.csv")
+    if not os.path.exists(results_csv):
+        return {}
+    df = pd.read_csv(results_csv, usecols=["code_2", "risk_tier"], keep_default_na=False, na_values=[""])
+    return dict(zip(df["code_2"], df["risk_tier"].where(df["risk_tier"].notna(), None)))
 
-    return result
 
+def merge_country_safety(rest_countries=None, advisory_records=None, adapters=None):
+    """All merged country records as one {code: record} dict."""
+    return dict(iter_country_safety(rest_countries, advisory_records, adapters))
 
-def main():
-    data = merge_country_safety()
 
-    subset = data
+def _carry_over(previous, fresh):
+    """The previous snapshot's records in order, with `fresh` ones swapped in and new codes appended."""
+    for code, record in previous.items():
+        yield code, fresh.get(code, record)
+    for code, record in fresh.items():
+        if code not in previous:
+            yield code, record
 
+
+def main(rest_countries=None, advisory_records=None, codes=None):
+    """
+    Build processed.json and everything derived from it. With codes, only
+    those countries are rebuilt; every other record is carried over from the
+    previous snapshot unchanged.
+    """
     out_path = os.path.join(BASE_DIR, "data", "processed.json")
-    os.makedirs(os.path.dirname(out_path), exist_ok=True)
 
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(subset, f, ensure_ascii=False, indent=2)
+    if rest_countries is None:
+        rest_countries = fetch_rest_countries(codes)
 
-    print("Written processed safety JSON with", len(subset), "countries:", out_path)
+    previous = {}
+    try:
+        previous = open_processed(out_path)
+    except Exception as e:
+        print(f"[WARN] Could not read previous snapshot: {e}")
+    if codes is not None and not previous:
+        print("[WARN] No previous snapshot to update; building every country.")
+        codes = None
+
+    # Records are streamed straight to disk; only the offset index and the
+    # records the delta actually touches are held in memory.
+    writer = ProcessedWriter(out_path)
+    text_index = AdvisoryIndexBuilder() if codes is None else None
+    facets = FacetIndexBuilder()
+    tiers = load_risk_tiers()
+    if codes is None:
+        records = iter_country_safety(rest_countries, advisory_records, text_index=text_index)
+    else:
+        fresh = dict(iter_country_safety(rest_countries, advisory_records, codes=codes))
+        print(f"Rebuilt {len(fresh)} of {len(codes)} requested countries; carrying over the rest.")
+        records = _carry_over(previous, fresh)
+    for code, record in records:
+        writer.write(code, record)
+        facets.add(code, {**record, "risk_tier": tiers.get(code)})
+    current = writer.close()
+
+    delta = publish_delta(previous, current, os.path.dirname(out_path))
+    writer.commit()
+
+    print("Written processed safety JSON with", len(writer), "countries:", out_path)
+    if text_index is not None:
+        search_path = text_index.build().save(os.path.join(BASE_DIR, "data", "advisory_index.npz"))
+        print(f"Advisory search index ({len(text_index.codes)} documents): {search_path}")
+    else:
+        print("Advisory search index left as of the last full build.")
+    facet_path = facets.build().save(os.path.join(BASE_DIR, "data", "facet_index.npz"))
+    print(f"Facet index ({len(facets.codes)} records): {facet_path}")
+    if isinstance(rest_countries, CountryRecords):
+        reference = rest_countries.reference
+    else:
+        reference = CountryReference(items_from_records(rest_countries, cached_reference_items()))
+    if len(reference):
+        reference_path = write_frontend_reference(reference, safety_path=out_path)
+        print(f"Frontend country reference ({len(reference)} countries): {reference_path}")
+    site = build_site(open_processed(out_path))
+    print(f"Static pages: {site['rendered']} rendered, {site['unchanged']} unchanged, {site['removed']} removed.")
+    if delta is None:
+        print("No changes since the previous build; no delta published.")
+    else:
+        print(
+            f"Published delta #{delta['to_seq']}: {len(delta['ops'])} ops "
+            f"across {len(delta['changed'])} countries."
+        )
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Build data/processed.json and the site.")
+    parser.add_argument("--codes", default=None,
+                        help="Comma-separated ISO2 codes: rebuild only these countries")
+    parser.add_argument("--core", action="store_true", help="Rebuild only TOURISM_CODES")
+    args = parser.parse_args()
+    codes = [c.strip().upper() for c in args.codes.split(",") if c.strip()] if args.codes else None
+    main(codes=TOURISM_CODES if args.core else codes)
@@ -0,0 +1,282 @@
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from processed_store import open_processed
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+RESULTS_CSV = os.path.join(BASE_DIR, "results", "TravelSafe_Final_Analysis.csv")
+CHART_DIR = os.path.join(BASE_DIR, "results", "charts")
+MANIFEST_NAME = "manifest.json"
+# Bump when a drawing function changes, so cached figures are redrawn.
+CHART_VERSION = 1
+
+SCORE_COLUMNS = ["crime_score", "political_score", "health_score", "natural_disaster_score"]
+TIER_ORDER = ["Safe", "Moderate", "Caution", "High Risk"]
+
+
+def _pyplot():
+    """Headless pyplot (Agg backend), imported only where figures are drawn."""
+    try:
+        import matplotlib
+    except ImportError:
+        raise RuntimeError("Missing dependency 'matplotlib'. Install with: pip install matplotlib")
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    return plt
+
+
+def _seaborn():
+    try:
+        import seaborn as sns
+    except ImportError:
+        raise RuntimeError("Missing dependency 'seaborn'. Install with: pip install seaborn")
+    return sns
+
+
+# ---------- Figures (each draws onto a fresh figure and returns it) ----------
+
+def draw_regional_distribution(df, params):
+    plt, sns = _pyplot(), _seaborn()
+    column, label = params["column"], params["label"]
+    data = df[(df["region"].fillna("") != "") & df[column].notna()]
+    fig, ax = plt.subplots(figsize=(12, 6))
+    sns.boxplot(data=data, x="region", y=column, hue="region", palette="Set2", legend=False, ax=ax)
+    ax.set_xlabel("Region", fontsize=12, fontweight="bold")
+    ax.set_ylabel(label, fontsize=12, fontweight="bold")
+    ax.set_title(f"{label} Distribution by Region", fontsize=14, fontweight="bold")
+    ax.tick_params(axis="x", rotation=45)
+    return fig
+
+
+def draw_regional_scores(df, params):
+    plt = _pyplot()
+    regional = df.groupby("region")[SCORE_COLUMNS].mean().sort_values("crime_score")
+    fig, ax = plt.subplots(figsize=(12, 6))
+    x = np.arange(len(regional))
+    width = 0.2
+    for i, (col, label) in enumerate(zip(SCORE_COLUMNS, ["Crime", "Political", "Health", "Natural Disaster"])):
+        ax.bar(x + (i - 1.5) * width, regional[col], width, label=label, alpha=0.8)
+    ax.set_xlabel("Region", fontsize=12, fontweight="bold")
+    ax.set_ylabel("Average Risk Score (1-5)", fontsize=12, fontweight="bold")
+    ax.set_title("Average Safety Scores by Region", fontsize=14, fontweight="bold")
+    ax.set_xticks(x)
+    ax.set_xticklabels(regional.index, rotation=45, ha="right")
+    ax.legend()
+    ax.grid(axis="y", alpha=0.3)
+    ax.set_ylim(0, 5)
+    return fig
+
+
+def draw_correlation_heatmap(df, params):
+    plt, sns = _pyplot(), _seaborn()
+    corr = df.apply(pd.to_numeric, errors="coerce").corr()
+    fig, ax = plt.subplots(figsize=(10, 8))
+    mask = np.triu(np.ones_like(corr, dtype=bool))
+    sns.heatmap(corr, annot=True, fmt=".2f", cmap="coolwarm", center=0, square=True,
+                linewidths=1, cbar_kws={"shrink": 0.8}, mask=mask, ax=ax)
+    ax.set_title("Correlation Heatmap: Safety Indicators and Demographics",
+                 fontsize=14, fontweight="bold", pad=20)
+    return fig
+
+
+def draw_top_bottom(df, params):
+    """Highest and lowest `column` side by side (TSI rankings, homicide rates)."""
+    plt = _pyplot()
+    column, label, k = params["column"], params["label"], params["k"]
+    ranked = df[df[column].notna()].sort_values(column, ascending=False)
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 6))
+    for ax, rows, color, title in [
+        (ax1, ranked.head(k), params["top_color"], f"Top {k} Countries by {label}"),
+        (ax2, ranked.tail(k), params["bottom_color"], f"Bottom {k} Countries by {label}"),
+    ]:
+        ax.barh(range(len(rows)), rows[column], color=color)
+        ax.set_yticks(range(len(rows)))
+        ax.set_yticklabels(rows["country"], fontsize=10)
+        ax.set_xlabel(label, fontsize=12, fontweight="bold")
+        ax.set_title(title, fontsize=14, fontweight="bold")
+        ax.invert_yaxis()
+        ax.grid(axis="x", alpha=0.3)
+    return fig
+
+
+def _tier_order(tiers):
+    present = [t for t in tiers.dropna().unique()]
+    return [t for t in TIER_ORDER if t in present] + sorted(t for t in present if t not in TIER_ORDER)
+
+
+def draw_tier_by_region(df, params):
+    plt, sns = _pyplot(), _seaborn()
+    counts = pd.crosstab(df["region"].replace("", "Other"), df["risk_tier"])
+    counts = counts[_tier_order(df["risk_tier"])]
+    fig, ax = plt.subplots(figsize=(10, 6))
+    sns.heatmap(counts, annot=True, fmt="d", cmap="Blues", linewidths=1, ax=ax)
+    ax.set_xlabel("Risk tier", fontsize=12, fontweight="bold")
+    ax.set_ylabel("Region", fontsize=12, fontweight="bold")
+    ax.set_title("Countries per Risk Tier and Region", fontsize=14, fontweight="bold")
+    return fig
+
+
+def draw_tier_map(df, params):
+    plt = _pyplot()
+    data = df[df["lat"].notna() & df["lng"].notna()]
+    colors = dict(zip(TIER_ORDER, ["#2ca02c", "#ffbf00", "#ff7f0e", "#d62728"]))
+    fig, ax = plt.subplots(figsize=(14, 7))
+    for tier in _tier_order(data["risk_tier"]):
+        rows = data[data["risk_tier"] == tier]
+        ax.scatter(rows["lng"], rows["lat"], s=40, alpha=0.8, label=tier,
+                   color=colors.get(tier, "#7f7f7f"), edgecolors="black", linewidth=0.3)
+    ax.set_xlim(-180, 180)
+    ax.set_ylim(-60, 85)
+    ax.set_xlabel("Longitude")
+    ax.set_ylabel("Latitude")
+    ax.set_title("Risk Tiers by Country Location", fontsize=14, fontweight="bold")
+    ax.legend(title="Risk tier")
+    ax.grid(alpha=0.3)
+    return fig
+
+
+# name -> (draw function, input columns, parameters). The cache key covers
+# exactly these columns and parameters.
+CHARTS = {
+    "regional_tsi": (draw_regional_distribution, ["region", "TSI"],
+                     {"column": "TSI", "label": "Travel Safety Index"}),
+    "regional_homicide": (draw_regional_distribution, ["region", "homicide_rate"],
+                          {"column": "homicide_rate", "label": "Homicide Rate (per 100,000)"}),
+    "regional_risk_scores": (draw_regional_scores, ["region"] + SCORE_COLUMNS, {}),
+    "correlation_heatmap": (draw_correlation_heatmap,
+                            ["homicide_rate", "gpi_score", "advisory_level", "TSI", "population"] + SCORE_COLUMNS,
+                            {}),
+    "tsi_rankings": (draw_top_bottom, ["country", "TSI"],
+                     {"column": "TSI", "label": "Travel Safety Index", "k": 15,
+                      "top_color": "#2ca02c", "bottom_color": "#d62728"}),
+    "homicide_top_bottom": (draw_top_bottom, ["country", "homicide_rate"],
+                            {"column": "homicide_rate", "label": "Homicide Rate (per 100,000)", "k": 10,
+                             "top_color": "#d62728", "bottom_color": "#2ca02c"}),
+    "tier_by_region": (draw_tier_by_region, ["region", "risk_tier"], {}),
+    "tier_map": (draw_tier_map, ["lat", "lng", "risk_tier"], {}),
+}
+
+
+def chart_frame(df_model: pd.DataFrame, safety=None) -> pd.DataFrame:
+    """
+    The analysis results plus the processed.json fields some charts use:
+    the four 1–5 risk scores and country coordinates (when the safety
+    build recorded them).
+    """
+    df = df_model.copy()
+    safety = open_processed() if safety is None else safety
+    scores, coords = {}, {}
+    for code, record in safety.items():
+        rs = (record or {}).get("risk_scores") or {}
+        scores[code] = [rs.get(k.replace("_score", "")) for k in SCORE_COLUMNS]
+        latlng = (record or {}).get("latlng")
+        if latlng and len(latlng) >= 2:
+            coords[code] = latlng[:2]
+    if scores:
+        values = np.array([scores.get(c, [None] * 4) for c in df["code_2"]], dtype=float)
+        for i, col in enumerate(SCORE_COLUMNS):
+            df[col] = values[:, i]
+    if coords:
+        values = np.array([coords.get(c, [np.nan, np.nan]) for c in df["code_2"]], dtype=float)
+        df["lat"], df["lng"] = values[:, 0], values[:, 1]
+    return df
+
+
+def chart_key(name: str, df: pd.DataFrame) -> str:
+    """Hash of a chart's input columns (names, dtypes, values) and parameters."""
+    _, columns, params = CHARTS[name]
+    digest = hashlib.sha1()
+    digest.update(json.dumps([CHART_VERSION, name, params, columns,
+                              [str(df[c].dtype) for c in columns]], sort_keys=True).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(df[columns], index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def _render_chart(task):
+    """Worker: draw one figure headlessly and save it atomically."""
+    name, df, path = task
+    draw, _, params = CHARTS[name]
+    fig = draw(df, params)
+    fig.tight_layout()
+    tmp = path + ".tmp.png"
+    fig.savefig(tmp, dpi=120)
+    _pyplot().close(fig)
+    os.replace(tmp, path)
+    return name
+
+
+def render_charts(df_model: pd.DataFrame = None, safety=None, out_dir: str = None,
+                  workers: int = None, force: bool = False) -> dict:
+    """
+    Render every standard figure to <out_dir>/<name>.png.
+
+    A figure is redrawn only when the hash of its own input columns and
+    parameters differs from the one recorded in manifest.json, so report
+    builds on unchanged data skip plotting entirely. Figures whose columns
+    are missing or empty are skipped. Stale figures render in a process
+    pool. Returns {"rendered", "cached", "skipped"} lists of chart names.
+    """
+    if df_model is None:
+        df_model = pd.read_csv(RESULTS_CSV, keep_default_na=False, na_values=[""])
+    out_dir = out_dir or CHART_DIR
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+
+    previous = {}
+    if os.path.exists(manifest_path) and not force:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+
+    df = chart_frame(df_model, safety)
+    current, todo, cached, skipped = {}, [], [], []
+    for name, (_, columns, _) in CHARTS.items():
+        if any(c not in df.columns for c in columns) or df[columns].dropna(how="all").empty:
+            skipped.append(name)
+            continue
+        key = chart_key(name, df)
+        current[name] = key
+        path = os.path.join(out_dir, f"{name}.png")
+        if previous.get(name) == key and os.path.exists(path):
+            cached.append(name)
+        else:
+            todo.append((name, df[columns].copy(), path))
+
+    workers = workers or max(1, (os.cpu_count() or 2) - 1)
+    if workers > 1 and len(todo) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(todo))) as pool:
+            rendered = list(pool.map(_render_chart, todo))
+    else:
+        rendered = [_render_chart(task) for task in todo]
+
+    with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(current, f, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    return {"rendered": rendered, "cached": cached, "skipped": skipped}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render the standard analysis charts (cached).")
+    parser.add_argument("--out", default=CHART_DIR)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="Redraw every chart.")
+    args = parser.parse_args(argv)
+
+    stats = render_charts(out_dir=args.out, workers=args.workers, force=args.force)
+    print(
+        f"✓ Charts: {len(stats['rendered'])} rendered, {len(stats['cached'])} cached, "
+        f"{len(stats['skipped'])} skipped. Saved to {args.out}"
+    )
+    if stats["skipped"]:
+        print(f"[WARN] Skipped (missing inputs): {', '.join(stats['skipped'])}")
+
+
+if __name__ == "__main__":
+    main()
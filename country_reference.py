@@ -0,0 +1,359 @@
+import hashlib
+import json
+import os
+import re
+import time
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+import requests
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+REST_COUNTRIES_ALL = "https://restcountries.com/v3.1/all"
+REST_COUNTRIES_ALPHA = "https://restcountries.com/v3.1/alpha"
+# REST Countries caps `fields=` at 10 per request, so the union of fields
+# both pipelines need is fetched as two column groups joined on cca2.
+FIELD_GROUPS = [
+    "name,cca2,cca3,region,subregion,population,capital,capitalInfo,latlng",
+    "cca2,languages,currencies,flags,flag,altSpellings",
+]
+
+CACHE_PATH = os.path.join(BASE_DIR, "data", "cache", "country_reference.json")
+# Static per-country files the website reads instead of calling REST Countries.
+FRONTEND_DIR = os.path.join(BASE_DIR, "data", "reference")
+DEFAULT_MAX_AGE = 7 * 24 * 3600
+
+_MEMO = {}
+
+
+def _latlng_pair(value):
+    """Return (lat, lng) as floats, or (nan, nan) when REST Countries has no coordinates."""
+    if not value or len(value) < 2:
+        return (np.nan, np.nan)
+    try:
+        return (float(value[0]), float(value[1]))
+    except (TypeError, ValueError):
+        return (np.nan, np.nan)
+
+
+def fetch_reference_items(codes=None):
+    """
+    Download every field group once and merge them into one item per cca2.
+    With codes, only those countries are requested (the alpha endpoint).
+    """
+    merged = {}
+    for fields in FIELD_GROUPS:
+        if codes:
+            url, params = REST_COUNTRIES_ALPHA, {"codes": ",".join(sorted(codes)), "fields": fields}
+        else:
+            url, params = REST_COUNTRIES_ALL, {"fields": fields}
+        resp = requests.get(url, params=params, timeout=20)
+        resp.raise_for_status()
+        for item in resp.json():
+            code = (item.get("cca2") or "").upper()
+            if code:
+                merged.setdefault(code, {}).update(item)
+    return [merged[code] for code in sorted(merged)]
+
+
+class CountryReference:
+    """
+    Typed, column-oriented REST Countries reference table.
+
+    Columns are stored once as numpy arrays; to_frame() wraps them in a
+    DataFrame (run_full_analysis shape) and by_code() exposes the same rows as
+    a read-only {ISO2: record} mapping (build_country_safety shape).
+    """
+
+    def __init__(self, items):
+        items = [i for i in items if i.get("cca2")]
+        n = len(items)
+        self.code = np.array([i["cca2"].upper() for i in items], dtype="U2")
+        self.code_3 = np.array([i.get("cca3") or "" for i in items], dtype="U3")
+        self.name = np.array([(i.get("name") or {}).get("common", "") for i in items], dtype=object)
+        self.region = np.array([i.get("region") or "" for i in items], dtype=object)
+        self.subregion = np.array([i.get("subregion") or "" for i in items], dtype=object)
+        self.population = np.array([i.get("population") or 0 for i in items], dtype=np.int64)
+        self.capital = np.array([(i.get("capital") or ["N/A"])[0] for i in items], dtype=object)
+
+        latlng = np.array([_latlng_pair(i.get("latlng")) for i in items], dtype=float).reshape(n, 2)
+        cap = np.array(
+            [_latlng_pair((i.get("capitalInfo") or {}).get("latlng")) for i in items], dtype=float
+        ).reshape(n, 2)
+        self.lat, self.lng = latlng[:, 0], latlng[:, 1]
+        self.capital_lat, self.capital_lng = cap[:, 0], cap[:, 1]
+
+        self.languages = np.empty(n, dtype=object)
+        self.currencies = np.empty(n, dtype=object)
+        for row, i in enumerate(items):
+            self.languages[row] = tuple((i.get("languages") or {}).values())
+            self.currencies[row] = tuple(
+                c.get("name", "") for c in (i.get("currencies") or {}).values()
+            )
+
+        self.items = items
+        self._pos = {code: row for row, code in enumerate(self.code)}
+
+    def __len__(self):
+        return len(self.code)
+
+    def row(self, code: str) -> int:
+        return self._pos[code.upper()]
+
+    def to_frame(self, extras: bool = False) -> pd.DataFrame:
+        """
+        DataFrame view in the run_full_analysis layout. With extras=True the
+        first three languages and first two currency names are added as
+        comma-separated strings, as in the exploratory notebook.
+        """
+        data = {
+            "code_2": self.code.astype(object),
+            "code_3": self.code_3.astype(object),
+            "country": self.name,
+            "region": self.region,
+            "subregion": self.subregion,
+            "population": self.population,
+            "capital": self.capital,
+            "lat": self.lat,
+            "lng": self.lng,
+            "capital_lat": self.capital_lat,
+            "capital_lng": self.capital_lng,
+        }
+        if extras:
+            data["languages"] = [", ".join(langs[:3]) or "N/A" for langs in self.languages]
+            data["currencies"] = [", ".join(curs[:2]) or "N/A" for curs in self.currencies]
+        return pd.DataFrame(data, copy=False)
+
+    def by_code(self) -> "CountryRecords":
+        return CountryRecords(self)
+
+
+class CountryRecords(Mapping):
+    """Read-only {ISO2: record dict} view over a CountryReference."""
+
+    def __init__(self, ref: CountryReference):
+        self._ref = ref
+
+    def __getitem__(self, code):
+        ref = self._ref
+        i = ref._pos[code]
+        latlng = None if np.isnan(ref.lat[i]) else [float(ref.lat[i]), float(ref.lng[i])]
+        cap = (
+            None
+            if np.isnan(ref.capital_lat[i])
+            else [float(ref.capital_lat[i]), float(ref.capital_lng[i])]
+        )
+        return {
+            "code": str(ref.code[i]),
+            "name": ref.name[i],
+            "region": ref.region[i],
+            "subregion": ref.subregion[i],
+            "population": int(ref.population[i]),
+            "capital": ref.capital[i],
+            "latlng": latlng,
+            "capital_latlng": cap,
+        }
+
+    @property
+    def reference(self) -> CountryReference:
+        return self._ref
+
+    def __iter__(self):
+        return (str(c) for c in self._ref.code)
+
+    def __len__(self):
+        return len(self._ref)
+
+    def __contains__(self, code):
+        return code in self._ref._pos
+
+
+def get_country_reference(max_age: float = DEFAULT_MAX_AGE, refresh: bool = False,
+                          cache_path: str = None, codes=None, fallback: bool = True) -> CountryReference:
+    """
+    Shared reference table for both pipelines.
+
+    Served from memory within a process, then from the on-disk cache while it
+    is younger than max_age, and only otherwise downloaded. If a download
+    fails, a stale cache is used rather than failing the build (unless
+    fallback=False, e.g. for the ingestion daemon, which retries instead).
+
+    With codes (subset builds), a stale cache is refreshed for those
+    countries only; the rest of the table is served as cached, and the cache
+    keeps its old age so the next full build still refreshes everything.
+    """
+    cache_path = cache_path or CACHE_PATH
+    if not refresh and cache_path in _MEMO:
+        return _MEMO[cache_path]
+
+    cached = _read_cache(cache_path)
+
+    # A cache written for a different field list is refetched regardless of age.
+    same_fields = cached and cached.get("fields", FIELD_GROUPS) == FIELD_GROUPS
+    fresh = same_fields and time.time() - cached.get("fetched_at", 0) < max_age
+    if cached and fresh and not refresh:
+        items = cached["items"]
+    elif codes and same_fields:
+        # Without a usable cache there is no table to patch; fall through to a full fetch.
+        items = cached["items"]
+        try:
+            fetched = {i["cca2"].upper(): i for i in fetch_reference_items(codes)}
+        except Exception as e:
+            if not fallback:
+                raise
+            print(f"[WARN] REST Countries refresh failed, using cached copy: {e}")
+        else:
+            known = {i["cca2"].upper() for i in items}
+            items = [fetched.get(i["cca2"].upper(), i) for i in items]
+            items += [i for code, i in sorted(fetched.items()) if code not in known]
+            save_reference_items(items, cache_path, fetched_at=cached.get("fetched_at", 0))
+    else:
+        try:
+            items = fetch_reference_items()
+        except Exception as e:
+            if not cached or not fallback:
+                raise
+            print(f"[WARN] REST Countries refresh failed, using cached copy: {e}")
+            items = cached["items"]
+        else:
+            save_reference_items(items, cache_path)
+
+    ref = CountryReference(items)
+    _MEMO[cache_path] = ref
+    return ref
+
+
+def _read_cache(cache_path: str):
+    if not os.path.exists(cache_path):
+        return None
+    with open(cache_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def cached_reference_items(cache_path: str = None) -> dict:
+    """{ISO2: item} from the on-disk cache, whatever its age; {} if there is none. Never fetches."""
+    try:
+        cached = _read_cache(cache_path or CACHE_PATH)
+    except (OSError, ValueError):
+        cached = None
+    return {i["cca2"].upper(): i for i in (cached or {}).get("items", []) if i.get("cca2")}
+
+
+def items_from_records(records, base: dict = None) -> list:
+    """
+    REST Countries-shaped items for a plain {ISO2: record} mapping (the
+    build_country_safety input shape), so a reference can be baked from any
+    country input. Fields the records don't carry (languages, flags, ...)
+    come from the matching `base` item when there is one.
+    """
+    base = base or {}
+    items = []
+    for code, record in records.items():
+        code = str(code).upper()
+        item = dict(base.get(code) or {"cca2": code})
+        name = record.get("name")
+        if name:
+            item["name"] = {**(item.get("name") or {}), "common": name}
+        for field in ("region", "subregion", "population", "latlng"):
+            if record.get(field):
+                item[field] = record[field]
+        capital = record.get("capital")
+        if capital and capital != "N/A":
+            item["capital"] = [capital]
+        items.append(item)
+    return items
+
+
+def save_reference_items(items, cache_path: str = None, fetched_at: float = None):
+    cache_path = cache_path or CACHE_PATH
+    fetched_at = time.time() if fetched_at is None else fetched_at
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp = cache_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"fetched_at": fetched_at, "fields": FIELD_GROUPS, "items": items}, f, ensure_ascii=False)
+    os.replace(tmp, cache_path)
+    _MEMO.pop(cache_path, None)
+
+
+def frontend_record(item: dict) -> dict:
+    """One REST Countries item in the shape tn.js renders."""
+    name = item.get("name") or {}
+    flags = item.get("flags") or {}
+    return {
+        "code": (item.get("cca2") or "").upper(),
+        "name": name.get("common", ""),
+        "official_name": name.get("official", ""),
+        "region": item.get("region") or "",
+        "subregion": item.get("subregion") or "",
+        "capital": (item.get("capital") or ["N/A"])[0],
+        "population": item.get("population") or None,
+        "languages": list((item.get("languages") or {}).values()),
+        "currencies": [c.get("name", "") for c in (item.get("currencies") or {}).values()],
+        "flag": {
+            "emoji": item.get("flag") or "",
+            "png": flags.get("png") or "",
+            "svg": flags.get("svg") or "",
+            "alt": flags.get("alt") or "",
+        },
+    }
+
+
+def _search_names(item: dict):
+    name = item.get("name") or {}
+    names = [name.get("common"), name.get("official"), *(item.get("altSpellings") or [])]
+    return [n for n in names if n]
+
+
+def _content_hash(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()[:10]
+
+
+def _write_atomic(path: str, data: bytes):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def write_frontend_reference(ref: CountryReference, out_dir: str = None, safety_path: str = None) -> str:
+    """
+    Bake the country facts the website shows into same-origin static files.
+
+    Each country goes to <out_dir>/<ISO2>.<hash>.json, named by a hash of its
+    content so it can be cached forever; index.json (the only file browsers
+    must revalidate) maps codes and lowercased names to those files, and
+    carries a version for processed.json too when safety_path is given.
+    Files no longer referenced are removed. Returns the index path.
+    """
+    out_dir = out_dir or FRONTEND_DIR
+    os.makedirs(out_dir, exist_ok=True)
+
+    countries, names = {}, {}
+    for item in ref.items:
+        record = frontend_record(item)
+        code = record["code"]
+        body = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        filename = f"{code}.{_content_hash(body)}.json"
+        path = os.path.join(out_dir, filename)
+        if not os.path.exists(path):
+            _write_atomic(path, body)
+        countries[code] = {"name": record["name"], "file": filename}
+        for n in _search_names(item):
+            names.setdefault(n.strip().lower(), code)
+
+    index = {"version": "", "countries": countries, "names": names}
+    index["version"] = _content_hash(json.dumps(index, sort_keys=True).encode("utf-8"))
+    if safety_path and os.path.exists(safety_path):
+        with open(safety_path, "rb") as f:
+            index["safety"] = f"{os.path.basename(safety_path)}?v={_content_hash(f.read())}"
+
+    index_path = os.path.join(out_dir, "index.json")
+    _write_atomic(index_path, json.dumps(index, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+    keep = {c["file"] for c in countries.values()}
+    for filename in os.listdir(out_dir):
+        if re.fullmatch(r"[A-Z]{2}\.[0-9a-f]{10}\.json", filename) and filename not in keep:
+            os.remove(os.path.join(out_dir, filename))
+    return index_path
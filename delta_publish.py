@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DATA_DIR = os.path.join(BASE_DIR, "data")
+MANIFEST_NAME = "processed.manifest.json"
+DELTA_DIR_NAME = "deltas"
+# How many deltas the "what changed" feed keeps.
+FEED_LIMIT = 100
+
+
+def record_hash(record) -> str:
+    """Content hash of one country record (key order independent)."""
+    payload = json.dumps(record, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def snapshot_hash(hashes: dict) -> str:
+    payload = "".join(f"{code}:{hashes[code]};" for code in sorted(hashes))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _escape(token: str) -> str:
+    """JSON-pointer escaping (RFC 6901)."""
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+
+def diff_snapshots(old: dict, new: dict, old_hashes: dict = None, new_hashes: dict = None):
+    """
+    JSON-patch style ops turning `old` into `new`.
+
+    Countries are compared by content hash first; only countries whose hash
+    changed are diffed field by field, so unchanged records cost one lookup.
+    """
+    old_hashes = old_hashes or {code: record_hash(rec) for code, rec in old.items()}
+    new_hashes = new_hashes or {code: record_hash(rec) for code, rec in new.items()}
+
+    ops = []
+    for code in sorted(old.keys() - new.keys()):
+        ops.append({"op": "remove", "path": f"/{_escape(code)}"})
+    for code in sorted(new.keys() - old.keys()):
+        ops.append({"op": "add", "path": f"/{_escape(code)}", "value": new[code]})
+    for code in sorted(new.keys() & old.keys()):
+        if old_hashes.get(code) == new_hashes[code]:
+            continue
+        before, after = old[code], new[code]
+        if not isinstance(before, dict) or not isinstance(after, dict):
+            ops.append({"op": "replace", "path": f"/{_escape(code)}", "value": after})
+            continue
+        base = f"/{_escape(code)}"
+        for field in sorted(before.keys() - after.keys()):
+            ops.append({"op": "remove", "path": f"{base}/{_escape(field)}"})
+        for field in sorted(after.keys()):
+            if field not in before:
+                ops.append({"op": "add", "path": f"{base}/{_escape(field)}", "value": after[field]})
+            elif before[field] != after[field]:
+                ops.append({"op": "replace", "path": f"{base}/{_escape(field)}", "value": after[field]})
+    return ops
+
+
+def apply_delta(data: dict, delta: dict) -> dict:
+    """Apply a published delta (or a bare list of ops) to a processed.json dict in place."""
+    ops = delta["ops"] if isinstance(delta, dict) else delta
+    for op in ops:
+        parts = [
+            p.replace("~1", "/").replace("~0", "~") for p in op["path"].lstrip("/").split("/")
+        ]
+        target = data
+        for p in parts[:-1]:
+            target = target[p]
+        if op["op"] == "remove":
+            target.pop(parts[-1], None)
+        else:
+            target[parts[-1]] = op["value"]
+    return data
+
+
+def load_manifest(data_dir: str = None) -> dict:
+    path = os.path.join(data_dir or DATA_DIR, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {"seq": 0, "hashes": {}, "snapshot_hash": None}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def publish_delta(previous: dict, current: dict, data_dir: str = None):
+    """
+    Diff the new build against the previous snapshot and publish the result.
+
+    Writes data/deltas/<seq>.json and refreshes data/deltas/index.json (the
+    "what changed" feed) and data/processed.manifest.json. When nothing
+    changed, no delta is written and the sequence number stays the same.
+    Returns the delta dict, or None when nothing changed.
+    """
+    data_dir = data_dir or DATA_DIR
+    manifest = load_manifest(data_dir)
+    new_hashes = {code: record_hash(rec) for code, rec in current.items()}
+    new_snapshot = snapshot_hash(new_hashes)
+
+    old_hashes = manifest.get("hashes") or None
+    if old_hashes is not None and set(old_hashes) != set(previous or {}):
+        # Manifest and on-disk snapshot disagree (e.g. file edited by hand).
+        old_hashes = None
+    ops = diff_snapshots(previous or {}, current, old_hashes, new_hashes)
+    if not ops and manifest.get("snapshot_hash") == new_snapshot:
+        return None
+
+    seq = int(manifest.get("seq", 0)) + 1
+    built_at = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    changed = sorted({op["path"].split("/")[1] for op in ops})
+    delta = {
+        "from_seq": seq - 1,
+        "to_seq": seq,
+        "base_hash": manifest.get("snapshot_hash"),
+        "result_hash": new_snapshot,
+        "built_at": built_at,
+        "changed": changed,
+        "ops": ops,
+    }
+
+    delta_dir = os.path.join(data_dir, DELTA_DIR_NAME)
+    os.makedirs(delta_dir, exist_ok=True)
+    delta_file = f"{seq:06d}.json"
+    with open(os.path.join(delta_dir, delta_file), "w", encoding="utf-8") as f:
+        json.dump(delta, f, ensure_ascii=False, separators=(",", ":"))
+
+    feed_path = os.path.join(delta_dir, "index.json")
+    feed = []
+    if os.path.exists(feed_path):
+        with open(feed_path, "r", encoding="utf-8") as f:
+            feed = json.load(f).get("deltas", [])
+    feed.append(
+        {
+            "seq": seq,
+            "file": f"{DELTA_DIR_NAME}/{delta_file}",
+            "built_at": built_at,
+            "n_ops": len(ops),
+            "changed": changed,
+        }
+    )
+    with open(feed_path, "w", encoding="utf-8") as f:
+        json.dump({"latest_seq": seq, "deltas": feed[-FEED_LIMIT:]}, f, ensure_ascii=False, indent=2)
+
+    with open(os.path.join(data_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "seq": seq,
+                "built_at": built_at,
+                "snapshot_hash": new_snapshot,
+                "hashes": new_hashes,
+            },
+            f,
+            ensure_ascii=False,
+            indent=2,
+        )
+    return delta
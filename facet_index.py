@@ -0,0 +1,290 @@
+import argparse
+import json
+import os
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+INDEX_PATH = os.path.join(BASE_DIR, "data", "facet_index.npz")
+
+FACETS = ["region", "subregion", "overall_risk", "risk_tier", "is_core_country", "top_risks"]
+
+
+def _facet_values(value):
+    """Facet value(s) of one record field as strings; lists are multi-valued tags."""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return []
+    if isinstance(value, (list, tuple, set)):
+        return [str(v) for v in value if v is not None and str(v) != ""]
+    if isinstance(value, (bool, np.bool_)):
+        return ["true" if value else "false"]
+    value = str(value)
+    return [value] if value else []
+
+
+_POP8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _popcount(words: np.ndarray) -> np.ndarray:
+    """Set bits per uint64 word (np.bitwise_count on numpy >= 2, else a byte table)."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words)
+    bytes_ = words.view(np.uint8).reshape(words.shape + (8,))
+    return _POP8[bytes_].sum(axis=-1)
+
+
+def _pack(rows, n: int) -> np.ndarray:
+    """Record positions -> bitmap of ceil(n / 64) little-endian uint64 words."""
+    words = max(1, (n + 63) // 64)
+    bits = np.zeros(words * 64, dtype=bool)
+    bits[rows] = True
+    return np.packbits(bits, bitorder="little").view("<u8")
+
+
+class FacetIndexBuilder:
+    """Collects records one at a time (e.g. while processed.json is streamed out)."""
+
+    def __init__(self, facets=None):
+        self.facets = list(facets or FACETS)
+        self.codes = []
+        self.rows = {f: {} for f in self.facets}
+
+    def add(self, code: str, record: dict):
+        row = len(self.codes)
+        self.codes.append(code)
+        for facet in self.facets:
+            for value in _facet_values(record.get(facet)):
+                self.rows[facet].setdefault(value, []).append(row)
+
+    def build(self) -> "FacetIndex":
+        facets, values, bits = [], [], []
+        for facet in self.facets:
+            for value in sorted(self.rows[facet]):
+                facets.append(facet)
+                values.append(value)
+                bits.append(_pack(self.rows[facet][value], len(self.codes)))
+        words = max(1, (len(self.codes) + 63) // 64)
+        matrix = np.vstack(bits) if bits else np.zeros((0, words), dtype="<u8")
+        return FacetIndex(self.codes, facets, values, matrix, self.facets)
+
+
+class FacetIndex:
+    """
+    One bitmap per (facet, value) over a fixed record order.
+
+    Bitmaps are rows of a uint64 matrix (bit i = record i). AND / OR / NOT
+    are word-wise numpy operations, and the counts for every facet value are
+    one popcount over the whole matrix ANDed with the match mask, so a
+    filter plus all facet counts never scans the records themselves. Saved
+    as the raw matrix in one .npz.
+    """
+
+    def __init__(self, codes, facets, values, bits: np.ndarray, facet_order=None):
+        self.codes = np.asarray(codes, dtype=object)
+        self.n = len(self.codes)
+        self.facets = np.asarray(facets, dtype=object)
+        self.values = np.asarray(values, dtype=object)
+        self.bits = bits
+        self.facet_order = list(facet_order) if facet_order is not None else list(dict.fromkeys(self.facets))
+
+        words = bits.shape[1] if bits.ndim == 2 and bits.shape[0] else max(1, (self.n + 63) // 64)
+        self.all = _pack(np.arange(self.n), self.n)[:words]
+        self.empty = np.zeros(words, dtype="<u8")
+        self._scratch = np.empty((len(self.facets), words), dtype="<u8")
+        self._row = {}
+        self._facet_rows = {f: [] for f in self.facet_order}
+        for i, (facet, value) in enumerate(zip(self.facets, self.values)):
+            self._row[(facet, value.lower())] = i
+            self._facet_rows[facet].append(i)
+        self._facet_rows = {f: np.array(r, dtype=np.int64) for f, r in self._facet_rows.items()}
+
+    @classmethod
+    def from_records(cls, records, facets=None):
+        """Build from {code: record} (a dict or a processed_store reader)."""
+        builder = FacetIndexBuilder(facets)
+        for code, record in records.items():
+            builder.add(code, record)
+        return builder.build()
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, key_col: str, facets):
+        """Build from a table, e.g. the sub-national place table."""
+        builder = FacetIndexBuilder(facets)
+        for key, record in zip(df[key_col], df[list(facets)].to_dict("records")):
+            builder.add(key, record)
+        return builder.build()
+
+    def save(self, path: str = None) -> str:
+        path = path or INDEX_PATH
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.savez_compressed(
+            path,
+            codes=np.array(self.codes, dtype=str),
+            facets=np.array(self.facets, dtype=str),
+            values=np.array(self.values, dtype=str),
+            bits=self.bits,
+            facet_order=np.array(self.facet_order, dtype=str),
+        )
+        return path
+
+    @classmethod
+    def load(cls, path: str = None):
+        with np.load(path or INDEX_PATH, allow_pickle=False) as data:
+            return cls(
+                data["codes"].tolist(),
+                data["facets"].tolist(),
+                data["values"].tolist(),
+                data["bits"].astype("<u8", copy=False),
+                data["facet_order"].tolist(),
+            )
+
+    def bitmap(self, facet: str, value) -> np.ndarray:
+        """Bitmap for facet == value (case-insensitive); empty for an unknown value."""
+        if facet not in self._facet_rows:
+            raise ValueError(f"Unknown facet {facet!r}; expected one of {self.facet_order}")
+        values = _facet_values(value) or [""]
+        row = self._row.get((facet, values[0].lower()))
+        return self.empty if row is None else self.bits[row]
+
+    def _any_of(self, facet: str, values) -> np.ndarray:
+        values = [values] if isinstance(values, (str, bool)) else values
+        mask = self.empty
+        for value in values:
+            mask = mask | self.bitmap(facet, value)
+        return mask
+
+    def parse(self, expr: str) -> np.ndarray:
+        """
+        Bitmap for a boolean facet expression, e.g.
+        'region:Europe AND (overall_risk:low OR overall_risk:medium)
+         AND NOT top_risks:"terrorism risk"'.
+        Precedence: NOT > AND (explicit or implicit) > OR.
+        """
+        tokens = re.findall(r'\(|\)|[^\s():]+:"[^"]*"|[^\s()]+', expr)
+        pos = 0
+
+        def peek():
+            return tokens[pos] if pos < len(tokens) else None
+
+        def take():
+            nonlocal pos
+            pos += 1
+            return tokens[pos - 1]
+
+        def atom():
+            tok = peek()
+            if tok is None:
+                return self.all
+            if tok.upper() == "NOT":
+                take()
+                return self.all & ~atom()
+            if tok == "(":
+                take()
+                mask = expr_()
+                if peek() == ")":
+                    take()
+                return mask
+            take()
+            if ":" not in tok:
+                raise ValueError(f"Expected facet:value, got {tok!r}")
+            facet, value = tok.split(":", 1)
+            return self.bitmap(facet, value.strip('"'))
+
+        def conj():
+            mask = atom()
+            while peek() is not None and peek().upper() != "OR" and peek() != ")":
+                if peek().upper() == "AND":
+                    take()
+                mask = mask & atom()
+            return mask
+
+        def expr_():
+            mask = conj()
+            while peek() is not None and peek().upper() == "OR":
+                take()
+                mask = mask | conj()
+            return mask
+
+        return expr_() if tokens else self.all
+
+    def counts(self, mask: np.ndarray, facets=None) -> dict:
+        """{facet: {value: matching records with that value}} (zero counts dropped)."""
+        if facets:
+            rows = np.concatenate([self._facet_rows[f] for f in facets])
+            block = self.bits[rows]
+        else:
+            rows = np.arange(len(self.facets))
+            block = self.bits
+        # In place: one AND and one popcount pass over the matrix, no temporaries.
+        np.bitwise_and(block, mask, out=self._scratch[: len(rows)])
+        totals = _popcount(self._scratch[: len(rows)]).sum(axis=1, dtype=np.int64)
+        out = {f: {} for f in (facets or self.facet_order)}
+        for row, total in zip(rows, totals):
+            if total:
+                out[self.facets[row]][self.values[row]] = int(total)
+        return out
+
+    def count(self, mask: np.ndarray) -> int:
+        return int(_popcount(mask).sum())
+
+    def rows(self, mask: np.ndarray, limit: int = None) -> np.ndarray:
+        """Record positions set in `mask`, in index order (only the first `limit` are unpacked)."""
+        if limit is not None:
+            running = np.cumsum(_popcount(mask))
+            mask = mask[: int(np.searchsorted(running, limit)) + 1]
+        bits = np.unpackbits(mask.view(np.uint8), bitorder="little")[: self.n]
+        rows = np.flatnonzero(bits)
+        return rows if limit is None else rows[:limit]
+
+    def _result(self, mask: np.ndarray, facets: dict, limit):
+        rows = self.rows(mask, limit)
+        return {"count": self.count(mask), "codes": self.codes[rows].tolist(), "facets": facets}
+
+    def query(self, expr: str, limit: int = None) -> dict:
+        """Matches for a boolean facet expression, with facet counts over the matches."""
+        mask = self.parse(expr)
+        return self._result(mask, self.counts(mask), limit)
+
+    def select(self, filters: dict = None, limit: int = None) -> dict:
+        """
+        Checkbox-style filtering: values within a facet are ORed, facets are
+        ANDed. Each facet's counts are taken under every *other* facet's
+        filter, so they show what ticking another value would add.
+        """
+        filters = {f: v for f, v in (filters or {}).items() if v not in (None, [], ())}
+        masks = {facet: self._any_of(facet, values) for facet, values in filters.items()}
+        mask = self.all
+        for m in masks.values():
+            mask = mask & m
+
+        facets = {}
+        for facet in self.facet_order:
+            others = self.all
+            for f, m in masks.items():
+                if f != facet:
+                    others = others & m
+            facets[facet] = self.counts(others, [facet])[facet]
+        return self._result(mask, facets, limit)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the facet bitmap index.")
+    parser.add_argument("query", nargs="?", default="",
+                        help='e.g. \'region:Europe AND NOT overall_risk:high\'')
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    index = FacetIndex.load()
+    start = time.perf_counter()
+    result = index.query(args.query, limit=args.limit)
+    elapsed = (time.perf_counter() - start) * 1e6
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    print(f"{result['count']} matches in {elapsed:.0f} µs")
+
+
+if __name__ == "__main__":
+    main()
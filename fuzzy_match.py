@@ -0,0 +1,302 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import unicodedata
+from collections import namedtuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves stay atomic, merges are best-effort.
+    fcntl = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CACHE_DIR = os.path.join(BASE_DIR, "data", "cache", "fuzzy")
+
+# Spellings too far apart for edit distance; keys are matched after _key().
+COUNTRY_ALIASES = {
+    "burma": "MM",  # Myanmar
+    "myanmar": "MM",
+    "east timor": "TL",  # Timor-Leste
+    "timor-leste": "TL",
+    "czech republic": "CZ",
+    "czechia": "CZ",
+    "russia": "RU",
+    "russian federation": "RU",
+    "south korea": "KR",
+    "republic of korea": "KR",
+    "north korea": "KP",
+    "democratic people's republic of korea": "KP",
+    "ivory coast": "CI",
+    "cote d'ivoire": "CI",
+    "cabo verde": "CV",
+    "cape verde": "CV",
+    "bahamas": "BS",
+    "gambia": "GM",
+    "mexico": "MX",
+    "democratic congo": "CD",
+    "democratic republic of the congo": "CD",
+    "dr congo": "CD",
+    "congo kinshasa": "CD",
+    "congo": "CG",  # ISO short name of the Republic of the Congo
+    "congo brazzaville": "CG",
+    "kyrgyz republic": "KG",
+    "turkiye": "TR",
+    "united states of america": "US",
+    "usa": "US",
+    "mainland china": "CN",
+    "swaziland": "SZ",
+    "macedonia": "MK",
+    "holy see": "VA",
+}
+
+DEFAULT_THRESHOLD = 0.8
+# The best candidate must beat the best candidate for a *different* code by
+# this much, otherwise the match is reported as ambiguous and not applied.
+MIN_MARGIN = 0.03
+
+# Folded before comparison so "St Lucia" / "Saint Lucia" and
+# "Trinidad & Tobago" / "Trinidad and Tobago" compare equal.
+TOKEN_MAP = {"st": "saint", "and": "", "the": "", "of": ""}
+
+Match = namedtuple("Match", ["query", "code", "candidate", "confidence", "method"])
+
+
+def _key(name) -> str:
+    """Accent-free, lowercase, punctuation-free form used for comparison."""
+    name = unicodedata.normalize("NFKD", str(name or ""))
+    name = "".join(ch for ch in name if not unicodedata.combining(ch)).lower()
+    tokens = (TOKEN_MAP.get(t, t) for t in re.sub(r"[^a-z0-9]+", " ", name).split())
+    return " ".join(t for t in tokens if t)
+
+
+def _trigrams(key: str):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _encode(strings, width):
+    """Strings -> (n, width) uint32 code-point matrix (0-padded) and lengths."""
+    out = np.zeros((len(strings), max(width, 1)), dtype=np.uint32)
+    lengths = np.zeros(len(strings), dtype=np.int64)
+    for i, s in enumerate(strings):
+        out[i, :len(s)] = [ord(ch) for ch in s]
+        lengths[i] = len(s)
+    return out, lengths
+
+
+def edit_distance_many(query: str, cand: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """
+    Edit distance (with adjacent transpositions) from `query` to every row of
+    an encoded candidate matrix.
+
+    One pass per query character, vectorized across candidates and columns:
+    deletions, substitutions and transpositions come from earlier rows, and
+    insertions are resolved with a running minimum of (D[k] - k) along the row.
+    """
+    n, width = cand.shape
+    cols = np.arange(width + 1)
+    prev = np.broadcast_to(cols, (n, width + 1)).copy()
+    before = None
+    for i, ch in enumerate(query, 1):
+        code = ord(ch)
+        cost = (cand != code).astype(np.int64)
+        row = np.empty_like(prev)
+        row[:, 0] = i
+        row[:, 1:] = np.minimum(prev[:, 1:] + 1, prev[:, :-1] + cost)
+        if before is not None:
+            swap = (cand[:, :-1] == code) & (cand[:, 1:] == ord(query[i - 2]))
+            row[:, 2:] = np.where(swap, np.minimum(row[:, 2:], before[:, :-2] + 1), row[:, 2:])
+        before = prev
+        prev = np.minimum.accumulate(row - cols, axis=1) + cols
+    return prev[np.arange(n), lengths]
+
+
+class FuzzyMatcher:
+    """
+    Resolve free-form country names to ISO2 codes.
+
+    Exact hits (after accent/punctuation folding) are free. Everything else is
+    blocked first - candidates sharing the first token, or enough character
+    trigrams, optionally restricted to the same region - and only that block
+    is scored with a vectorized edit distance, on both the raw and the
+    token-sorted form. Decisions (including misses) are cached per namespace
+    under data/cache/fuzzy/ and reused while the candidate list is unchanged.
+    """
+
+    def __init__(self, candidates: dict, regions: dict = None, namespace: str = "default",
+                 threshold: float = DEFAULT_THRESHOLD, aliases: bool = True, cache_dir: str = None):
+        entries = {}
+        for name, code in candidates.items():
+            k = _key(name)
+            if k:
+                entries.setdefault(k, code)
+        if aliases:
+            codes = set(candidates.values())
+            for alias, code in COUNTRY_ALIASES.items():
+                if code in codes:
+                    entries.setdefault(_key(alias), code)
+
+        self.keys = sorted(entries)
+        self.codes = np.array([entries[k] for k in self.keys], dtype=object)
+        self.exact = {k: i for i, k in enumerate(self.keys)}
+        self.regions = regions or {}
+        self.threshold = threshold
+
+        width = max((len(k) for k in self.keys), default=1)
+        self.sorted_keys = [" ".join(sorted(k.split())) for k in self.keys]
+        self.enc, self.lengths = _encode(self.keys, width)
+        self.enc_sorted, _ = _encode(self.sorted_keys, width)
+
+        self.by_first = {}
+        self.by_gram = {}
+        for i, k in enumerate(self.keys):
+            self.by_first.setdefault(k.split()[0], []).append(i)
+            for g in _trigrams(k):
+                self.by_gram.setdefault(g, []).append(i)
+        self.by_gram = {g: np.array(ids) for g, ids in self.by_gram.items()}
+
+        self.namespace = namespace
+        self.cache_path = os.path.join(cache_dir or CACHE_DIR, f"{namespace}.json")
+        self.signature = hashlib.sha256(
+            "|".join(f"{k}={c}" for k, c in zip(self.keys, self.codes)).encode("utf-8")
+        ).hexdigest()[:16]
+        self.decisions = self._load_cache()
+        self._dirty = False
+
+    def _load_cache(self):
+        if not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if data.get("signature") != self.signature:
+            return {}
+        return data.get("decisions", {})
+
+    def save(self):
+        """
+        Persist decisions, merged with whatever another process saved for the
+        same candidates meanwhile. Saves are serialized with a lock file
+        (where fcntl exists) and each writes its own temp file, so concurrent
+        savers neither clobber each other's entries nor race on the rename.
+        """
+        if not self._dirty:
+            return
+        cache_dir = os.path.dirname(self.cache_path)
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(self.cache_path + ".lock", "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            self.decisions = {**self._load_cache(), **self.decisions}
+            fd, tmp = tempfile.mkstemp(dir=cache_dir, prefix=f".{self.namespace}.", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(
+                        {"signature": self.signature, "decisions": self.decisions},
+                        f,
+                        ensure_ascii=False,
+                        indent=2,
+                        sort_keys=True,
+                    )
+                os.replace(tmp, self.cache_path)
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+        self._dirty = False
+
+    def _block(self, key: str, region: str = None) -> np.ndarray:
+        grams = _trigrams(key)
+        posting = [self.by_gram[g] for g in grams if g in self.by_gram]
+        ids = np.array([], dtype=np.int64)
+        if posting:
+            counts = np.bincount(np.concatenate(posting), minlength=len(self.keys))
+            ids = np.flatnonzero(counts >= max(2, int(0.3 * len(grams))))
+        first = self.by_first.get(key.split()[0], [])
+        ids = np.union1d(ids, np.array(first, dtype=np.int64))
+        if region and self.regions:
+            same = np.array([self.regions.get(c) == region for c in self.codes[ids]], dtype=bool)
+            if same.any():
+                ids = ids[same]
+        return ids
+
+    def _score(self, key: str, region: str = None) -> Match:
+        ids = self._block(key, region)
+        if not len(ids):
+            return Match(key, None, None, 0.0, "none")
+
+        lengths = self.lengths[ids]
+        denom = np.maximum(lengths, len(key)).astype(float)
+        d_raw = edit_distance_many(key, self.enc[ids], lengths)
+        d_tok = edit_distance_many(" ".join(sorted(key.split())), self.enc_sorted[ids], lengths)
+        scores = 1.0 - np.minimum(d_raw, d_tok) / denom
+
+        order = np.argsort(-scores, kind="stable")
+        best = ids[order[0]]
+        conf = float(scores[order[0]])
+        others = scores[self.codes[ids] != self.codes[best]]
+        runner_up = float(others.max()) if len(others) else 0.0
+
+        if conf < self.threshold:
+            return Match(key, None, self.keys[best], conf, "below_threshold")
+        if conf - runner_up < MIN_MARGIN:
+            return Match(key, None, self.keys[best], conf, "ambiguous")
+        return Match(key, self.codes[best], self.keys[best], conf, "fuzzy")
+
+    def match(self, name, region: str = None) -> Match:
+        key = _key(name)
+        if not key:
+            return Match(key, None, None, 0.0, "none")
+        if key in self.exact:
+            return Match(key, self.codes[self.exact[key]], key, 1.0, "exact")
+
+        cache_key = f"{key}|{region}" if region else key
+        hit = self.decisions.get(cache_key)
+        if hit is not None:
+            return Match(key, hit["code"], hit["candidate"], hit["confidence"], hit["method"])
+
+        m = self._score(key, region)
+        self.decisions[cache_key] = {
+            "code": m.code,
+            "candidate": m.candidate,
+            "confidence": round(m.confidence, 4),
+            "method": m.method,
+        }
+        self._dirty = True
+        return m
+
+    def match_many(self, names, regions=None, save: bool = True):
+        """Match a batch of names (optionally with regions) and persist new decisions."""
+        regions = regions if regions is not None else [None] * len(names)
+        out = [self.match(n, r) for n, r in zip(names, regions)]
+        if save:
+            self.save()
+        return out
+
+    def update(self, decisions: dict):
+        """Adopt decisions made by another matcher over the same candidates."""
+        if decisions:
+            self.decisions.update(decisions)
+            self._dirty = True
+
+
+def report(matches, label: str):
+    """Print the fuzzy decisions worth reviewing: applied matches and misses."""
+    applied = [m for m in matches if m.method == "fuzzy"]
+    missed = [m for m in matches if m.code is None and m.query]
+    if applied:
+        pairs = ", ".join(f"{m.query} -> {m.code} ({m.confidence:.2f})" for m in applied[:10])
+        print(f"Fuzzy-matched {label} ({len(applied)}): {pairs}")
+    if missed:
+        pairs = ", ".join(
+            f"{m.query} ({m.method}{f', best {m.candidate} {m.confidence:.2f}' if m.candidate else ''})"
+            for m in missed[:10]
+        )
+        print(f"Unmatched {label} ({len(missed)}): {pairs}")
@@ -0,0 +1,311 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+
+import build_country_safety
+import run_full_analysis
+from advisories import FILE_ADAPTERS, fetch_travel_advisories
+from country_reference import get_country_reference
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CACHE_DIR = os.path.join(BASE_DIR, "data", "cache")
+STATE_FILE = "source_state.json"
+# Key in the state file for downstream jobs invalidated but not yet run successfully.
+PENDING_JOBS = "_pending_jobs"
+
+HOUR = 3600
+DAY = 24 * HOUR
+# A failed refresh is retried after this long (or the TTL, if shorter).
+RETRY_AFTER = 15 * 60
+
+
+def _fetch_rest_countries():
+    """Refresh the shared country_reference cache, which the CLI builds read too."""
+    return get_country_reference(refresh=True, fallback=False).items
+
+
+def _fetch_homicide():
+    df = run_full_analysis.scrape_homicide_rates()
+    if df.empty:
+        raise RuntimeError("Wikipedia homicide table could not be read.")
+    return df
+
+
+def _fetch_state_dept():
+    records = fetch_travel_advisories()
+    if not records:
+        raise RuntimeError("State Dept advisory API returned no records.")
+    return records
+
+
+def _load_foreign_advisories():
+    """Raw UK / Canada / Australia exports; parsing is cached by the adapters themselves."""
+    return {cls.name: cls().load() for cls in FILE_ADAPTERS}
+
+
+# Source name -> refresh cadence, fetcher and the downstream jobs it feeds.
+# "store": False means the payload already lives in its own cache and is
+# only hashed here.
+SOURCES = {
+    "rest_countries": {
+        "ttl": 30 * DAY,
+        "fetch": _fetch_rest_countries,
+        "jobs": ["safety_build", "analysis"],
+        "store": False,
+    },
+    "homicide": {
+        "ttl": 90 * DAY,
+        "fetch": _fetch_homicide,
+        "jobs": ["analysis"],
+    },
+    "gpi": {
+        "ttl": 365 * DAY,
+        "fetch": run_full_analysis.load_gpi_frame,
+        "jobs": ["analysis"],
+    },
+    "us_advisories_manual": {
+        "ttl": 10 * 60,
+        "fetch": run_full_analysis.load_advisory_frame,
+        "jobs": ["analysis"],
+    },
+    "state_dept_advisories": {
+        "ttl": DAY,
+        "fetch": _fetch_state_dept,
+        "jobs": ["safety_build"],
+    },
+    "foreign_advisories": {
+        "ttl": DAY,
+        "fetch": _load_foreign_advisories,
+        "jobs": ["safety_build"],
+    },
+}
+
+# processed.json feeds the analysis summary, so the safety build runs first.
+JOB_ORDER = ["safety_build", "analysis"]
+
+
+def _serialize(payload) -> str:
+    """Canonical text form of a source payload, used for both hashing and caching."""
+    if isinstance(payload, pd.DataFrame):
+        return json.dumps({"__frame__": payload.to_csv(index=False)})
+    return json.dumps(payload, sort_keys=True, ensure_ascii=False)
+
+
+def _restore(value):
+    if isinstance(value, dict) and set(value) == {"__frame__"}:
+        return pd.read_csv(io.StringIO(value["__frame__"]), keep_default_na=False, na_values=[""])
+    return value
+
+
+def _now() -> float:
+    return time.time()
+
+
+def _iso(ts) -> str:
+    if ts is None:
+        return "never"
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%d %H:%M:%SZ")
+
+
+class IngestScheduler:
+    """
+    Per-source freshness tracking for a continuously running ingestion daemon.
+
+    Every source has its own TTL. A tick refreshes only the sources whose TTL
+    has expired, caches the payload under data/cache/, and re-runs a
+    downstream job only if one of its sources came back with different
+    content (by hash). Invalidated jobs are recorded in the state file before
+    they run and cleared only once they succeed, so a failed job is retried
+    on every tick until it goes through.
+    """
+
+    def __init__(self, cache_dir: str = None, sources: dict = None, jobs: dict = None):
+        self.cache_dir = cache_dir or CACHE_DIR
+        self.sources = sources or SOURCES
+        self.jobs = jobs or {
+            "safety_build": self._run_safety_build,
+            "analysis": self._run_analysis,
+        }
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.state = self._load_state()
+
+    def _state_path(self):
+        return os.path.join(self.cache_dir, STATE_FILE)
+
+    def _cache_path(self, name):
+        return os.path.join(self.cache_dir, f"{name}.json")
+
+    def _load_state(self):
+        if os.path.exists(self._state_path()):
+            with open(self._state_path(), "r", encoding="utf-8") as f:
+                return json.load(f)
+        return {}
+
+    def _save_state(self):
+        tmp = self._state_path() + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp, self._state_path())
+
+    @property
+    def pending_jobs(self) -> list:
+        return list(self.state.get(PENDING_JOBS, []))
+
+    def next_due(self, name) -> float:
+        st = self.state.get(name) or {}
+        if st.get("retry_at"):
+            return st["retry_at"]
+        if st.get("fetched_at") is None:
+            return 0.0
+        return st["fetched_at"] + self.sources[name]["ttl"]
+
+    def stale_sources(self, now: float = None):
+        now = _now() if now is None else now
+        return [name for name in self.sources if self.next_due(name) <= now]
+
+    def _set_pending(self, pending):
+        self.state[PENDING_JOBS] = [job for job in JOB_ORDER if job in pending] + sorted(
+            set(pending) - set(JOB_ORDER)
+        )
+        self._save_state()
+
+    def cached(self, name):
+        """Last good payload for a source, or None if it was never fetched."""
+        path = self._cache_path(name)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return _restore(json.load(f))
+
+    def refresh(self, name, now: float = None) -> bool:
+        """Fetch one source. Returns True when its content changed."""
+        now = _now() if now is None else now
+        spec = self.sources[name]
+        st = self.state.setdefault(name, {})
+        try:
+            text = _serialize(spec["fetch"]())
+        except Exception as e:
+            st["last_error"] = str(e)
+            st["retry_at"] = now + min(spec["ttl"], RETRY_AFTER)
+            print(f"[WARN] Refresh of {name} failed: {e}")
+            return False
+
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        changed = digest != st.get("content_hash")
+        if changed and spec.get("store", True):
+            tmp = self._cache_path(name) + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp, self._cache_path(name))
+            st["content_hash"] = digest
+            st["changed_at"] = now
+        st["fetched_at"] = now
+        st.pop("retry_at", None)
+        st.pop("last_error", None)
+        return changed
+
+    def tick(self, now: float = None, force=()):
+        """Refresh stale (or forced) sources and run the jobs they invalidated."""
+        now = _now() if now is None else now
+        due = sorted(set(self.stale_sources(now)) | set(force))
+        changed = [name for name in due if self.refresh(name, now)]
+
+        # Persisted before anything runs: content hashes are already saved, so
+        # a job lost here would otherwise wait for the next upstream change.
+        pending = set(self.pending_jobs) | {job for name in changed for job in self.sources[name]["jobs"]}
+        pending &= set(self.jobs)
+        self._set_pending(pending)
+
+        ran = []
+        for job in self.pending_jobs:
+            try:
+                self.jobs[job]()
+            except Exception as e:
+                print(f"[WARN] Job {job} failed (will retry next tick): {e}")
+                continue
+            ran.append(job)
+            pending.discard(job)
+            self._set_pending(pending)
+        return {"refreshed": due, "changed": changed, "jobs": ran, "pending": self.pending_jobs}
+
+    def seconds_until_next(self, now: float = None) -> float:
+        now = _now() if now is None else now
+        wait = max(0.0, min(self.next_due(name) for name in self.sources) - now)
+        return min(wait, RETRY_AFTER) if self.pending_jobs else wait
+
+    # REST Countries comes from country_reference's cache (refreshed by the
+    # rest_countries source), the same table the CLI builds use.
+    def _run_safety_build(self):
+        build_country_safety.main(
+            advisory_records=self.cached("state_dept_advisories"),
+        )
+
+    def _run_analysis(self):
+        ok = run_full_analysis.run_analysis(
+            df_homicide=self.cached("homicide"),
+            df_gpi=self.cached("gpi"),
+            df_advisory=self.cached("us_advisories_manual"),
+        )
+        if not ok:
+            # Outputs may be missing or unvalidated; keep the job pending.
+            raise RuntimeError("analysis stopped early or failed validation")
+
+    def status(self):
+        rows = []
+        now = _now()
+        for name, spec in self.sources.items():
+            st = self.state.get(name) or {}
+            rows.append(
+                {
+                    "source": name,
+                    "ttl_h": round(spec["ttl"] / HOUR, 2),
+                    "fetched": _iso(st.get("fetched_at")),
+                    "changed": _iso(st.get("changed_at")),
+                    "due_in_h": round(max(0.0, self.next_due(name) - now) / HOUR, 2),
+                    "error": st.get("last_error", ""),
+                }
+            )
+        return pd.DataFrame(rows)
+
+    def run_forever(self, max_sleep: float = HOUR):
+        print("Ingestion daemon started.")
+        try:
+            while True:
+                report = self.tick()
+                if report["refreshed"] or report["jobs"]:
+                    print(
+                        f"[{_iso(_now())}] refreshed={report['refreshed']} "
+                        f"changed={report['changed']} jobs={report['jobs']} pending={report['pending']}"
+                    )
+                time.sleep(min(max_sleep, max(1.0, self.seconds_until_next())))
+        except KeyboardInterrupt:
+            print("Ingestion daemon stopped.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="TravelSafe ingestion daemon with per-source TTLs.")
+    parser.add_argument("--once", action="store_true", help="Run a single tick and exit")
+    parser.add_argument("--status", action="store_true", help="Print source freshness and exit")
+    parser.add_argument("--force", nargs="*", default=[], choices=list(SOURCES), help="Refresh these sources now")
+    args = parser.parse_args(argv)
+
+    scheduler = IngestScheduler()
+    if args.status:
+        print(scheduler.status().to_string(index=False))
+        if scheduler.pending_jobs:
+            print(f"Pending jobs (retried next tick): {', '.join(scheduler.pending_jobs)}")
+    elif args.once or args.force:
+        print(scheduler.tick(force=args.force))
+    else:
+        scheduler.run_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+import argparse
+import os
+import sys
+import time
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+from processed_store import open_processed
+from run_full_analysis import RISK_TIER_LABELS
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+RISK_SCORE_KEYS = ["crime", "political", "health", "natural_disaster"]
+
+# ISO2 codes are packed into a 26*26 slot table so a whole column of codes
+# can be turned into dense row numbers with one vectorized gather.
+_ISO2_SLOTS = 26 * 26
+
+
+def iso2_slots(codes) -> np.ndarray:
+    """Vectorized ISO2 -> slot number (0..675), -1 for anything that isn't two letters."""
+    codes = pd.Series(codes, dtype="object").fillna("").astype(str).str.strip().str.upper()
+    valid = codes.str.len().to_numpy() == 2
+    raw = codes.where(valid, "@@").to_numpy().astype("S2")
+    letters = np.frombuffer(raw.tobytes(), dtype=np.uint8).reshape(-1, 2).astype(np.int32) - 65
+    valid &= ((letters >= 0) & (letters < 26)).all(axis=1)
+    slots = letters[:, 0] * 26 + letters[:, 1]
+    return np.where(valid, slots, -1)
+
+
+class CountryRiskTable:
+    """
+    Dense per-country arrays (TSI, tier rank, 1–5 risk scores) keyed by ISO2.
+
+    Row 0 is a sentinel "unknown country" row filled with NaN so unknown
+    codes can flow through the same gathers as known ones.
+    """
+
+    def __init__(self, codes, tsi, tiers, risk_scores):
+        codes = [str(c).upper() for c in codes]
+        n = len(codes) + 1
+        self.codes = np.array(["??"] + codes, dtype=object)
+        self.tsi = np.concatenate([[np.nan], np.asarray(tsi, dtype=float)])
+
+        tier_rank = {label: i for i, label in enumerate(RISK_TIER_LABELS)}
+        ranks = [tier_rank.get(t, -1) for t in tiers]
+        self.tier_rank = np.concatenate([[-1], np.asarray(ranks, dtype=np.int8)])
+
+        self.risk = np.full((n, len(RISK_SCORE_KEYS)), np.nan)
+        self.risk[1:] = np.asarray(risk_scores, dtype=float).reshape(-1, len(RISK_SCORE_KEYS))
+
+        self.slot_to_row = np.zeros(_ISO2_SLOTS, dtype=np.int32)
+        slots = iso2_slots(codes)
+        ok = slots >= 0
+        self.slot_to_row[slots[ok]] = np.arange(1, n, dtype=np.int32)[ok]
+
+    def __len__(self):
+        return len(self.codes) - 1
+
+    @classmethod
+    def from_outputs(cls, results_csv: str = None, processed_json: str = None):
+        """Load TSI/tiers from the results CSV and risk_scores from processed.json."""
+        results_csv = results_csv or os.path.join(
+            BASE_DIR, "results", "TravelSafe_Final_Analysis.csv"
+        )
+        processed_json = processed_json or os.path.join(BASE_DIR, "data", "processed.json")
+
+        df = pd.read_csv(
+            results_csv,
+            usecols=["code_2", "TSI", "risk_tier"],
+            keep_default_na=False,
+            na_values=[""],
+        )
+        df = df.drop_duplicates(subset=["code_2"])
+
+        safety = open_processed(processed_json)
+
+        risk = np.full((len(df), len(RISK_SCORE_KEYS)), np.nan)
+        for row, code in enumerate(df["code_2"]):
+            scores = (safety.get(code) or {}).get("risk_scores") or {}
+            for col, key in enumerate(RISK_SCORE_KEYS):
+                if scores.get(key) is not None:
+                    risk[row, col] = scores[key]
+
+        return cls(df["code_2"], df["TSI"], df["risk_tier"], risk)
+
+    def rows_for(self, codes) -> np.ndarray:
+        slots = iso2_slots(codes)
+        return np.where(slots >= 0, self.slot_to_row[np.maximum(slots, 0)], 0)
+
+
+def explode_stops(chunk: pd.DataFrame, stops_col: str = "stops", sep: str = "|"):
+    """
+    Split "FR:3|IT:2|ES" style itineraries into flat (owner, code, days) arrays.
+
+    Missing day counts default to 1. Empty itineraries produce no stops.
+    """
+    values = chunk[stops_col].fillna("").to_numpy(dtype=object)
+    stops = [[p for p in str(v).split(sep) if p] for v in values]
+    lengths = np.fromiter(map(len, stops), dtype=np.int64, count=len(stops))
+    owner = np.repeat(np.arange(len(stops)), lengths)
+
+    parts = [p.partition(":") for p in chain.from_iterable(stops)]
+    codes = np.array([p[0] for p in parts], dtype=object)
+    days = pd.to_numeric(pd.Series([p[2] for p in parts], dtype=object), errors="coerce")
+    days = days.fillna(1.0).to_numpy(dtype=float)
+    return owner, codes, days
+
+
+def score_chunk(chunk: pd.DataFrame, table: CountryRiskTable,
+                id_col: str = "itinerary_id", stops_col: str = "stops") -> pd.DataFrame:
+    """Aggregate trip risk for every itinerary in a chunk with segment reductions."""
+    chunk = chunk.reset_index(drop=True)
+    n = len(chunk)
+    owner, codes, days = explode_stops(chunk, stops_col)
+
+    out = pd.DataFrame({id_col: chunk[id_col] if id_col in chunk.columns else np.arange(n)})
+    out["n_stops"] = np.bincount(owner, minlength=n)
+    out["total_days"] = np.bincount(owner, weights=days, minlength=n)
+
+    rows = table.rows_for(codes)
+    known = rows > 0
+    out["unknown_stops"] = np.bincount(owner, weights=~known, minlength=n).astype(int)
+
+    tsi = table.tsi[rows]
+    has_tsi = ~np.isnan(tsi)
+    w = np.where(has_tsi, days, 0.0)
+    weight_sum = np.bincount(owner, weights=w, minlength=n)
+    weighted = np.bincount(owner, weights=np.where(has_tsi, tsi, 0.0) * w, minlength=n)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out["weighted_tsi"] = np.where(weight_sum > 0, weighted / weight_sum, np.nan)
+
+    # Stops are contiguous per itinerary after explode, so reduceat over the
+    # first stop of each non-empty itinerary gives per-trip extrema.
+    starts = np.flatnonzero(np.r_[True, owner[1:] != owner[:-1]]) if len(owner) else []
+    trip = owner[starts] if len(owner) else np.array([], dtype=int)
+
+    def segment(ufunc, values, fill):
+        col = np.full(n, fill, dtype=float)
+        if len(owner):
+            col[trip] = ufunc.reduceat(values, starts)
+        return col
+
+    out["min_tsi"] = segment(np.fmin, tsi, np.nan)
+    out["max_tsi"] = segment(np.fmax, tsi, np.nan)
+
+    worst = segment(np.maximum, table.tier_rank[rows].astype(float), -1).astype(int)
+    labels = np.array(RISK_TIER_LABELS + [None], dtype=object)
+    out["worst_tier"] = labels[np.where(worst >= 0, worst, len(RISK_TIER_LABELS))]
+
+    risk = table.risk[rows]
+    for col, key in enumerate(RISK_SCORE_KEYS):
+        out[f"max_{key}"] = segment(np.fmax, risk[:, col], np.nan)
+
+    return out
+
+
+def score_itineraries(source, out_path: str, table: CountryRiskTable = None,
+                      chunksize: int = 250_000, id_col: str = "itinerary_id",
+                      stops_col: str = "stops") -> int:
+    """
+    Stream itineraries from a CSV path or file object and append scores to out_path.
+
+    Only one chunk is held in memory at a time. Returns the number of
+    itineraries scored.
+    """
+    table = table or CountryRiskTable.from_outputs()
+    total = 0
+    first = True
+    reader = pd.read_csv(
+        source,
+        chunksize=chunksize,
+        dtype={stops_col: str},
+        keep_default_na=False,
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w", encoding="utf-8", newline="") as out:
+        for chunk in reader:
+            scored = score_chunk(chunk, table, id_col=id_col, stops_col=stops_col)
+            scored.to_csv(out, index=False, header=first)
+            first = False
+            total += len(scored)
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk itinerary risk scoring.")
+    parser.add_argument("input", help="CSV with itinerary_id,stops ('-' for stdin)")
+    parser.add_argument("-o", "--output", default=os.path.join(BASE_DIR, "results", "itinerary_scores.csv"))
+    parser.add_argument("--chunksize", type=int, default=250_000)
+    parser.add_argument("--id-col", default="itinerary_id")
+    parser.add_argument("--stops-col", default="stops")
+    args = parser.parse_args(argv)
+
+    table = CountryRiskTable.from_outputs()
+    print(f"Loaded risk table for {len(table)} countries.")
+    source = sys.stdin if args.input == "-" else args.input
+
+    start = time.perf_counter()
+    total = score_itineraries(
+        source,
+        args.output,
+        table=table,
+        chunksize=args.chunksize,
+        id_col=args.id_col,
+        stops_col=args.stops_col,
+    )
+    elapsed = time.perf_counter() - start
+    print(f"✓ Scored {total} itineraries in {elapsed:.1f}s. Saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
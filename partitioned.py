@@ -0,0 +1,200 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from fuzzy_match import FuzzyMatcher
+from run_full_analysis import (
+    apply_tsi,
+    assign_risk_tiers,
+    fit_tsi,
+    join_sources,
+    normalize_name,
+    sketch_tsi_inputs,
+    source_tables,
+)
+
+PARTITION_BY = ("hash", "region")
+
+# Read-only tables each join worker receives once, at pool start.
+_SHARED = {}
+# Per-process matchers, keyed by (namespace, candidate signature), so each
+# worker builds a namespace's candidate index once rather than per chunk.
+_MATCHERS = {}
+
+
+def _init_worker(shared):
+    _SHARED.clear()
+    _SHARED.update(shared)
+
+
+def _normalize_chunk(names):
+    return [normalize_name(n) for n in names]
+
+
+def _match_chunk(args):
+    """Fuzzy-match names in a worker; returns matches plus the new decisions."""
+    candidates, namespace, signature, cache_dir, names = args
+    matcher = _MATCHERS.get((namespace, signature))
+    if matcher is None:
+        matcher = FuzzyMatcher(candidates, namespace=namespace, cache_dir=cache_dir)
+        _MATCHERS[(namespace, signature)] = matcher
+    loaded = set(matcher.decisions)
+    matches = matcher.match_many(names, save=False)
+    return matches, {k: v for k, v in matcher.decisions.items() if k not in loaded}
+
+
+def _join_partition(part):
+    return join_sources(part, _SHARED["tables"])
+
+
+def _sketch_partition(part):
+    return sketch_tsi_inputs(part)
+
+
+def _score_partition(args):
+    part, params = args
+    return apply_tsi(part, params)
+
+
+def _csv_chunk(args):
+    df, header = args
+    return df.to_csv(index=False, header=header)
+
+
+def partition_rows(df: pd.DataFrame, by: str = "hash", n: int = 8):
+    """
+    Row positions for each partition, each in ascending order.
+
+    "hash" spreads countries evenly by a hash of code_2. "region" keeps a
+    region's countries together, splitting large regions into chunks of
+    about len(df) / n so one region can't hold up the pool.
+    """
+    if by not in PARTITION_BY:
+        raise ValueError(f"partition_by must be one of {PARTITION_BY}, got {by!r}")
+    n = max(1, n)
+    if by == "hash":
+        ids = pd.util.hash_pandas_object(df["code_2"].astype(str), index=False).to_numpy() % n
+        parts = [np.flatnonzero(ids == i) for i in range(n)]
+    else:
+        groups, _ = pd.factorize(df["region"].fillna("").astype(str))
+        target = max(1, -(-len(df) // n))
+        parts = []
+        for g in range(groups.max() + 1 if len(groups) else 0):
+            rows = np.flatnonzero(groups == g)
+            parts.extend(np.array_split(rows, -(-len(rows) // target)))
+    return [p for p in parts if len(p)]
+
+
+def _gather(frames, parts) -> pd.DataFrame:
+    """Concatenate partition outputs back into the original row order."""
+    df = pd.concat(frames, ignore_index=True)
+    order = np.argsort(np.concatenate(parts), kind="stable")
+    return df.take(order).reset_index(drop=True)
+
+
+class PartitionedExecutor:
+    """
+    Steps 5–7 of run_analysis spread over a process pool.
+
+    Row-wise work runs per partition: name normalization, fuzzy matching of
+    leftovers, the source joins, the quantile sketches behind the TSI
+    scales, TSI scoring and CSV formatting. Only the global steps are
+    reductions in the parent: the source lookup tables (built once and
+    shared read-only with every join worker), merging the partition
+    sketches into medians/min-max, and KMeans. Partition outputs are
+    gathered back into input order, and the TSI medians are exact (see
+    fit_tsi), so results match the serial path row for row whatever the
+    worker count.
+    """
+
+    def __init__(self, workers: int = None, partition_by: str = "hash"):
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.partition_by = partition_by
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def _chunks(self, seq):
+        return [c for c in np.array_split(np.asarray(seq, dtype=object), self.workers * 4) if len(c)]
+
+    def normalize(self, names: pd.Series) -> pd.Series:
+        """normalize_name over the distinct names, fanned out in chunks."""
+        codes, uniques = pd.factorize(names, use_na_sentinel=True)
+        normed = []
+        for chunk in self.pool.map(_normalize_chunk, self._chunks(uniques)):
+            normed.extend(chunk)
+        lookup = np.array(normed + [""], dtype=object)
+        return pd.Series(lookup[codes], index=names.index, dtype=object)
+
+    def match_many(self, matcher: FuzzyMatcher, names):
+        """Score names in workers, then adopt their decisions into `matcher` and save once."""
+        candidates = dict(zip(matcher.keys, matcher.codes))
+        cache_dir = os.path.dirname(matcher.cache_path)
+        tasks = [
+            (candidates, matcher.namespace, matcher.signature, cache_dir, list(c))
+            for c in self._chunks(names)
+        ]
+        matches = []
+        for chunk_matches, decisions in self.pool.map(_match_chunk, tasks):
+            matches.extend(chunk_matches)
+            matcher.update(decisions)
+        matcher.save()
+        return matches
+
+    def merge_sources(self, df_countries, df_homicide, df_gpi, df_advisory) -> pd.DataFrame:
+        """Partitioned equivalent of run_full_analysis.merge_sources."""
+        df_master = df_countries.drop_duplicates(subset=["code_2"]).reset_index(drop=True)
+        df_master["name_norm"] = self.normalize(df_master["country"])
+
+        tables = source_tables(
+            df_master, df_homicide, df_gpi, df_advisory,
+            normalize=self.normalize, match_many=self.match_many,
+        )
+
+        parts = partition_rows(df_master, self.partition_by, self.workers)
+        with ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_init_worker, initargs=({"tables": tables},)
+        ) as pool:
+            frames = list(pool.map(_join_partition, [df_master.iloc[p] for p in parts]))
+        return _gather(frames, parts)
+
+    def compute_tsi(self, df_master: pd.DataFrame) -> pd.DataFrame:
+        """Sketch partitions in parallel, merge the sketches into the scales, then score."""
+        parts = partition_rows(df_master, self.partition_by, self.workers)
+        sketches = None
+        for part_sketches in self.pool.map(_sketch_partition, [df_master.iloc[p] for p in parts]):
+            sketches = part_sketches if sketches is None else sketches.merge(part_sketches)
+        params = fit_tsi(df_master, sketches)
+        frames = list(self.pool.map(_score_partition, [(df_master.iloc[p], params) for p in parts]))
+        return _gather(frames, parts)
+
+    def assign_risk_tiers(self, df_model: pd.DataFrame) -> pd.DataFrame:
+        # Clustering needs every row at once; it runs in the parent on the
+        # three tier features only.
+        return assign_risk_tiers(df_model)
+
+    def to_csv(self, df: pd.DataFrame, path: str):
+        """Format contiguous row chunks in parallel and write them in order."""
+        bounds = np.unique(np.linspace(0, len(df), self.workers * 4 + 1).astype(int))
+        tasks = [(df.iloc[lo:hi], i == 0) for i, (lo, hi) in enumerate(zip(bounds, bounds[1:]))]
+        tasks = tasks or [(df, True)]
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            for text in self.pool.map(_csv_chunk, tasks):
+                f.write(text)
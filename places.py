@@ -0,0 +1,394 @@
+import argparse
+import os
+import re
+import unicodedata
+from html import unescape
+
+import numpy as np
+import pandas as pd
+
+from advisories import build_advisory_index, fetch_travel_advisories
+from country_reference import get_country_reference
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+PLACES_PATH = os.path.join(BASE_DIR, "data", "places.csv")
+REGIONAL_ADVISORIES_PATH = os.path.join(BASE_DIR, "data", "advisories", "regional_levels.csv")
+PLACES_OUTPUT = os.path.join(BASE_DIR, "results", "TravelSafe_Places.csv")
+
+# Hierarchy levels. Place keys encode the path:
+#   "MX"           country (ISO2)
+#   "MX-COL"       admin-1 (ISO 3166-2 style: country + subdivision code)
+#   "MX-COL/4013"  city (admin-1 key + GeoNames id)
+COUNTRY, ADMIN1, CITY = 0, 1, 2
+
+PLACE_COLUMNS = ["place_key", "parent_key", "level", "name", "population", "lat", "lng"]
+
+# State Dept summaries list sub-national exceptions under these headings.
+REGIONAL_HEADINGS = [
+    (4, r"do not travel to"),
+    (3, r"reconsider travel to"),
+    (2, r"exercise increased caution (?:in|when traveling to)"),
+]
+
+
+def parent_key_of(key: str) -> str:
+    """Parent place key derived from the key itself ("" for countries)."""
+    if "/" in key:
+        return key.rsplit("/", 1)[0]
+    if "-" in key:
+        return key.split("-", 1)[0]
+    return ""
+
+
+def places_from_geonames(admin1_path: str, cities_path: str, min_population: int = 0) -> pd.DataFrame:
+    """
+    Admin-1 and city rows from GeoNames dumps (admin1CodesASCII.txt and
+    citiesNNN.txt). Cities without an admin-1 code hang off their country.
+    """
+    admin1 = pd.read_csv(
+        admin1_path, sep="\t", header=None, quoting=3, dtype=str,
+        names=["code", "name", "asciiname", "geonameid"], keep_default_na=False,
+    )
+    parts = admin1["code"].str.split(".", n=1, expand=True)
+    df_admin1 = pd.DataFrame(
+        {
+            "place_key": parts[0] + "-" + parts[1],
+            "parent_key": parts[0],
+            "level": ADMIN1,
+            "name": admin1["asciiname"].where(admin1["asciiname"] != "", admin1["name"]),
+            "population": np.nan,
+            "lat": np.nan,
+            "lng": np.nan,
+        }
+    )
+
+    cities = pd.read_csv(
+        cities_path, sep="\t", header=None, quoting=3, dtype=str, keep_default_na=False,
+        usecols=[0, 2, 4, 5, 8, 10, 14],
+        names=["geonameid", "asciiname", "lat", "lng", "country", "admin1", "population"],
+    )
+    population = pd.to_numeric(cities["population"], errors="coerce")
+    cities = cities[population.fillna(0) >= min_population]
+    population = population.loc[cities.index]
+
+    parent = cities["country"] + "-" + cities["admin1"]
+    no_admin1 = cities["admin1"].isin(["", "00"]) | ~parent.isin(set(df_admin1["place_key"]))
+    parent = parent.where(~no_admin1, cities["country"])
+    df_cities = pd.DataFrame(
+        {
+            "place_key": parent + "/" + cities["geonameid"],
+            "parent_key": parent,
+            "level": CITY,
+            "name": cities["asciiname"],
+            "population": population,
+            "lat": pd.to_numeric(cities["lat"], errors="coerce"),
+            "lng": pd.to_numeric(cities["lng"], errors="coerce"),
+        }
+    )
+
+    # Admin-1 population is the sum of its listed cities (a lower bound, but
+    # enough to weight rollups).
+    city_pop = df_cities.groupby("parent_key")["population"].sum()
+    df_admin1["population"] = df_admin1["place_key"].map(city_pop)
+    return pd.concat([df_admin1, df_cities], ignore_index=True)[PLACE_COLUMNS]
+
+
+def load_places(path: str = None) -> pd.DataFrame:
+    """data/places.csv (or an empty frame). Extra columns are observations."""
+    path = path or PLACES_PATH
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=PLACE_COLUMNS)
+    return pd.read_csv(path, keep_default_na=False, na_values=[""], dtype={"place_key": str, "parent_key": str})
+
+
+def load_regional_advisories(path: str = None) -> pd.Series:
+    """place_key -> advisory level overrides from data/advisories/regional_levels.csv."""
+    path = path or REGIONAL_ADVISORIES_PATH
+    if not os.path.exists(path):
+        return pd.Series(dtype=float)
+    df = pd.read_csv(path, keep_default_na=False, na_values=[""])
+    return pd.to_numeric(df.set_index("place_key")["advisory_level"], errors="coerce").dropna()
+
+
+def _fold(text: str) -> str:
+    text = unicodedata.normalize("NFKD", unescape(text or ""))
+    return "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+
+
+def regional_advisory_levels(advisory_index: dict, places: pd.DataFrame) -> pd.DataFrame:
+    """
+    Admin-1 advisory levels from State Dept summaries.
+
+    Summaries list exceptions to the country level under headings such as
+    "Do Not Travel To:" followed by <li> items naming states or provinces.
+    Each item is matched against that country's admin-1 names (longest name
+    first, so "Baja California Sur" wins over "Baja California"); a region
+    named under several headings keeps the highest level.
+    """
+    admin1 = places[places["level"] == ADMIN1]
+    names_by_country = {}
+    for key, name in zip(admin1["place_key"], admin1["name"]):
+        folded = _fold(name).strip()
+        if folded:
+            names_by_country.setdefault(key.split("-", 1)[0], {})[folded] = key
+
+    heading = re.compile("|".join(f"(?P<l{lvl}>{pat})" for lvl, pat in REGIONAL_HEADINGS))
+    rows = {}
+    for code, entry in advisory_index.items():
+        names = names_by_country.get(code)
+        summary = _fold(entry.get("summary") or "")
+        if not names or not summary:
+            continue
+        pattern = re.compile(
+            r"\b(" + "|".join(re.escape(n) for n in sorted(names, key=len, reverse=True)) + r")\b"
+        )
+        marks = list(heading.finditer(summary))
+        for i, m in enumerate(marks):
+            level = int(m.lastgroup[1:])
+            end = marks[i + 1].start() if i + 1 < len(marks) else len(summary)
+            for item in re.findall(r"<li[^>]*>(.*?)</li>", summary[m.end():end], flags=re.S):
+                text = re.sub(r"<[^>]+>", " ", item)
+                for hit in pattern.finditer(text):
+                    key = names[hit.group(1)]
+                    rows[key] = max(rows.get(key, 0), level)
+    return pd.DataFrame(
+        {"place_key": list(rows), "advisory_level": list(rows.values())}
+    ).sort_values("place_key", ignore_index=True)
+
+
+class PlaceHierarchy:
+    """
+    Country -> admin-1 -> city tree over flat arrays.
+
+    Rows are ordered by level, and every row knows its parent's row index, so
+    rollups (children -> parent) and fallbacks (parent -> children) are one
+    vectorized step per level rather than a walk over the tree.
+    """
+
+    def __init__(self, keys, parent_keys, levels, weights=None):
+        keys = np.asarray(keys, dtype=object)
+        levels = np.asarray(levels, dtype=np.int8)
+        order = np.argsort(levels, kind="stable")
+        self.keys = keys[order]
+        self.levels = levels[order]
+        self.order = order
+        self.index = pd.Index(self.keys)
+        parents = np.asarray(parent_keys, dtype=object)[order]
+        self.parent = self.index.get_indexer(parents).astype(np.int64)
+        w = np.ones(len(keys)) if weights is None else np.asarray(weights, dtype=float)[order]
+        self.weights = np.where(np.isnan(w) | (w <= 0), 1.0, w)
+        self.depth = int(self.levels.max()) if len(self.levels) else 0
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, weight_col: str = "population"):
+        weights = pd.to_numeric(df[weight_col], errors="coerce") if weight_col in df.columns else None
+        return cls(df["place_key"], df["parent_key"].fillna(""), df["level"], weights)
+
+    def _children_at(self, level: int):
+        rows = np.flatnonzero(self.levels == level)
+        return rows, self.parent[rows]
+
+    def rollup_mean(self, values):
+        """
+        Weighted mean over each node's children, bottom-up.
+
+        A child contributes its own value, or its own children's rollup when
+        it has none, so a country still aggregates cities under admin-1
+        regions without data. Returns (rollup, count of contributing children).
+        """
+        own = np.asarray(values, dtype=float)
+        rollup = np.full(len(own), np.nan)
+        count = np.zeros(len(own), dtype=np.int64)
+        for level in range(self.depth, 0, -1):
+            rows, parents = self._children_at(level)
+            vals = np.where(np.isnan(own[rows]), rollup[rows], own[rows])
+            ok = ~np.isnan(vals) & (parents >= 0)
+            p, v, w = parents[ok], vals[ok], self.weights[rows][ok]
+            total = np.bincount(p, weights=v * w, minlength=len(own))
+            wsum = np.bincount(p, weights=w, minlength=len(own))
+            count += np.bincount(p, minlength=len(own))
+            has = wsum > 0
+            rollup[has] = total[has] / wsum[has]
+        return rollup, count
+
+    def rollup_max(self, values):
+        """Largest value among each node and all its descendants."""
+        out = np.asarray(values, dtype=float).copy()
+        for level in range(self.depth, 0, -1):
+            rows, parents = self._children_at(level)
+            ok = ~np.isnan(out[rows]) & (parents >= 0)
+            np.fmax.at(out, parents[ok], out[rows][ok])
+        return out
+
+    def fill_down(self, values):
+        """Missing values inherit the nearest ancestor's value, top-down."""
+        out = np.asarray(values, dtype=float).copy()
+        for level in range(1, self.depth + 1):
+            rows, parents = self._children_at(level)
+            missing = np.isnan(out[rows]) & (parents >= 0)
+            out[rows[missing]] = out[parents[missing]]
+        return out
+
+    def resolve(self, keys) -> np.ndarray:
+        """
+        Row index for each key, falling back to the nearest known ancestor
+        ("MX-COL/999" -> "MX-COL" -> "MX"); -1 when even the country is unknown.
+        """
+        current = np.array(["" if k is None else str(k) for k in keys], dtype=object)
+        rows = self.index.get_indexer(current)
+        pending = np.flatnonzero((rows < 0) & (current != ""))
+        while len(pending):
+            current[pending] = [parent_key_of(k) for k in current[pending]]
+            rows[pending] = self.index.get_indexer(current[pending])
+            pending = pending[(rows[pending] < 0) & (current[pending] != "")]
+        return rows
+
+
+def merge_places(df_model: pd.DataFrame, df_places: pd.DataFrame, regional: pd.Series = None) -> pd.DataFrame:
+    """
+    Place table for every country in df_model plus its admin-1 regions and
+    cities.
+
+    Country rows carry the country pipeline's values. Sub-national rows use
+    their own observations when df_places has them (homicide_rate,
+    advisory_level columns, plus `regional` advisory overrides); otherwise
+    they fall back to the parent. Countries also get rollups from their
+    children: a population-weighted homicide mean and the worst advisory
+    level anywhere below them.
+
+    For homicide_rate and advisory_level the output has the value used for
+    scoring, the `_own` observation and a `_source` column (own / children /
+    parent / none).
+    """
+    countries = pd.DataFrame(
+        {
+            "place_key": df_model["code_2"].astype(str),
+            "parent_key": "",
+            "level": COUNTRY,
+            "country": df_model["code_2"].astype(str),
+            "name": df_model["country"],
+            "population": pd.to_numeric(df_model["population"], errors="coerce"),
+            "homicide_rate": pd.to_numeric(df_model["homicide_rate"], errors="coerce"),
+            "gpi_score": pd.to_numeric(df_model["gpi_score"], errors="coerce"),
+            "advisory_level": pd.to_numeric(df_model["advisory_level"], errors="coerce"),
+        }
+    )
+
+    sub = df_places[pd.to_numeric(df_places["level"], errors="coerce") > COUNTRY].copy()
+    sub["level"] = sub["level"].astype(int)
+    sub["country"] = sub["place_key"].str.split(r"[-/]", n=1, regex=True).str[0]
+    sub = sub[sub["country"].isin(set(countries["place_key"]))]
+    for col in ["homicide_rate", "advisory_level"]:
+        sub[col] = pd.to_numeric(sub[col], errors="coerce") if col in sub.columns else np.nan
+    sub["gpi_score"] = np.nan  # GPI is national only.
+    if regional is not None and len(regional):
+        override = sub["place_key"].map(regional)
+        sub["advisory_level"] = override.fillna(sub["advisory_level"])
+
+    # Orphans (parent not in the table) hang off their country.
+    known = set(sub["place_key"]) | set(countries["place_key"])
+    sub["parent_key"] = sub["parent_key"].where(sub["parent_key"].isin(known), sub["country"])
+
+    cols = list(countries.columns) + [c for c in ["lat", "lng"] if c in sub.columns]
+    df = pd.concat([countries, sub.reindex(columns=cols)], ignore_index=True)
+    df = df.drop_duplicates(subset=["place_key"]).reset_index(drop=True)
+
+    tree = PlaceHierarchy.from_frame(df)
+    df = df.iloc[tree.order].reset_index(drop=True)
+
+    hom_own = df["homicide_rate"].to_numpy(dtype=float)
+    hom_children, hom_count = tree.rollup_mean(hom_own)
+    hom_up = np.where(np.isnan(hom_own), hom_children, hom_own)
+    hom = tree.fill_down(hom_up)
+    df["homicide_rate_own"] = hom_own
+    df["homicide_rate_children"] = hom_children
+    df["homicide_children_count"] = hom_count
+    df["homicide_rate"] = hom
+    df["homicide_source"] = np.select(
+        [~np.isnan(hom_own), ~np.isnan(hom_up), ~np.isnan(hom)], ["own", "children", "parent"], "none"
+    )
+
+    adv_own = df["advisory_level"].to_numpy(dtype=float)
+    adv = tree.fill_down(adv_own)
+    df["advisory_level_own"] = adv_own
+    df["advisory_level"] = adv
+    df["advisory_level_max"] = tree.rollup_max(adv)
+    df["advisory_source"] = np.select([~np.isnan(adv_own), ~np.isnan(adv)], ["own", "parent"], "none")
+
+    df["gpi_score"] = tree.fill_down(df["gpi_score"].to_numpy(dtype=float))
+    return df
+
+
+def save_places(df: pd.DataFrame, path: str = None) -> str:
+    path = path or PLACES_OUTPUT
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    df.to_csv(path, index=False)
+    return path
+
+
+class PlaceLookup:
+    """Place key -> scored row, falling back to the nearest ancestor."""
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df.reset_index(drop=True)
+        self.tree = PlaceHierarchy.from_frame(self.df)
+        self.df = self.df.iloc[self.tree.order].reset_index(drop=True)
+
+    @classmethod
+    def from_csv(cls, path: str = None):
+        return cls(pd.read_csv(path or PLACES_OUTPUT, keep_default_na=False, na_values=[""],
+                               dtype={"place_key": str, "parent_key": str}))
+
+    def lookup(self, key: str):
+        """Row for `key` as a dict (with `matched_key`), or None."""
+        row = int(self.tree.resolve([key])[0])
+        if row < 0:
+            return None
+        rec = self.df.iloc[row].to_dict()
+        rec["matched_key"] = rec["place_key"]
+        rec["fallback"] = rec["place_key"] != key
+        return rec
+
+    def lookup_many(self, keys) -> pd.DataFrame:
+        rows = self.tree.resolve(keys)
+        out = self.df.take(np.where(rows >= 0, rows, 0)).reset_index(drop=True)
+        out.loc[rows < 0, :] = None
+        out.insert(0, "query", list(keys))
+        return out
+
+    def children(self, key: str) -> pd.DataFrame:
+        return self.df[self.df["parent_key"] == key]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Build data/places.csv from GeoNames dumps and regional advisory levels from State Dept summaries."
+    )
+    parser.add_argument("--admin1", help="GeoNames admin1CodesASCII.txt")
+    parser.add_argument("--cities", help="GeoNames cities500.txt / cities15000.txt")
+    parser.add_argument("--min-population", type=int, default=0)
+    parser.add_argument("--advisories", action="store_true",
+                        help=f"Fetch State Dept summaries and write {REGIONAL_ADVISORIES_PATH}")
+    args = parser.parse_args(argv)
+
+    if args.admin1 and args.cities:
+        df = places_from_geonames(args.admin1, args.cities, args.min_population)
+        os.makedirs(os.path.dirname(PLACES_PATH), exist_ok=True)
+        df.to_csv(PLACES_PATH, index=False)
+        print(f"✓ {len(df)} places ({(df['level'] == CITY).sum()} cities). Saved to {PLACES_PATH}")
+
+    if args.advisories:
+        places = load_places()
+        index = build_advisory_index(fetch_travel_advisories(), get_country_reference().by_code())
+        regional = regional_advisory_levels(index, places)
+        os.makedirs(os.path.dirname(REGIONAL_ADVISORIES_PATH), exist_ok=True)
+        regional.to_csv(REGIONAL_ADVISORIES_PATH, index=False)
+        print(f"✓ {len(regional)} regional advisory levels. Saved to {REGIONAL_ADVISORIES_PATH}")
+
+
+if __name__ == "__main__":
+    main()
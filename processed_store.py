@@ -0,0 +1,259 @@
+import hashlib
+import json
+import os
+from collections.abc import Mapping
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+PROCESSED_JSON = os.path.join(BASE_DIR, "data", "processed.json")
+FORMAT_VERSION = 2
+
+# Fields whose values repeat across countries (default contact block, tier
+# sentences, enum labels) are stored once in a reference table; records
+# carry the table index. Tag fields are lists whose *items* are interned.
+INTERNED_FIELDS = [
+    "region",
+    "subregion",
+    "overall_risk",
+    "risk_scores",
+    "emergency_contacts",
+    "mindset_tip",
+    "playbook",
+]
+TAG_FIELDS = ["top_risks"]
+
+
+def _paths(json_path: str):
+    """processed.json -> (processed.ndjson, processed.index.json) beside it."""
+    stem, _ = os.path.splitext(json_path)
+    return stem + ".ndjson", stem + ".index.json"
+
+
+class _Interner:
+    """Builds the reference tables and encodes records against them."""
+
+    def __init__(self, fields=None, tag_fields=None):
+        self.fields = list(INTERNED_FIELDS if fields is None else fields)
+        self.tag_fields = list(TAG_FIELDS if tag_fields is None else tag_fields)
+        self.tables = {f: [] for f in self.fields + self.tag_fields}
+        self.shapes = []
+        self._ids = {f: {} for f in self.tables}
+        self._shape_ids = {}
+
+    def _id(self, field: str, value) -> int:
+        key = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+        ids = self._ids[field]
+        if key not in ids:
+            ids[key] = len(self.tables[field])
+            self.tables[field].append(value)
+        return ids[key]
+
+    def encode(self, record: dict) -> list:
+        """Record -> [shape id, value, ...]; the shape is its key list."""
+        keys = tuple(record)
+        shape = self._shape_ids.get(keys)
+        if shape is None:
+            shape = self._shape_ids[keys] = len(self.shapes)
+            self.shapes.append(list(keys))
+        out = [shape]
+        for field, value in record.items():
+            if field in self.tag_fields and isinstance(value, list):
+                out.append([self._id(field, v) for v in value])
+            elif field in self._ids:
+                out.append(self._id(field, value))
+            else:
+                out.append(value)
+        return out
+
+
+def expand_record(record, tables: dict, shapes: list) -> dict:
+    """
+    Compact record -> full record. Table values are shared between records,
+    so treat nested dicts/lists as read-only. Plain dict records (format 1)
+    pass through unchanged.
+    """
+    if isinstance(record, dict):
+        return record
+    out = {}
+    for field, value in zip(shapes[record[0]], record[1:]):
+        table = tables.get(field)
+        if table is None:
+            out[field] = value
+        elif isinstance(value, list):
+            out[field] = [table[i] for i in value]
+        else:
+            out[field] = table[value]
+    return out
+
+
+def expand_processed(data: dict) -> dict:
+    """A loaded processed.json (compact or legacy plain dict) -> {code: record}."""
+    if not isinstance(data, dict) or data.get("format") != FORMAT_VERSION or "records" not in data:
+        return data or {}
+    tables, shapes = data.get("tables") or {}, data.get("shapes") or []
+    return {code: expand_record(rec, tables, shapes) for code, rec in data["records"].items()}
+
+
+class ProcessedWriter:
+    """
+    Write country records one at a time, in constant memory.
+
+    Produces three files from the same stream:
+      - processed.ndjson      one compact JSON record per line
+      - processed.index.json  {code: [byte offset, byte length]} into the ndjson,
+                              plus the shared reference tables and the
+                              sha1 of the processed.json written with it
+      - processed.json        {"format", "records", "shapes", "tables"} for the
+                              website, one record per line
+
+    Records are stored interned: each is a list [shape, values...] where
+    the shape (its key list) is shared, and repeated values
+    (INTERNED_FIELDS) and tag items (TAG_FIELDS) are indexes into per-field
+    tables written once, at close. Readers expand them back, so consumers
+    see the same records as before.
+
+    Everything is written to temp files; commit() swaps them in, so readers
+    of the previous snapshot keep working until then.
+    """
+
+    def __init__(self, json_path: str = None, website_json: bool = True):
+        self.json_path = json_path or PROCESSED_JSON
+        self.ndjson_path, self.index_path = _paths(self.json_path)
+        os.makedirs(os.path.dirname(self.json_path), exist_ok=True)
+        self._nd = open(self.ndjson_path + ".tmp", "wb")
+        self._js = open(self.json_path + ".tmp", "wb") if website_json else None
+        self._js_hash = hashlib.sha1()
+        self.offsets = {}
+        self.interner = _Interner()
+        self._pos = 0
+        self._closed = False
+
+    def write(self, code: str, record: dict):
+        record = self.interner.encode(record)
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self._nd.write(line + b"\n")
+        self.offsets[code] = [self._pos, len(line)]
+        self._pos += len(line) + 1
+
+        if self._js is not None:
+            if len(self.offsets) == 1:
+                self._write_js(f'{{"format":{FORMAT_VERSION},"records":{{\n')
+            else:
+                self._write_js(",\n")
+            self._write_js(f"{json.dumps(code, ensure_ascii=False)}:{line.decode('utf-8')}")
+
+    def _write_js(self, text: str):
+        data = text.encode("utf-8")
+        self._js.write(data)
+        self._js_hash.update(data)
+
+    def close(self) -> "ProcessedReader":
+        """Finish the temp files and return a reader over them (pre-commit)."""
+        if not self._closed:
+            self._nd.close()
+            if self._js is not None:
+                if not self.offsets:
+                    self._write_js(f'{{"format":{FORMAT_VERSION},"records":{{')
+                shapes = json.dumps(self.interner.shapes, ensure_ascii=False, separators=(",", ":"))
+                tables = json.dumps(self.interner.tables, ensure_ascii=False, separators=(",", ":"))
+                self._write_js(f'\n}},\n"shapes":{shapes},\n"tables":{tables}}}\n')
+                self._js.close()
+            with open(self.index_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "format": FORMAT_VERSION,
+                        "count": len(self.offsets),
+                        "offsets": self.offsets,
+                        "shapes": self.interner.shapes,
+                        "tables": self.interner.tables,
+                        "json_sha1": self._js_hash.hexdigest() if self._js is not None else None,
+                    },
+                    f,
+                    ensure_ascii=False,
+                    separators=(",", ":"),
+                )
+            self._closed = True
+        return ProcessedReader(self.ndjson_path + ".tmp", self.index_path + ".tmp")
+
+    def commit(self):
+        self.close()
+        os.replace(self.ndjson_path + ".tmp", self.ndjson_path)
+        os.replace(self.index_path + ".tmp", self.index_path)
+        if self._js is not None:
+            os.replace(self.json_path + ".tmp", self.json_path)
+
+    def __len__(self):
+        return len(self.offsets)
+
+
+class ProcessedReader(Mapping):
+    """
+    Read-only {code: record} view over processed.ndjson.
+
+    Only the offset index and the reference tables are held in memory.
+    reader[code] seeks to a single record; items() / values() stream the
+    file sequentially. Records are expanded on read (see expand_record).
+    """
+
+    def __init__(self, ndjson_path: str, index_path: str):
+        self.ndjson_path = ndjson_path
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        self.offsets = index["offsets"]
+        self.tables = index.get("tables") or {}
+        self.shapes = index.get("shapes") or []
+        self.json_sha1 = index.get("json_sha1")
+
+    def __getitem__(self, code):
+        offset, length = self.offsets[code]
+        with open(self.ndjson_path, "rb") as f:
+            f.seek(offset)
+            return expand_record(json.loads(f.read(length)), self.tables, self.shapes)
+
+    def __iter__(self):
+        return iter(self.offsets)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __contains__(self, code):
+        return code in self.offsets
+
+    def items(self):
+        # Lines are written in index order, so codes pair up positionally.
+        with open(self.ndjson_path, "rb") as f:
+            for code, line in zip(self.offsets, f):
+                yield code, expand_record(json.loads(line), self.tables, self.shapes)
+
+    def values(self):
+        for _, record in self.items():
+            yield record
+
+
+def _file_sha1(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def open_processed(json_path: str = None):
+    """
+    Open the processed country records for reading.
+
+    Uses the streaming ndjson + index pair when present and written
+    together with the current processed.json (by its sha1); otherwise,
+    e.g. after a pull replaced only the committed processed.json, loads
+    processed.json (compact or legacy). Returns {} when neither exists.
+    """
+    json_path = json_path or PROCESSED_JSON
+    ndjson_path, index_path = _paths(json_path)
+    if os.path.exists(ndjson_path) and os.path.exists(index_path):
+        reader = ProcessedReader(ndjson_path, index_path)
+        if not os.path.exists(json_path) or reader.json_sha1 == _file_sha1(json_path):
+            return reader
+    if os.path.exists(json_path):
+        with open(json_path, "r", encoding="utf-8") as f:
+            return expand_processed(json.load(f))
+    return {}
@@ -0,0 +1,249 @@
+import json
+import math
+import os
+import random
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SKETCHES_PATH = os.path.join(BASE_DIR, "results", "quantile_sketches.json")
+DEFAULT_K = 256
+ALL = "*"
+
+
+class KLLSketch:
+    """
+    Mergeable quantile sketch (KLL compactors).
+
+    Items live in levels; an item on level h stands for 2**h inputs. When
+    the sketch outgrows its budget the lowest full level is sorted and every
+    other item (random offset) is promoted, so memory stays O(k) whatever
+    the stream length, with rank error around 1.7 / k. Until the first
+    compaction every input is kept, and quantiles are exact (numpy's linear
+    interpolation, same as pandas median/describe). min, max, count and sum
+    are always exact.
+    """
+
+    def __init__(self, k: int = DEFAULT_K, seed: int = 0):
+        self.k = k
+        self.levels = [[]]
+        self.n = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self._rng = random.Random(seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _size(self) -> int:
+        return sum(len(items) for items in self.levels)
+
+    def _budget(self) -> int:
+        return sum(self._capacity(h) for h in range(len(self.levels)))
+
+    def _compress(self):
+        while self._size() > self._budget():
+            for h, items in enumerate(self.levels):
+                if len(items) >= self._capacity(h):
+                    if h + 1 == len(self.levels):
+                        self.levels.append([])
+                    items.sort()
+                    # An odd item out stays behind, so weights are conserved.
+                    keep = [items.pop()] if len(items) % 2 else []
+                    self.levels[h + 1].extend(items[self._rng.randint(0, 1)::2])
+                    self.levels[h] = keep
+                    break
+
+    @property
+    def exact(self) -> bool:
+        return len(self.levels) == 1
+
+    def update(self, value):
+        self.update_many([value])
+
+    def update_many(self, values):
+        """Add values (NaN and None are ignored)."""
+        arr = np.asarray(values, dtype=float).ravel()
+        arr = arr[~np.isnan(arr)]
+        if not len(arr):
+            return
+        self.n += len(arr)
+        self.total += float(arr.sum())
+        self.min = min(self.min, float(arr.min()))
+        self.max = max(self.max, float(arr.max()))
+        # Feed in k-sized chunks so level 0 never holds more than ~k items.
+        for start in range(0, len(arr), self.k):
+            self.levels[0].extend(arr[start:start + self.k].tolist())
+            self._compress()
+
+    def merge(self, other: "KLLSketch") -> "KLLSketch":
+        """Fold another sketch (e.g. another partition or run) into this one."""
+        if other.k != self.k:
+            raise ValueError(f"Cannot merge sketches with k={self.k} and k={other.k}")
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for h, items in enumerate(other.levels):
+            self.levels[h].extend(items)
+        self.n += other.n
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _weighted(self):
+        values = np.concatenate([np.asarray(items, dtype=float) for items in self.levels])
+        weights = np.concatenate([np.full(len(items), 2 ** h, dtype=float) for h, items in enumerate(self.levels)])
+        order = np.argsort(values, kind="stable")
+        return values[order], np.cumsum(weights[order])
+
+    def quantiles(self, qs) -> np.ndarray:
+        qs = np.asarray(qs, dtype=float)
+        if self.n == 0:
+            return np.full(qs.shape, np.nan)
+        if self.exact:
+            return np.quantile(np.asarray(self.levels[0], dtype=float), qs)
+        values, cum = self._weighted()
+        idx = np.searchsorted(cum, qs * cum[-1], side="left").clip(0, len(values) - 1)
+        out = values[idx]
+        # The extremes are tracked exactly.
+        out = np.where(qs <= 0, self.min, out)
+        return np.where(qs >= 1, self.max, out)
+
+    def quantile(self, q: float) -> float:
+        return float(self.quantiles([q])[0])
+
+    def median(self) -> float:
+        return self.quantile(0.5)
+
+    def mean(self) -> float:
+        return self.total / self.n if self.n else float("nan")
+
+    def percentile(self, value: float) -> float:
+        """Share of inputs (0–100) at or below value, as RankingIndex.percentile."""
+        if self.n == 0:
+            return float("nan")
+        if self.exact:
+            arr = np.sort(np.asarray(self.levels[0], dtype=float))
+            return float(np.searchsorted(arr, value, side="right") / self.n * 100)
+        values, cum = self._weighted()
+        i = np.searchsorted(values, value, side="right")
+        return float(cum[i - 1] / cum[-1] * 100) if i else 0.0
+
+    def describe(self) -> dict:
+        """count/mean/min/25%/50%/75%/max, as pandas describe() (no std)."""
+        q25, q50, q75 = self.quantiles([0.25, 0.5, 0.75]) if self.n else (np.nan,) * 3
+        return {
+            "count": self.n,
+            "mean": self.mean(),
+            "min": self.min if self.n else float("nan"),
+            "25%": float(q25),
+            "50%": float(q50),
+            "75%": float(q75),
+            "max": self.max if self.n else float("nan"),
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            "k": self.k,
+            "n": self.n,
+            "total": self.total,
+            "min": self.min if self.n else None,
+            "max": self.max if self.n else None,
+            "levels": self.levels,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "KLLSketch":
+        sketch = cls(data["k"])
+        sketch.levels = [list(items) for items in data["levels"]] or [[]]
+        sketch.n = data["n"]
+        sketch.total = data["total"]
+        sketch.min = math.inf if data["min"] is None else data["min"]
+        sketch.max = -math.inf if data["max"] is None else data["max"]
+        return sketch
+
+
+class SketchSet:
+    """
+    {(stage, column, group): KLLSketch}, where group is a region or "*" for
+    all rows. Sets from different partitions or runs merge key by key, and
+    save to one JSON file.
+    """
+
+    def __init__(self, k: int = DEFAULT_K):
+        self.k = k
+        self.sketches = {}
+
+    def get(self, stage: str, column: str, group: str = ALL) -> KLLSketch:
+        key = (stage, column, group)
+        if key not in self.sketches:
+            self.sketches[key] = KLLSketch(self.k)
+        return self.sketches[key]
+
+    def __contains__(self, key):
+        return tuple(key) in self.sketches
+
+    def add_frame(self, stage: str, df: pd.DataFrame, columns, by: str = "region") -> "SketchSet":
+        """Sketch each column over all rows and per `by` group."""
+        groups = df[by].fillna("").astype(str) if by and by in df.columns else None
+        for column in columns:
+            values = pd.to_numeric(df[column], errors="coerce")
+            self.get(stage, column).update_many(values.to_numpy(dtype=float))
+            if groups is not None:
+                for group, part in values.groupby(groups, sort=False):
+                    self.get(stage, column, group).update_many(part.to_numpy(dtype=float))
+        return self
+
+    @classmethod
+    def from_frame(cls, stage: str, df: pd.DataFrame, columns, by: str = "region", k: int = DEFAULT_K):
+        return cls(k).add_frame(stage, df, columns, by)
+
+    def merge(self, other: "SketchSet") -> "SketchSet":
+        for (stage, column, group), sketch in other.sketches.items():
+            self.get(stage, column, group).merge(sketch)
+        return self
+
+    def describe(self, stage: str, column: str) -> pd.DataFrame:
+        """describe()-style table with one row per group ("*" = all rows)."""
+        rows = {
+            group: sketch.describe()
+            for (s, c, group), sketch in sorted(self.sketches.items())
+            if s == stage and c == column
+        }
+        return pd.DataFrame.from_dict(rows, orient="index")
+
+    def save(self, path: str = None) -> str:
+        path = path or SKETCHES_PATH
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = {
+            "k": self.k,
+            "sketches": [
+                {"stage": s, "column": c, "group": g, **sketch.to_dict()}
+                for (s, c, g), sketch in sorted(self.sketches.items())
+            ],
+        }
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(path + ".tmp", path)
+        return path
+
+    @classmethod
+    def load(cls, path: str = None) -> "SketchSet":
+        with open(path or SKETCHES_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        out = cls(data["k"])
+        for entry in data["sketches"]:
+            out.sketches[(entry["stage"], entry["column"], entry["group"])] = KLLSketch.from_dict(entry)
+        return out
+
+
+if __name__ == "__main__":
+    sketches = SketchSet.load()
+    for stage, column in sorted({(s, c) for s, c, _ in sketches.sketches}):
+        print(f"\n{stage} · {column}")
+        print(sketches.describe(stage, column).round(3).to_string())
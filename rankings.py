@@ -0,0 +1,159 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+RANKINGS_PATH = os.path.join(BASE_DIR, "results", "rankings.json")
+
+SCOPE_COLUMNS = ["region", "subregion", "risk_tier"]
+
+
+class RankingIndex:
+    """
+    Precomputed TSI leaderboards for the whole world and for every region,
+    subregion and risk tier.
+
+    Each scope keeps its members sorted by TSI (safest first), so top/bottom k
+    is a slice, and a sorted TSI array for O(log n) rank and percentile
+    lookups by value.
+    """
+
+    def __init__(self, codes, names, tsi, groups=None):
+        codes = np.asarray(codes, dtype=object)
+        tsi = np.asarray(tsi, dtype=float)
+        keep = ~np.isnan(tsi)
+        self.codes = codes[keep]
+        self.names = np.asarray(names, dtype=object)[keep]
+        self.tsi = tsi[keep]
+        self.groups = {
+            col: np.asarray(values, dtype=object)[keep]
+            for col, values in (groups or {}).items()
+        }
+        self._pos = {code: i for i, code in enumerate(self.codes)}
+
+        # Stable sort on -TSI keeps the input order for ties.
+        self._scopes = {("all", None): np.argsort(-self.tsi, kind="stable")}
+        for col, values in self.groups.items():
+            for value in pd.unique(values):
+                if value is None or (isinstance(value, float) and np.isnan(value)):
+                    continue
+                members = np.flatnonzero(values == value)
+                order = members[np.argsort(-self.tsi[members], kind="stable")]
+                self._scopes[(col, value)] = order
+        self._ascending = {
+            scope: self.tsi[order][::-1].copy() for scope, order in self._scopes.items()
+        }
+
+    def __len__(self):
+        return len(self.codes)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame):
+        return cls(
+            codes=df["code_2"].to_numpy(),
+            names=df["country"].to_numpy(),
+            tsi=pd.to_numeric(df["TSI"], errors="coerce").to_numpy(dtype=float),
+            groups={
+                col: df[col].astype(object).where(df[col].notna(), None).to_numpy()
+                for col in SCOPE_COLUMNS
+                if col in df.columns
+            },
+        )
+
+    @classmethod
+    def load(cls, path: str = None):
+        with open(path or RANKINGS_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["codes"], data["names"], data["tsi"], data.get("groups"))
+
+    def save(self, path: str = None) -> str:
+        path = path or RANKINGS_PATH
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = {
+            "codes": self.codes.tolist(),
+            "names": self.names.tolist(),
+            "tsi": self.tsi.tolist(),
+            "groups": {col: values.tolist() for col, values in self.groups.items()},
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        return path
+
+    def scopes(self, col: str):
+        """Values available for a scope column, e.g. scopes("region")."""
+        return sorted(value for c, value in self._scopes if c == col)
+
+    def _scope(self, region=None, subregion=None, tier=None):
+        given = [
+            (col, value)
+            for col, value in (("region", region), ("subregion", subregion), ("risk_tier", tier))
+            if value is not None
+        ]
+        if len(given) > 1:
+            raise ValueError("Pass at most one of region, subregion or tier.")
+        key = given[0] if given else ("all", None)
+        if key not in self._scopes:
+            raise KeyError(f"No countries ranked for {key[0]}={key[1]!r}")
+        return key
+
+    def _rows(self, idx, start_rank):
+        return [
+            {
+                "rank": start_rank + i,
+                "code": self.codes[j],
+                "name": self.names[j],
+                "TSI": float(self.tsi[j]),
+            }
+            for i, j in enumerate(idx)
+        ]
+
+    def top_k(self, k: int = 10, region=None, subregion=None, tier=None):
+        """Safest k countries in the scope."""
+        order = self._scopes[self._scope(region, subregion, tier)]
+        return self._rows(order[:k], 1)
+
+    def bottom_k(self, k: int = 10, region=None, subregion=None, tier=None):
+        """Riskiest k countries in the scope, riskiest first."""
+        order = self._scopes[self._scope(region, subregion, tier)]
+        start = max(len(order) - k, 0)
+        rows = self._rows(order[start:], start + 1)
+        return rows[::-1]
+
+    def rank_of_value(self, value: float, region=None, subregion=None, tier=None) -> int:
+        """1-based competition rank a TSI value would get in the scope."""
+        asc = self._ascending[self._scope(region, subregion, tier)]
+        return int(len(asc) - np.searchsorted(asc, value, side="right") + 1)
+
+    def rank_of(self, code: str, region=None, subregion=None, tier=None) -> int:
+        """
+        1-based rank of a country (1 = safest). Ties share the best rank.
+
+        With no scope given, the world rank is returned; pass region=True
+        (or subregion=True / tier=True) to rank within the country's own group.
+        """
+        i = self._pos[code.upper()]
+        region = self.groups["region"][i] if region is True else region
+        subregion = self.groups["subregion"][i] if subregion is True else subregion
+        tier = self.groups["risk_tier"][i] if tier is True else tier
+        return self.rank_of_value(self.tsi[i], region, subregion, tier)
+
+    def percentile(self, code_or_value, region=None, subregion=None, tier=None) -> float:
+        """Share of countries in the scope (0–100) with TSI at or below the given one."""
+        if isinstance(code_or_value, str):
+            value = self.tsi[self._pos[code_or_value.upper()]]
+        else:
+            value = float(code_or_value)
+        asc = self._ascending[self._scope(region, subregion, tier)]
+        if len(asc) == 0:
+            return float("nan")
+        return float(np.searchsorted(asc, value, side="right") / len(asc) * 100)
+
+
+if __name__ == "__main__":
+    ranking = RankingIndex.load()
+    for region in ranking.scopes("region"):
+        top = ranking.top_k(3, region=region)
+        print(f"{region}: " + ", ".join(f"{r['name']} ({r['TSI']:.1f})" for r in top))
@@ -1,3 +1,4 @@
+import argparse
 import json
 import requests
 import pandas as pd
@@ -11,10 +12,36 @@ import os
 import warnings
 import unicodedata
 
+from aggregate_cube import AggregateCube
+from charts import render_charts
+from country_reference import get_country_reference
+from fuzzy_match import FuzzyMatcher, report
+from places import load_places, load_regional_advisories, merge_places, save_places
+from processed_store import open_processed
+from quantile_sketch import SketchSet
+from rankings import RankingIndex
+from similarity_index import save_feature_vectors
+from validation import SCHEMAS, print_report, save_report, validate_table
+
 warnings.filterwarnings("ignore")
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
+# Cluster labels ordered from safest to riskiest (by mean cluster TSI).
+RISK_TIER_LABELS = ["Safe", "Moderate", "Caution", "High Risk"]
+
+# US advisory level (1–4) -> 0–100 safety score.
+ADVISORY_SCORES = {1: 100, 2: 66, 3: 33, 4: 0}
+TSI_WEIGHTS = {"homicide_norm": 0.4, "gpi_norm": 0.3, "advisory_norm": 0.3}
+TIER_FEATURES = ["homicide_norm", "gpi_norm", "advisory_norm"]
+TSI_INPUTS = ["homicide_rate", "gpi_score"]
+# Columns each source contributes to the merged table.
+SOURCE_COLUMNS = {
+    "homicide": ["homicide_rate"],
+    "gpi": ["gpi_score", "gpi_rank"],
+    "advisory": ["advisory_level"],
+}
+
 
 def _here(*parts: str) -> str:
     return os.path.join(BASE_DIR, *parts)
@@ -53,6 +80,20 @@ def _strip_accents(s: str) -> str:
     )
 
 
+def normalize_name(name):
+    """Normalize a country name for joining REST Countries, Wikipedia and GPI rows."""
+    if pd.isna(name):
+        return ""
+    name = _strip_accents(str(name)).lower().strip()
+    name = re.sub(r"\s*\(.*\)", "", name)
+    name = re.sub(r"[*†]", "", name)
+    name = name.replace("the ", "")
+    name = name.replace("republic of ", "")
+    name = name.replace("kingdom of ", "")
+    name = name.replace("state of ", "")
+    return name.strip()
+
+
 def load_gpi_2025_scores(pdf_path: str, cache_csv_path: str = None) -> pd.DataFrame:
     """
     Extract 2025 Global Peace Index (GPI) overall scores from the official PDF report.
@@ -184,46 +225,179 @@ def load_gpi_2025_scores(pdf_path: str, cache_csv_path: str = None) -> pd.DataFr
     return df
 
 
-def run_analysis():
-    print("Starting TravelSafe Analysis...")
+def advisory_to_score(level):
+    if pd.isna(level):
+        return 50
+    return ADVISORY_SCORES.get(int(level), 50)
 
-    print("1. Fetching REST Countries data...")
-    REST_COUNTRIES_URL = (
-        "https://restcountries.com/v3.1/all"
-        "?fields=name,cca2,cca3,region,subregion,population,capital"
+
+def sketch_tsi_inputs(df_master: pd.DataFrame) -> SketchSet:
+    """Quantile sketches of the raw TSI inputs, overall and per region."""
+    return SketchSet.from_frame("merged", df_master, TSI_INPUTS)
+
+
+def _minmax_scaler(lo: float, hi: float, column: str) -> MinMaxScaler:
+    """A 0–100 MinMaxScaler with the given bounds (what fitting on the full column yields)."""
+    return MinMaxScaler((0, 100)).fit(pd.DataFrame({column: [lo, hi]}))
+
+
+def _exact_median(sketch, values: pd.Series) -> float:
+    """The sketch's median while it is exact, else the column's own median."""
+    return sketch.median() if sketch.exact else float(pd.to_numeric(values, errors="coerce").median())
+
+
+def fit_tsi(df_master: pd.DataFrame, sketches: SketchSet = None, values: pd.DataFrame = None) -> dict:
+    """
+    The global part of the TSI: column medians used for imputation and the
+    min-max scalers. Bounds come from quantile sketches of all countries
+    (pass merged per-partition sketches to skip re-scanning); they are
+    exact however the sketches were built. Medians are taken from the
+    sketch only while it still holds every value, and otherwise from the
+    columns of `values` (default df_master: the frame the sketches were
+    built from), so scores never depend on how rows were partitioned.
+    """
+    sketches = sketches if sketches is not None else sketch_tsi_inputs(df_master)
+    values = df_master if values is None else values
+    hom = sketches.get("merged", "homicide_rate")
+    gpi = sketches.get("merged", "gpi_score")
+    hom_lo, hom_hi = (np.log1p(hom.min), np.log1p(hom.max)) if hom.n else (np.nan, np.nan)
+    gpi_lo, gpi_hi = (gpi.min, gpi.max) if gpi.n else (np.nan, np.nan)
+    return {
+        "hom_median": _exact_median(hom, values["homicide_rate"]),
+        "gpi_median": _exact_median(gpi, values["gpi_score"]),
+        "scaler_hom": _minmax_scaler(hom_lo, hom_hi, "homicide_log"),
+        "scaler_gpi": _minmax_scaler(gpi_lo, gpi_hi, "gpi_filled"),
+    }
+
+
+def apply_tsi(df_master: pd.DataFrame, params: dict) -> pd.DataFrame:
+    """Row-wise part of the TSI, given fit_tsi() parameters."""
+    df_model = df_master.copy()
+
+    df_model["homicide_log"] = np.log1p(df_model["homicide_rate"].fillna(params["hom_median"]))
+    hom_scaled = params["scaler_hom"].transform(df_model[["homicide_log"]])
+    df_model["homicide_norm"] = 100 - hom_scaled
+
+    df_model["gpi_filled"] = df_model["gpi_score"].fillna(params["gpi_median"])
+    gpi_scaled = params["scaler_gpi"].transform(df_model[["gpi_filled"]])
+    df_model["gpi_norm"] = 100 - gpi_scaled
+
+    df_model["advisory_norm"] = df_model["advisory_level"].apply(advisory_to_score)
+
+    df_model["TSI"] = sum(w * df_model[col] for col, w in TSI_WEIGHTS.items())
+    return df_model
+
+
+def compute_tsi(df_master: pd.DataFrame, sketches: SketchSet = None, values: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Normalize homicide, GPI and advisory inputs onto 0–100 safety scales and
+    combine them into the TravelSafe Index.
+
+    Missing homicide/GPI values are imputed with the column median before
+    min-max scaling; missing advisories score a neutral 50.
+    """
+    return apply_tsi(df_master, fit_tsi(df_master, sketches, values))
+
+
+def assign_risk_tiers(df_model: pd.DataFrame) -> pd.DataFrame:
+    """Cluster countries on the TSI components and label clusters by mean TSI."""
+    X = df_model[TIER_FEATURES].fillna(50)
+
+    kmeans = KMeans(n_clusters=4, random_state=42)
+    df_model["cluster"] = kmeans.fit_predict(X)
+
+    cluster_means = (
+        df_model.groupby("cluster")["TSI"].mean().sort_values(ascending=False)
     )
-    try:
-        resp = requests.get(REST_COUNTRIES_URL, timeout=20)
-        resp.raise_for_status()
-        countries_data = resp.json()
+    cluster_map = {}
+    for i, cluster_id in enumerate(cluster_means.index):
+        cluster_map[cluster_id] = RISK_TIER_LABELS[i]
 
-        countries_list = []
-        for item in countries_data:
-            code = item.get("cca2")
-            if not code:
-                continue
-            name = item.get("name", {}).get("common", "")
-            countries_list.append(
-                {
-                    "code_2": code.upper(),
-                    "code_3": item.get("cca3", ""),
-                    "country": name,
-                    "region": item.get("region", ""),
-                    "subregion": item.get("subregion", ""),
-                    "population": item.get("population", 0),
-                    "capital": (item.get("capital") or ["N/A"])[0],
-                }
-            )
-        df_countries = pd.DataFrame(countries_list)
-        print(f"   Loaded {len(df_countries)} countries.")
-    except Exception as e:
-        print(f"   Error fetching REST Countries: {e}")
-        return
+    df_model["risk_tier"] = df_model["cluster"].map(cluster_map)
+    return df_model
+
+
+def tier_centroids(df_model: pd.DataFrame) -> pd.DataFrame:
+    """Mean TIER_FEATURES per risk tier (the KMeans centroids, by label)."""
+    return df_model.groupby("risk_tier")[TIER_FEATURES].mean()
+
+
+def nearest_tier(df: pd.DataFrame, centroids: pd.DataFrame) -> np.ndarray:
+    """Risk tier of the nearest tier centroid for each row."""
+    X = df[TIER_FEATURES].fillna(50).to_numpy()
+    dist = ((X[:, None, :] - centroids.to_numpy()[None, :, :]) ** 2).sum(axis=2)
+    return centroids.index.to_numpy()[dist.argmin(axis=1)]
+
+
+def assign_tiers_from(df_model: pd.DataFrame, df_full: pd.DataFrame) -> pd.DataFrame:
+    """
+    Subset-run stand-in for assign_risk_tiers: clustering needs every
+    country, so each row takes the tier (and cluster id) of the nearest
+    centroid of the last full build instead.
+    """
+    df_model["risk_tier"] = nearest_tier(df_model, tier_centroids(df_full))
+    clusters = df_full.drop_duplicates(subset=["risk_tier"]).set_index("risk_tier")["cluster"]
+    df_model["cluster"] = df_model["risk_tier"].map(clusters)
+    return df_model
+
+
+def compute_place_tsi(df_places: pd.DataFrame, df_model: pd.DataFrame) -> pd.DataFrame:
+    """
+    TSI for the place table (countries, admin-1 regions, cities) on the
+    country scales, so a city's TSI is comparable with its country's.
 
-    print("2. Scraping Wikipedia Homicide Rates...")
-    WIKIPEDIA_URL = (
-        "https://en.wikipedia.org/wiki/List_of_countries_by_intentional_homicide_rate"
+    Homicide and GPI use the min/max fitted on countries in compute_tsi;
+    places with no usable input fall back to their country's component
+    score. Country rows keep their KMeans tier; every other place takes the
+    tier of the nearest country-cluster centroid.
+    """
+    out = df_places.copy()
+    by_code = df_model.drop_duplicates(subset=["code_2"]).set_index("code_2")
+
+    def scaled(values, fitted):
+        lo, hi = fitted.min(), fitted.max()
+        span = hi - lo if hi > lo else 1.0
+        return (100 - (values - lo) / span * 100).clip(0, 100)
+
+    hom = scaled(np.log1p(out["homicide_rate"]), by_code["homicide_log"])
+    out["homicide_norm"] = hom.fillna(out["country"].map(by_code["homicide_norm"]))
+    gpi = scaled(out["gpi_score"], by_code["gpi_filled"])
+    out["gpi_norm"] = gpi.fillna(out["country"].map(by_code["gpi_norm"]))
+    out["advisory_norm"] = (
+        out["advisory_level"].map(ADVISORY_SCORES).astype(float).fillna(advisory_to_score(None))
     )
+    out["TSI"] = sum(w * out[col] for col, w in TSI_WEIGHTS.items())
+
+    out["risk_tier"] = nearest_tier(out, tier_centroids(df_model))
+    countries = out["level"] == 0
+    out.loc[countries, "risk_tier"] = out.loc[countries, "country"].map(by_code["risk_tier"])
+    return out
+
+
+WIKIPEDIA_URL = (
+    "https://en.wikipedia.org/wiki/List_of_countries_by_intentional_homicide_rate"
+)
+HOMICIDE_CACHE = _here("homicide_rates_extracted.csv")
+GPI_PDF = _here("Global-Peace-Index-2025-web.pdf")
+GPI_CACHE = _here("gpi_2025_extracted.csv")
+ADVISORY_FILE = _here("us_advisories_manual.csv")
+
+
+def fetch_countries_frame(codes=None) -> pd.DataFrame:
+    """
+    Step 1: REST Countries -> one row per ISO2 code. Raises on fetch errors.
+    With codes, a stale cache is refreshed for those countries only.
+    """
+    return get_country_reference(codes=codes).to_frame()
+
+
+def scrape_homicide_rates() -> pd.DataFrame:
+    """
+    Step 2: Wikipedia intentional homicide table -> (country_wiki, homicide_rate).
+
+    Returns an empty frame when the page or table cannot be read. A successful
+    scrape is also cached to homicide_rates_extracted.csv.
+    """
     df_homicide = pd.DataFrame(columns=["country_wiki", "homicide_rate"])
     try:
         headers = {
@@ -271,135 +445,372 @@ def run_analysis():
                     .astype(str)
                     .apply(lambda x: re.sub(r"[*\d\[\]]", "", x).strip())
                 )
-                print(f"   Loaded {len(df_homicide)} homicide records.")
+                try:
+                    df_homicide.to_csv(HOMICIDE_CACHE, index=False)
+                except Exception:
+                    pass
     except Exception as e:
         print(f"   Error scraping Wikipedia: {e}")
+    return df_homicide
 
-    print("3. Loading Global Peace Index (GPI) 2025 from PDF...")
-    GPI_PDF = _here("Global-Peace-Index-2025-web.pdf")
-    GPI_CACHE = _here("gpi_2025_extracted.csv")
 
-    df_gpi = pd.DataFrame(columns=["country_gpi", "gpi_score", "gpi_rank"])
-    try:
-        pdf_path = GPI_PDF if os.path.exists(GPI_PDF) else GPI_PDF
-        df_gpi = load_gpi_2025_scores(pdf_path=pdf_path, cache_csv_path=GPI_CACHE)
-        df_gpi["gpi_score"] = pd.to_numeric(df_gpi["gpi_score"], errors="coerce")
-        print(f"   Loaded {len(df_gpi)} GPI records.")
-    except Exception as e:
-        print(f"   Error loading GPI PDF: {e}")
+def load_homicide_frame(cache_csv_path: str = None) -> pd.DataFrame:
+    """
+    Step 2: homicide rates from homicide_rates_extracted.csv when present
+    (the last scrape, possibly hand-corrected), else a fresh Wikipedia scrape.
+    """
+    cache_csv_path = cache_csv_path or HOMICIDE_CACHE
+    if os.path.exists(cache_csv_path):
+        df_cache = pd.read_csv(cache_csv_path, keep_default_na=False, na_values=[""])
+        if {"country_wiki", "homicide_rate"}.issubset(df_cache.columns):
+            df_cache["homicide_rate"] = pd.to_numeric(df_cache["homicide_rate"], errors="coerce")
+            return df_cache.dropna(subset=["homicide_rate"])
+    return scrape_homicide_rates()
+
+
+def load_gpi_frame() -> pd.DataFrame:
+    """Step 3: GPI 2025 scores from the PDF (or its CSV cache)."""
+    df_gpi = load_gpi_2025_scores(pdf_path=GPI_PDF, cache_csv_path=GPI_CACHE)
+    df_gpi["gpi_score"] = pd.to_numeric(df_gpi["gpi_score"], errors="coerce")
+    return df_gpi
+
+
+def load_advisory_frame(path: str = None) -> pd.DataFrame:
+    """Step 4: curated US advisory levels -> (code_2, advisory_level)."""
+    path = path or ADVISORY_FILE
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=["code_2", "advisory_level"])
+    df_advisory = pd.read_csv(path, keep_default_na=False, na_values=[""])
+    if "country_code" in df_advisory.columns:
+        df_advisory = df_advisory.rename(
+            columns={"country_code": "code_2", "advisory_level": "advisory_level"}
+        )
+    return df_advisory[["code_2", "advisory_level"]]
 
-    print("4. Loading US Advisories...")
-    ADVISORY_FILE = _here("us_advisories_manual.csv")
 
-    df_advisory = pd.DataFrame(columns=["code_2", "advisory_level"])
-    if os.path.exists(ADVISORY_FILE):
-        try:
-            df_advisory = pd.read_csv(ADVISORY_FILE)
-            if "country_code" in df_advisory.columns:
-                df_advisory = df_advisory.rename(
-                    columns={"country_code": "code_2", "advisory_level": "advisory_level"}
-                )
-            df_advisory = df_advisory[["code_2", "advisory_level"]]
-            print(f"   Loaded {len(df_advisory)} advisory records.")
-        except Exception as e:
-            print(f"   Error loading advisories: {e}")
+def match_source_names(names: pd.Series, df_master: pd.DataFrame, namespace: str,
+                       normalize=None, match_many=None) -> pd.Series:
+    """
+    name_norm for each source row. Names that don't join exactly are resolved
+    onto a country's name_norm through aliases and blocked fuzzy matching,
+    unless that country already has an exact row.
 
-    print("5. Merging Data...")
+    `normalize(series)` and `match_many(matcher, names)` replace the
+    row-by-row defaults (the partitioned executor fans them out to workers).
+    """
+    norm = normalize(names) if normalize else names.apply(normalize_name)
+    known = set(df_master["name_norm"])
+    leftovers = sorted(set(norm) - known - {""})
+    if not leftovers:
+        return norm
+
+    matcher = FuzzyMatcher(dict(zip(df_master["name_norm"], df_master["code_2"])), namespace=namespace)
+    matches = match_many(matcher, leftovers) if match_many else matcher.match_many(leftovers)
+    report(matches, f"{namespace} names")
+
+    code_to_norm = dict(zip(df_master["code_2"], df_master["name_norm"]))
+    taken = set(norm) & known
+    remap = {}
+    for name, m in zip(leftovers, matches):
+        target = code_to_norm.get(m.code)
+        if target and target not in taken:
+            remap[name] = target
+            taken.add(target)
+    return norm.replace(remap)
+
+
+def source_tables(df_master, df_homicide, df_gpi, df_advisory, normalize=None, match_many=None) -> dict:
+    """
+    The per-source lookup tables merge_sources joins, deduplicated on their
+    join key: homicide and GPI by name_norm, advisories by code_2. Empty
+    sources map to None.
+    """
+    tables = {"homicide": None, "gpi": None}
+    if not df_homicide.empty:
+        df_homicide = df_homicide.copy()
+        df_homicide["name_norm"] = match_source_names(
+            df_homicide["country_wiki"], df_master, "homicide", normalize, match_many
+        )
+        tables["homicide"] = df_homicide.drop_duplicates(subset=["name_norm"])[["name_norm", "homicide_rate"]]
 
-    def normalize_name(name):
-        if pd.isna(name):
-            return ""
-        name = _strip_accents(str(name)).lower().strip()
-        name = re.sub(r"\s*\(.*\)", "", name)
-        name = re.sub(r"[*†]", "", name)
-        name = name.replace("the ", "")
-        name = name.replace("republic of ", "")
-        name = name.replace("kingdom of ", "")
-        name = name.replace("state of ", "")
-        return name.strip()
+    if not df_gpi.empty:
+        df_gpi = df_gpi.copy()
+        df_gpi["name_norm"] = match_source_names(
+            df_gpi["country_gpi"], df_master, "gpi", normalize, match_many
+        )
+        tables["gpi"] = df_gpi.drop_duplicates(subset=["name_norm"])[["name_norm", "gpi_score", "gpi_rank"]]
+
+    tables["advisory"] = df_advisory.drop_duplicates(subset=["code_2"])[["code_2", "advisory_level"]]
+    return tables
+
+
+def join_sources(df_master: pd.DataFrame, tables: dict) -> pd.DataFrame:
+    """Left-join source_tables() onto countries; row order and count are kept."""
+    if tables["homicide"] is not None:
+        df_master = df_master.merge(tables["homicide"], on="name_norm", how="left")
+    else:
+        df_master = df_master.assign(homicide_rate=np.nan)
+
+    if tables["gpi"] is not None:
+        df_master = df_master.merge(tables["gpi"], on="name_norm", how="left")
+    else:
+        df_master = df_master.assign(gpi_score=np.nan, gpi_rank=np.nan)
+
+    return df_master.merge(tables["advisory"], on="code_2", how="left")
+
+
+def restrict_tables(tables: dict, df_master: pd.DataFrame) -> dict:
+    """source_tables() cut down to the rows that can join onto df_master."""
+    names = set(df_master["name_norm"])
+    codes = set(df_master["code_2"])
+    return {
+        "homicide": None if tables["homicide"] is None else tables["homicide"][tables["homicide"]["name_norm"].isin(names)],
+        "gpi": None if tables["gpi"] is None else tables["gpi"][tables["gpi"]["name_norm"].isin(names)],
+        "advisory": tables["advisory"][tables["advisory"]["code_2"].isin(codes)],
+    }
 
+
+def merge_sources(df_countries, df_homicide, df_gpi, df_advisory, universe=None) -> pd.DataFrame:
+    """
+    Step 5: left-join homicide/GPI (by normalized name, with fuzzy matching
+    for leftovers) and advisories (by code).
+
+    With `universe` (every country, for a subset run) source names are
+    still resolved against all countries, so fuzzy decisions are the cached
+    ones of the full build and a name can't land on the wrong subset
+    country; the tables are then cut to the subset before the joins.
+    """
     df_master = df_countries.copy()
     df_master = df_master.drop_duplicates(subset=["code_2"])
 
     df_master["name_norm"] = df_master["country"].apply(normalize_name)
 
-    if not df_homicide.empty:
-        df_homicide["name_norm"] = df_homicide["country_wiki"].apply(normalize_name)
-        df_homicide = df_homicide.drop_duplicates(subset=["name_norm"])
-        df_master = df_master.merge(
-            df_homicide[["name_norm", "homicide_rate"]], on="name_norm", how="left"
-        )
-    else:
-        df_master["homicide_rate"] = np.nan
+    if universe is None:
+        return join_sources(df_master, source_tables(df_master, df_homicide, df_gpi, df_advisory))
 
-    if not df_gpi.empty:
-        df_gpi["name_norm"] = df_gpi["country_gpi"].apply(normalize_name)
-        df_gpi = df_gpi.drop_duplicates(subset=["name_norm"])
-        df_master = df_master.merge(
-            df_gpi[["name_norm", "gpi_score", "gpi_rank"]], on="name_norm", how="left"
-        )
+    df_names = universe.drop_duplicates(subset=["code_2"]).copy()
+    df_names["name_norm"] = df_names["country"].apply(normalize_name)
+    tables = source_tables(df_names, df_homicide, df_gpi, df_advisory)
+    return join_sources(df_master, restrict_tables(tables, df_master))
+
+
+def load_full_build(results_csv: str = None, sketches_path: str = None):
+    """
+    (results, sketches) of the last full run, which a subset run scores
+    against. Without a saved sketch file, the sketches are rebuilt from the
+    raw inputs in the results CSV (same bounds and medians).
+    """
+    df_full = pd.read_csv(results_csv or _here("results", "TravelSafe_Final_Analysis.csv"),
+                          keep_default_na=False, na_values=[""])
+    sketches_path = sketches_path or _here("results", "quantile_sketches.json")
+    if os.path.exists(sketches_path):
+        sketches = SketchSet.load(sketches_path)
     else:
-        df_master["gpi_score"] = np.nan
-        df_master["gpi_rank"] = np.nan
+        sketches = sketch_tsi_inputs(df_full)
+    return df_full, sketches
 
-    df_advisory = df_advisory.drop_duplicates(subset=["code_2"])
-    df_master = df_master.merge(
-        df_advisory[["code_2", "advisory_level"]], on="code_2", how="left"
-    )
 
-    print("6. Calculating TSI...")
+def carry_source_values(df_master: pd.DataFrame, df_full: pd.DataFrame, sources) -> pd.DataFrame:
+    """
+    Subset runs: take the columns of `sources` (that came back empty, e.g.
+    offline) from the last full build rather than rescoring on blanks.
+    """
+    previous = df_full.drop_duplicates(subset=["code_2"]).set_index("code_2")
+    df_master = df_master.copy()
+    for source in sources:
+        for col in SOURCE_COLUMNS[source]:
+            if col in previous.columns:
+                df_master[col] = df_master["code_2"].map(previous[col])
+    return df_master
+
+
+def upsert_results(df_full: pd.DataFrame, df_model: pd.DataFrame) -> pd.DataFrame:
+    """The full results with df_model's rows replaced in place (new codes appended)."""
+    fresh = df_model.reindex(columns=df_full.columns).set_index("code_2")
+    out = df_full.set_index("code_2")
+    known = fresh.index.isin(out.index)
+    out.loc[fresh.index[known]] = fresh[known]
+    return pd.concat([out, fresh[~known]]).reset_index()
+
+
+def run_analysis(df_countries=None, df_homicide=None, df_gpi=None, df_advisory=None,
+                 workers: int = None, partition_by: str = "hash", codes=None):
+    """
+    Run the full pipeline. Any source frame passed in (e.g. from the ingestion
+    daemon's cache) is used as-is instead of being fetched again.
 
-    df_model = df_master.copy()
+    With workers > 1, steps 5–7 and the CSV export run partition-parallel
+    (by code_2 hash or region) in a process pool; results are identical.
 
-    hom_median = df_model["homicide_rate"].median()
-    df_model["homicide_log"] = np.log1p(df_model["homicide_rate"].fillna(hom_median))
+    With codes, only those countries are refreshed, merged, scored and
+    written back into the last full results. Scores use that build's TSI
+    scales and tier centroids, so they stay comparable with every other
+    row; outputs that describe all countries are left to the next full run.
 
-    scaler_hom = MinMaxScaler((0, 100))
-    hom_scaled = scaler_hom.fit_transform(df_model[["homicide_log"]])
-    df_model["homicide_norm"] = 100 - hom_scaled
+    Returns True on success, and False when a required input was missing or
+    the final table failed validation (so schedulers can retry the run).
+    """
+    print("Starting TravelSafe Analysis...")
 
-    gpi_median = df_model["gpi_score"].median()
-    df_model["gpi_filled"] = df_model["gpi_score"].fillna(gpi_median)
-    scaler_gpi = MinMaxScaler((0, 100))
-    gpi_scaled = scaler_gpi.fit_transform(df_model[["gpi_filled"]])
-    df_model["gpi_norm"] = 100 - gpi_scaled
+    df_full = sketches = universe = None
+    if codes:
+        codes = sorted({str(c).upper() for c in codes})
+        try:
+            df_full, sketches = load_full_build()
+        except Exception as e:
+            print(f"   Error: a subset run needs a previous full build ({e})")
+            return False
+        print(f"   Subset run: {len(codes)} countries against the last full build ({len(df_full)} countries).")
+        if workers and workers > 1:
+            print("   Subset run is serial; ignoring --workers.")
+            workers = None
 
-    def advisory_to_score(level):
-        if pd.isna(level):
-            return 50
-        mapping = {1: 100, 2: 66, 3: 33, 4: 0}
-        return mapping.get(int(level), 50)
+    print("1. Fetching REST Countries data...")
+    if df_countries is None:
+        try:
+            df_countries = fetch_countries_frame(codes)
+        except Exception as e:
+            print(f"   Error fetching REST Countries: {e}")
+            return False
+    if codes:
+        universe = df_countries
+        df_countries = universe[universe["code_2"].astype(str).str.upper().isin(codes)]
+        missing = sorted(set(codes) - set(df_countries["code_2"].astype(str).str.upper()))
+        if missing:
+            print(f"   Unknown codes skipped: {', '.join(missing)}")
+    print(f"   Loaded {len(df_countries)} countries.")
+
+    print("2. Loading Wikipedia Homicide Rates...")
+    if df_homicide is None:
+        df_homicide = load_homicide_frame()
+    if not df_homicide.empty:
+        print(f"   Loaded {len(df_homicide)} homicide records.")
 
-    df_model["advisory_norm"] = df_model["advisory_level"].apply(advisory_to_score)
+    print("3. Loading Global Peace Index (GPI) 2025 from PDF...")
+    if df_gpi is None:
+        df_gpi = pd.DataFrame(columns=["country_gpi", "gpi_score", "gpi_rank"])
+        try:
+            df_gpi = load_gpi_frame()
+        except Exception as e:
+            print(f"   Error loading GPI PDF: {e}")
+    if not df_gpi.empty:
+        print(f"   Loaded {len(df_gpi)} GPI records.")
 
-    df_model["TSI"] = (
-        0.4 * df_model["homicide_norm"]
-        + 0.3 * df_model["gpi_norm"]
-        + 0.3 * df_model["advisory_norm"]
-    )
+    print("4. Loading US Advisories...")
+    if df_advisory is None:
+        df_advisory = pd.DataFrame(columns=["code_2", "advisory_level"])
+        try:
+            df_advisory = load_advisory_frame()
+        except Exception as e:
+            print(f"   Error loading advisories: {e}")
+    if not df_advisory.empty:
+        print(f"   Loaded {len(df_advisory)} advisory records.")
+
+    known_codes = (universe if codes else df_countries)["code_2"].astype(str).str.upper().unique()
+    reports = []
+
+    def validate(df, table):
+        schema = None
+        if codes and table in ("merged", "final"):
+            # The row-count floor is meant for full builds.
+            schema = {k: v for k, v in SCHEMAS[table].items() if k != "min_rows"}
+        report = validate_table(df, table, known_codes=known_codes, schema=schema)
+        print_report(report)
+        reports.append(report)
+
+    print("   Validating inputs...")
+    for df, table in [(df_homicide, "homicide"), (df_gpi, "gpi"), (df_advisory, "advisory")]:
+        if not df.empty:
+            validate(df, table)
+
+    executor = None
+    if workers and workers > 1:
+        # Imported here: partitioned.py is built on this module's stages.
+        from partitioned import PartitionedExecutor
+
+        executor = PartitionedExecutor(workers, partition_by)
+        print(f"   Running steps 5–7 on {workers} workers (partitioned by {partition_by}).")
 
-    print("7. Running Clustering...")
-    features = ["homicide_norm", "gpi_norm", "advisory_norm"]
-    X = df_model[features].fillna(50)
+    print("5. Merging Data...")
+    if executor:
+        df_master = executor.merge_sources(df_countries, df_homicide, df_gpi, df_advisory)
+    else:
+        df_master = merge_sources(df_countries, df_homicide, df_gpi, df_advisory, universe=universe)
+    if codes:
+        empty = [name for name, df in (("homicide", df_homicide), ("gpi", df_gpi), ("advisory", df_advisory))
+                 if df.empty]
+        if empty:
+            print(f"   No {', '.join(empty)} data this run; keeping the last full build's values.")
+            df_master = carry_source_values(df_master, df_full, empty)
+    validate(df_master, "merged")
 
-    kmeans = KMeans(n_clusters=4, random_state=42)
-    df_model["cluster"] = kmeans.fit_predict(X)
+    print("6. Calculating TSI...")
+    df_model = executor.compute_tsi(df_master) if executor else compute_tsi(df_master, sketches, df_full)
 
-    cluster_means = (
-        df_model.groupby("cluster")["TSI"].mean().sort_values(ascending=False)
-    )
-    cluster_map = {}
-    labels = ["Safe", "Moderate", "Caution", "High Risk"]
-    for i, cluster_id in enumerate(cluster_means.index):
-        cluster_map[cluster_id] = labels[i]
+    print("7. Running Clustering...")
+    if codes:
+        df_model = assign_tiers_from(df_model, df_full)
+    else:
+        df_model = executor.assign_risk_tiers(df_model) if executor else assign_risk_tiers(df_model)
+    validate(df_model, "final")
+    final_ok = reports[-1]["passed"]
+
+    if codes:
+        if not final_ok:
+            print("   Error: the rescored countries failed validation; results left unchanged.")
+            return False
+        out_file = _here("results", "TravelSafe_Final_Analysis.csv")
+        df_all = upsert_results(df_full, df_model)
+        df_all.to_csv(out_file, index=False)
+        print(f"✓ {len(df_model)} countries updated in {out_file}")
+        print(
+            "   Places, feature vectors, summary, sketches, cube, charts and the validation "
+            "report describe every "
+            "country and are left as of the last full run."
+        )
+        ranking = RankingIndex.from_frame(df_all)
+        try:
+            print(f"✓ Rankings saved to {ranking.save(_here('results', 'rankings.json'))}")
+        except Exception as e:
+            print(f"Warning: could not write rankings: {e}")
+        print("\nUpdated countries (by TSI):")
+        print(df_model.sort_values("TSI", ascending=False)[["country", "TSI", "risk_tier"]].to_string(index=False))
+        return True
+
+    df_places = None
+    places_in = load_places()
+    if not places_in.empty:
+        print("8. Scoring sub-national places...")
+        df_places = merge_places(df_model, places_in, load_regional_advisories())
+        df_places = compute_place_tsi(df_places, df_model)
+        validate(df_places, "places")
 
-    df_model["risk_tier"] = df_model["cluster"].map(cluster_map)
+    try:
+        print(f"✓ Validation report saved to {save_report(reports, _here('results', 'validation_report.json'))}")
+    except Exception as e:
+        print(f"Warning: could not write validation report: {e}")
 
     out_file = _here("results", "TravelSafe_Final_Analysis.csv")
     os.makedirs(os.path.dirname(out_file), exist_ok=True)
-    df_model.to_csv(out_file, index=False)
+    if executor:
+        executor.to_csv(df_model, out_file)
+        executor.close()
+    else:
+        df_model.to_csv(out_file, index=False)
     print(f"✓ Analysis complete. Saved to {out_file}")
 
+    if df_places is not None:
+        places_file = save_places(df_places, _here("results", "TravelSafe_Places.csv"))
+        print(f"✓ {len(df_places)} places scored. Saved to {places_file}")
+
+    try:
+        vectors_path = save_feature_vectors(
+            df_model, _here("results", "feature_vectors.npz"), _here("data", "processed.json")
+        )
+        print(f"✓ Feature vectors saved to {vectors_path}")
+    except Exception as e:
+        print(f"Warning: could not write feature vectors: {e}")
+
     summary = {
         "total_countries": _safe_int(len(df_model)),
         "countries_with_homicide_data": _safe_int(df_model["homicide_rate"].notna().sum()),
@@ -409,23 +820,23 @@ def run_analysis():
     }
 
     mean_crime_score = None
+    safety = {}
     try:
-        safety_path = _here("data", "processed.json")
-        if os.path.exists(safety_path):
-            with open(safety_path, "r", encoding="utf-8") as f:
-                safety = json.load(f) or {}
-            crime_scores = []
-            for v in safety.values():
-                rs = (v or {}).get("risk_scores") or {}
-                c = rs.get("crime")
-                if c is None:
-                    continue
-                try:
-                    crime_scores.append(float(c))
-                except Exception:
-                    pass
-            if crime_scores:
-                mean_crime_score = float(np.mean(crime_scores))
+        # One streaming pass: the crime mean plus the few fields the cube needs.
+        crime_scores = []
+        for code, v in open_processed(_here("data", "processed.json")).items():
+            v = v or {}
+            rs = v.get("risk_scores") or {}
+            safety[code] = {"overall_risk": v.get("overall_risk"), "risk_scores": rs, "latlng": v.get("latlng")}
+            c = rs.get("crime")
+            if c is None:
+                continue
+            try:
+                crime_scores.append(float(c))
+            except Exception:
+                pass
+        if crime_scores:
+            mean_crime_score = float(np.mean(crime_scores))
     except Exception:
         mean_crime_score = None
 
@@ -440,15 +851,54 @@ def run_analysis():
     except Exception as e:
         print(f"Warning: could not write summary JSON: {e}")
 
+    try:
+        sketches = sketch_tsi_inputs(df_model).add_frame("scored", df_model, ["TSI"] + TIER_FEATURES)
+        print(f"✓ Quantile sketches saved to {sketches.save(_here('results', 'quantile_sketches.json'))}")
+    except Exception as e:
+        print(f"Warning: could not write quantile sketches: {e}")
+
+    ranking = RankingIndex.from_frame(df_model)
+    try:
+        print(f"✓ Rankings saved to {ranking.save(_here('results', 'rankings.json'))}")
+    except Exception as e:
+        print(f"Warning: could not write rankings: {e}")
+
+    try:
+        cube = AggregateCube.build(df_model, safety)
+        print(f"✓ Aggregate cube saved to {cube.save(_here('results', 'aggregate_cube.json'))}")
+    except Exception as e:
+        print(f"Warning: could not write aggregate cube: {e}")
+
+    try:
+        charts = render_charts(df_model, safety=safety, workers=workers)
+        print(
+            f"✓ Charts: {len(charts['rendered'])} rendered, {len(charts['cached'])} unchanged. "
+            f"Saved to {_here('results', 'charts')}"
+        )
+    except Exception as e:
+        print(f"Warning: could not render charts: {e}")
+
     print("\nTop 10 Safest Countries (by TSI):")
-    print(
-        df_model[["country", "TSI", "risk_tier"]]
-        .sort_values("TSI", ascending=False)
-        .head(10)
-        .to_string(index=False)
-    )
+    top = df_model.set_index("code_2").loc[[r["code"] for r in ranking.top_k(10)]]
+    print(top[["country", "TSI", "risk_tier"]].to_string(index=False))
+    return final_ok
 
 
 if __name__ == "__main__":
-    run_analysis()
+    parser = argparse.ArgumentParser(description="Run the TravelSafe analysis pipeline.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Run merge, scoring and export partition-parallel on this many processes")
+    parser.add_argument("--partition-by", choices=["hash", "region"], default="hash")
+    parser.add_argument("--codes", default=None,
+                        help="Comma-separated ISO2 codes: refresh only these countries against the last full build")
+    parser.add_argument("--core", action="store_true",
+                        help="Refresh only the core tourism countries (build_country_safety.TOURISM_CODES)")
+    args = parser.parse_args()
+    codes = [c.strip() for c in args.codes.split(",") if c.strip()] if args.codes else None
+    if args.core:
+        from build_country_safety import TOURISM_CODES
+
+        codes = TOURISM_CODES
+    ok = run_analysis(workers=args.workers, partition_by=args.partition_by, codes=codes)
+    raise SystemExit(0 if ok else 1)
 
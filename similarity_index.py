@@ -0,0 +1,178 @@
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KDTree
+
+from processed_store import open_processed
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+VECTORS_PATH = os.path.join(BASE_DIR, "results", "feature_vectors.npz")
+
+CLUSTER_FEATURES = ["homicide_norm", "gpi_norm", "advisory_norm"]
+RISK_SCORE_KEYS = ["crime", "political", "health", "natural_disaster"]
+
+
+def _risk_score_safety(scores):
+    """Map 1–5 risk scores onto the 0–100 safety scale used by the norms."""
+    scores = np.asarray(scores, dtype=float)
+    return np.clip((5.0 - scores) / 4.0 * 100.0, 0.0, 100.0)
+
+
+def build_feature_matrix(df_model: pd.DataFrame, safety: dict = None):
+    """
+    Stack the clustering features and processed.json risk_scores into one
+    matrix where every column is "higher = safer" on a 0–100 scale.
+
+    Missing values are filled with 50, the same neutral value the clustering
+    step uses.
+    """
+    safety = safety or {}
+    codes = df_model["code_2"].astype(str).str.upper().to_numpy().astype(str)
+    base = df_model[CLUSTER_FEATURES].to_numpy(dtype=float)
+
+    risk = np.full((len(codes), len(RISK_SCORE_KEYS)), np.nan)
+    for row, code in enumerate(codes):
+        scores = (safety.get(code) or {}).get("risk_scores") or {}
+        for col, key in enumerate(RISK_SCORE_KEYS):
+            if scores.get(key) is not None:
+                risk[row, col] = scores[key]
+
+    matrix = np.hstack([base, _risk_score_safety(risk)])
+    matrix = np.where(np.isnan(matrix), 50.0, matrix)
+    feature_names = CLUSTER_FEATURES + [f"{k}_safety" for k in RISK_SCORE_KEYS]
+    return codes, matrix, feature_names
+
+
+def save_feature_vectors(df_model: pd.DataFrame, path: str = None, safety_path: str = None):
+    """Persist per-country feature vectors next to the results CSV."""
+    path = path or VECTORS_PATH
+    safety_path = safety_path or os.path.join(BASE_DIR, "data", "processed.json")
+    safety = open_processed(safety_path)
+
+    codes, matrix, feature_names = build_feature_matrix(df_model, safety)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.savez_compressed(
+        path,
+        codes=codes,
+        names=df_model["country"].to_numpy().astype(str),
+        features=matrix,
+        feature_names=np.asarray(feature_names),
+        tsi=df_model["TSI"].to_numpy(dtype=float),
+        tiers=df_model["risk_tier"].to_numpy().astype(str),
+    )
+    return path
+
+
+class CountrySimilarityIndex:
+    """
+    KD-tree over persisted country feature vectors.
+
+    Answers "countries like this one" and "similar but safer" for a whole
+    batch of query countries with one tree walk instead of a pairwise scan.
+    """
+
+    def __init__(self, codes, features, tsi, names=None, tiers=None,
+                 feature_names=None, weights=None):
+        self.codes = np.asarray(codes, dtype=object)
+        self.features = np.asarray(features, dtype=float)
+        self.tsi = np.asarray(tsi, dtype=float)
+        self.names = np.asarray(names, dtype=object) if names is not None else self.codes
+        self.tiers = (
+            np.asarray(tiers, dtype=object)
+            if tiers is not None
+            else np.full(len(self.codes), None, dtype=object)
+        )
+        self.feature_names = list(feature_names or [])
+        self.weights = (
+            np.ones(self.features.shape[1])
+            if weights is None
+            else np.asarray(weights, dtype=float)
+        )
+        self._pos = {code: i for i, code in enumerate(self.codes)}
+        self._scaled = self.features * self.weights
+        self._tree = KDTree(self._scaled)
+
+    def __len__(self):
+        return len(self.codes)
+
+    @classmethod
+    def load(cls, path: str = None, weights=None):
+        with np.load(path or VECTORS_PATH, allow_pickle=False) as npz:
+            return cls(
+                codes=npz["codes"],
+                features=npz["features"],
+                tsi=npz["tsi"],
+                names=npz["names"],
+                tiers=npz["tiers"],
+                feature_names=[str(n) for n in npz["feature_names"]],
+                weights=weights,
+            )
+
+    def _query_rows(self, codes):
+        codes = [str(c).upper() for c in codes]
+        unknown = [c for c in codes if c not in self._pos]
+        if unknown:
+            raise KeyError(f"Unknown country codes: {', '.join(unknown)}")
+        return codes, np.array([self._pos[c] for c in codes], dtype=int)
+
+    def _format(self, i, dist):
+        return {
+            "code": self.codes[i],
+            "name": self.names[i],
+            "distance": float(dist),
+            "TSI": float(self.tsi[i]),
+            "risk_tier": self.tiers[i],
+        }
+
+    def similar(self, codes, k: int = 5):
+        """k most similar countries for each code (the query itself excluded)."""
+        codes, rows = self._query_rows(codes)
+        k_fetch = min(len(self.codes), k + 1)
+        dist, ind = self._tree.query(self._scaled[rows], k=k_fetch)
+        out = {}
+        for r, code in enumerate(codes):
+            hits = [self._format(i, d) for d, i in zip(dist[r], ind[r]) if i != rows[r]]
+            out[code] = hits[:k]
+        return out
+
+    def safer_alternatives(self, codes, k: int = 5, min_gain: float = 0.0):
+        """
+        k most similar countries whose TSI exceeds the query's TSI by more
+        than min_gain points.
+
+        All queries share one batched tree walk; only the rows that did not
+        find k safer neighbours are re-queried with a wider fetch.
+        """
+        codes, rows = self._query_rows(codes)
+        n = len(self.codes)
+        found = {code: [] for code in codes}
+        pending = np.arange(len(rows))
+        k_fetch = min(n, 4 * k + 1)
+
+        while len(pending):
+            dist, ind = self._tree.query(self._scaled[rows[pending]], k=k_fetch)
+            still = []
+            for j, r in enumerate(pending):
+                threshold = self.tsi[rows[r]] + min_gain
+                passing = ind[j] != rows[r]
+                passing &= self.tsi[ind[j]] > threshold
+                hits = [
+                    self._format(i, d)
+                    for d, i in zip(dist[j][passing][:k], ind[j][passing][:k])
+                ]
+                if len(hits) < k and k_fetch < n:
+                    still.append(r)
+                else:
+                    found[codes[r]] = hits
+            pending = np.asarray(still, dtype=int)
+            k_fetch = min(n, k_fetch * 2)
+        return found
+
+
+if __name__ == "__main__":
+    index = CountrySimilarityIndex.load()
+    print(f"Loaded {len(index)} country vectors.")
+    for code, hits in index.safer_alternatives(["MX", "TH"], k=3).items():
+        print(code, "->", ", ".join(f"{h['code']} (TSI {h['TSI']:.1f})" for h in hits))
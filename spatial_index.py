@@ -0,0 +1,199 @@
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import BallTree
+
+from processed_store import open_processed
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+class CountrySpatialIndex:
+    """
+    Haversine ball-tree over country (or capital) coordinates.
+
+    Each country is stored once with its code, name, TSI and risk tier, so the
+    batch queries below can filter candidates by safety without going back to
+    the DataFrame. Distances are returned in kilometres.
+    """
+
+    def __init__(self, codes, latlng, tsi=None, tiers=None, names=None):
+        latlng = np.asarray(latlng, dtype=float).reshape(-1, 2)
+        keep = ~np.isnan(latlng).any(axis=1)
+
+        self.codes = np.asarray(codes, dtype=object)[keep]
+        self.names = (
+            np.asarray(names, dtype=object)[keep] if names is not None else self.codes
+        )
+        n = len(self.codes)
+        self.tsi = (
+            np.asarray(tsi, dtype=float)[keep] if tsi is not None else np.full(n, np.nan)
+        )
+        self.tiers = (
+            np.asarray(tiers, dtype=object)[keep]
+            if tiers is not None
+            else np.full(n, None, dtype=object)
+        )
+        self.latlng = latlng[keep]
+        self._pos = {code: i for i, code in enumerate(self.codes)}
+
+        if n == 0:
+            raise ValueError("No countries with coordinates to index.")
+        self._tree = BallTree(np.radians(self.latlng), metric="haversine")
+
+    def __len__(self):
+        return len(self.codes)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, use_capital: bool = True):
+        """
+        Build from a results frame (TravelSafe_Final_Analysis.csv layout).
+
+        Capital coordinates are preferred when use_capital is set; countries
+        without a capital position fall back to the country centroid.
+        """
+        missing = {"code_2", "lat", "lng"} - set(df.columns)
+        if missing:
+            raise ValueError(
+                f"Results frame has no coordinates (missing {sorted(missing)}). "
+                "Re-run run_full_analysis.py to regenerate it."
+            )
+        lat = df["lat"].to_numpy(dtype=float)
+        lng = df["lng"].to_numpy(dtype=float)
+        if use_capital and {"capital_lat", "capital_lng"}.issubset(df.columns):
+            cap_lat = df["capital_lat"].to_numpy(dtype=float)
+            cap_lng = df["capital_lng"].to_numpy(dtype=float)
+            has_cap = ~(np.isnan(cap_lat) | np.isnan(cap_lng))
+            lat = np.where(has_cap, cap_lat, lat)
+            lng = np.where(has_cap, cap_lng, lng)
+
+        return cls(
+            codes=df["code_2"].to_numpy(),
+            latlng=np.column_stack([lat, lng]),
+            tsi=df["TSI"].to_numpy(dtype=float) if "TSI" in df.columns else None,
+            tiers=df["risk_tier"].to_numpy() if "risk_tier" in df.columns else None,
+            names=df["country"].to_numpy() if "country" in df.columns else None,
+        )
+
+    @classmethod
+    def from_results_csv(cls, path: str = None, use_capital: bool = True):
+        path = path or os.path.join(BASE_DIR, "results", "TravelSafe_Final_Analysis.csv")
+        df = pd.read_csv(path, keep_default_na=False, na_values=[""])
+        return cls.from_frame(df, use_capital=use_capital)
+
+    @classmethod
+    def from_processed_json(cls, path: str = None, use_capital: bool = True):
+        """Build from data/processed.json (coordinates only, no TSI or tiers)."""
+        path = path or os.path.join(BASE_DIR, "data", "processed.json")
+        data = open_processed(path)
+        codes, latlng, names = [], [], []
+        for code, rec in data.items():
+            point = (rec.get("capital_latlng") if use_capital else None) or rec.get(
+                "latlng"
+            )
+            if not point:
+                continue
+            codes.append(code)
+            latlng.append(point)
+            names.append(rec.get("name", code))
+        return cls(codes=codes, latlng=latlng, names=names)
+
+    def _candidate_mask(self, min_tsi=None, tier=None):
+        mask = np.ones(len(self.codes), dtype=bool)
+        if min_tsi is not None:
+            mask &= self.tsi > min_tsi
+        if tier is not None:
+            tiers = {tier} if isinstance(tier, str) else set(tier)
+            mask &= np.isin(self.tiers, list(tiers))
+        return mask
+
+    def _query_points(self, codes):
+        codes = [str(c).upper() for c in codes]
+        unknown = [c for c in codes if c not in self._pos]
+        if unknown:
+            raise KeyError(f"No coordinates for: {', '.join(unknown)}")
+        idx = np.fromiter((self._pos[c] for c in codes), dtype=int, count=len(codes))
+        return codes, idx
+
+    def _format(self, i, dist_rad):
+        return {
+            "code": self.codes[i],
+            "name": self.names[i],
+            "distance_km": float(dist_rad * EARTH_RADIUS_KM),
+            "TSI": None if np.isnan(self.tsi[i]) else float(self.tsi[i]),
+            "risk_tier": self.tiers[i],
+        }
+
+    def nearest(self, codes, k: int = 5, min_tsi: float = None, tier=None):
+        """
+        k nearest countries to each code in `codes`, optionally restricted to
+        TSI above min_tsi and/or the given tier(s).
+
+        Returns {code: [ {code, name, distance_km, TSI, risk_tier}, ... ]}.
+        """
+        codes, idx = self._query_points(codes)
+        mask = self._candidate_mask(min_tsi, tier)
+
+        # Over-fetch by the number of excluded points so every query is
+        # guaranteed k passing neighbours in a single batched tree walk.
+        k_fetch = min(len(self.codes), k + 1 + int((~mask).sum()))
+        dist, ind = self._tree.query(np.radians(self.latlng[idx]), k=k_fetch)
+
+        out = {}
+        for row, code in enumerate(codes):
+            hits = []
+            for d, i in zip(dist[row], ind[row]):
+                if i == idx[row] or not mask[i]:
+                    continue
+                hits.append(self._format(i, d))
+                if len(hits) == k:
+                    break
+            out[code] = hits
+        return out
+
+    def within_radius(self, codes, radius_km: float, tier="Safe", min_tsi: float = None):
+        """
+        All countries within radius_km of each code, filtered by tier (default
+        "Safe"; pass None for any tier). Results are sorted by distance.
+        """
+        codes, idx = self._query_points(codes)
+        mask = self._candidate_mask(min_tsi, tier)
+        ind, dist = self._tree.query_radius(
+            np.radians(self.latlng[idx]),
+            r=radius_km / EARTH_RADIUS_KM,
+            return_distance=True,
+            sort_results=True,
+        )
+
+        out = {}
+        for row, code in enumerate(codes):
+            keep = mask[ind[row]] & (ind[row] != idx[row])
+            out[code] = [
+                self._format(i, d) for i, d in zip(ind[row][keep], dist[row][keep])
+            ]
+        return out
+
+    def nearest_to_points(self, latlng, k: int = 5, min_tsi: float = None, tier=None):
+        """Same as nearest(), but for arbitrary (lat, lng) points, e.g. a city."""
+        points = np.asarray(latlng, dtype=float).reshape(-1, 2)
+        mask = self._candidate_mask(min_tsi, tier)
+        k_fetch = min(len(self.codes), k + int((~mask).sum()))
+        dist, ind = self._tree.query(np.radians(points), k=k_fetch)
+
+        out = []
+        for row in range(len(points)):
+            keep = mask[ind[row]]
+            out.append(
+                [self._format(i, d) for i, d in zip(ind[row][keep][:k], dist[row][keep][:k])]
+            )
+        return out
+
+
+if __name__ == "__main__":
+    index = CountrySpatialIndex.from_results_csv()
+    print(f"Indexed {len(index)} countries.")
+    for code, hits in index.nearest(["FR", "JP"], k=3, min_tsi=70).items():
+        print(code, "->", ", ".join(f"{h['code']} ({h['distance_km']:.0f} km)" for h in hits))
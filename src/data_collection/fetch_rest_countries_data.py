@@ -1,32 +1,18 @@
-REST_COUNTRIES_URL = (
-    "https://restcountries.com/v3.1/all"
-    "?fields=name,cca2,region,subregion,population,capital,languages,currencies"
-)
+import os
+import sys
 
-print("Fetching REST Countries data...")
-resp = requests.get(REST_COUNTRIES_URL, timeout=20)
-resp.raise_for_status()
-countries_data = resp.json()
+# country_reference.py lives at the repo root, two levels up.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from country_reference import get_country_reference
 
-# Convert to DataFrame
-countries_list = []
-for item in countries_data:
-    code = item.get("cca2")
-    if not code:
-        continue
-    name = item.get("name", {}).get("common", "")
-    countries_list.append({
-        "code": code.upper(),
-        "name": name,
-        "region": item.get("region", ""),
-        "subregion": item.get("subregion", ""),
-        "population": item.get("population"),
-        "capital": (item.get("capital") or ["N/A"])[0],
-        "languages": ", ".join(list(item.get("languages", {}).values())[:3]) if item.get("languages") else "N/A",
-        "currencies": ", ".join([c["name"] for c in list(item.get("currencies", {}).values())[:2]]) if item.get("currencies") else "N/A"
-    })
+print("Fetching REST Countries data...")
+# Same cached reference table the build scripts use; only downloaded when stale.
+reference = get_country_reference()
 
-df_countries = pd.DataFrame(countries_list)
+df_countries = reference.to_frame(extras=True).rename(
+    columns={"code_2": "code", "country": "name"}
+)[["code", "name", "region", "subregion", "population", "capital", "languages", "currencies"]]
 print(f"✓ Loaded {len(df_countries)} countries from REST Countries API")
 print(f"\nSample data:")
 df_countries.head()
@@ -0,0 +1,406 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from html import escape
+
+from country_reference import FRONTEND_DIR
+from delta_publish import record_hash
+from processed_store import open_processed
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SITE_DIR = os.path.join(BASE_DIR, "site")
+MANIFEST_NAME = "pages.json"
+# Bump when the page templates change, so every page is re-rendered once.
+TEMPLATE_VERSION = 1
+
+RISK_CHIPS = {
+    "low": ("Risk: Low for most trips", "tn-badge tn-badge-low"),
+    "medium": ("Risk: Mixed · stay aware", "tn-badge tn-badge-medium"),
+    "high": ("Risk: High · check advisories", "tn-badge tn-badge-high"),
+}
+RISK_SENTENCES = {
+    "low": "{name} is generally considered low-risk for most visitors, especially in everyday situations.",
+    "medium": "{name} is usually fine for tourism, but certain situations or locations may need extra awareness.",
+    "high": "{name} can involve higher levels of risk, so checking current advisories before you go is important.",
+}
+RISK_DIMENSIONS = [
+    ("crime", "Crime / petty theft"),
+    ("political", "Political stability"),
+    ("health", "Health infrastructure"),
+    ("natural_disaster", "Natural hazards"),
+]
+DEFAULT_CONTACTS = {
+    "police": "Local police emergency number",
+    "ambulance": "Local medical emergency number",
+    "fire": "Local fire emergency number",
+    "note": "Save these numbers in your phone and on paper before you need them.",
+}
+DEFAULT_MINDSET = (
+    "Move one step at a time, keep your phone charged, and give yourself "
+    "permission to slow down and make safe choices."
+)
+
+
+def slugify(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", (text or "").lower()).strip("-") or "other"
+
+
+def country_path(code: str) -> str:
+    return f"countries/{code.lower()}.html"
+
+
+def region_path(region: str) -> str:
+    return f"regions/{slugify(region)}.html"
+
+
+def format_population(num) -> str:
+    """Same rounding as tn.js formatPopulation."""
+    if not num:
+        return "N/A"
+    for limit, suffix in ((1_000_000_000, "B"), (1_000_000, "M"), (1_000, "K")):
+        if num >= limit:
+            return f"{num / limit:.1f}{suffix}"
+    return str(num)
+
+
+def load_reference(ref_dir: str = None) -> dict:
+    """{code: frontend reference record} from data/reference, or {} if not built yet."""
+    ref_dir = ref_dir or FRONTEND_DIR
+    index_path = os.path.join(ref_dir, "index.json")
+    if not os.path.exists(index_path):
+        return {}
+    with open(index_path, "r", encoding="utf-8") as f:
+        index = json.load(f)
+    out = {}
+    for code, entry in index.get("countries", {}).items():
+        path = os.path.join(ref_dir, entry["file"])
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                out[code] = json.load(f)
+    return out
+
+
+def _page(title: str, body: str, depth: int) -> str:
+    root = "../" * depth
+    return f"""<!DOCTYPE html>
+<html lang="en">
+  <head>
+    <meta charset="UTF-8" />
+    <title>{escape(title)} · TravelSafeSC</title>
+    <meta name="viewport" content="width=device-width, initial-scale=1.0" />
+    <link rel="stylesheet" href="{root}tn.css" />
+  </head>
+  <body class="tn-body">
+    <div class="tn-app">
+      <header class="tn-header">
+        <div class="tn-header-left">
+          <a class="tn-logo-mark" href="{root}index.html">TS</a>
+          <div class="tn-logo-text-group">
+            <div class="tn-logo-title">TravelSafeSC</div>
+            <div class="tn-logo-subtitle">Calm, smart safety layer for solo travelers✌</div>
+          </div>
+        </div>
+      </header>
+      <main class="tn-main">
+{body}
+      </main>
+      <footer class="tn-footer">
+        <p class="tn-footer-text">TravelSafeSC · Country Safety Console · pre-rendered page</p>
+      </footer>
+    </div>
+  </body>
+</html>
+"""
+
+
+def _meta_item(label: str, value: str) -> str:
+    return (
+        f'<li class="tn-country-meta-item"><span class="tn-meta-label">{escape(label)}</span>'
+        f'<span class="tn-meta-value">{value}</span></li>'
+    )
+
+
+def _risk_bars(scores: dict) -> str:
+    rows = []
+    for key, label in RISK_DIMENSIONS:
+        raw = scores.get(key)
+        score = max(1, min(5, int(raw))) if raw is not None else 3
+        rows.append(
+            f'<div class="tn-country-meta-item"><span class="tn-meta-label">{label}</span>'
+            f'<span class="tn-meta-value"><meter min="1" max="5" value="{score}"></meter> {score}/5</span></div>'
+        )
+    return "\n".join(rows)
+
+
+def _crisis_section(safety: dict, name: str) -> str:
+    if not safety.get("is_core_country"):
+        return f"""
+        <p class="tn-section-text">You’re viewing a basic safety view for <strong>{escape(name)}</strong>. Detailed risk modelling and crisis playbooks are currently focused on major travel destinations.</p>
+        <p class="tn-section-text">For this country, please check your government's travel advisory, confirm local emergency numbers with your accommodation, and use general solo travel safety habits (keep valuables close, stay in well-lit public areas, and share your plans with someone you trust).</p>"""
+
+    parts = []
+    if safety.get("advisory_excerpt"):
+        link = safety.get("advisory_link")
+        link_html = (
+            f' <a href="{escape(link)}" target="_blank" rel="noopener" class="tn-advisory-link">View full advisory</a>'
+            if link
+            else ""
+        )
+        parts.append(
+            f'<p class="tn-advisory-note">Based on the latest advisory: '
+            f'<span class="tn-advisory-quote">“{escape(safety["advisory_excerpt"])}”</span>{link_html}</p>'
+        )
+    chips = "".join(
+        f'<span class="tn-chip tn-chip-soft">{escape(r)}</span> ' for r in (safety.get("top_risks") or [])[:3]
+    )
+    if chips:
+        parts.append(f"<div>{chips}</div>")
+    parts.append(
+        f'<p class="tn-section-text">Mindset reminder: {escape(safety.get("mindset_tip") or DEFAULT_MINDSET)}</p>'
+    )
+
+    contacts = {**DEFAULT_CONTACTS, **{k: v for k, v in (safety.get("emergency_contacts") or {}).items() if v}}
+    items = [("Unified", contacts["unified"])] if contacts.get("unified") else []
+    items += [(k.capitalize(), contacts[k]) for k in ("police", "ambulance", "fire", "note")]
+    parts.append(
+        '<h3 class="tn-section-title">Emergency contacts</h3><ul class="tn-crisis-contacts-list">'
+        + "".join(
+            f'<li class="tn-crisis-contacts-item"><span class="tn-meta-label">{label}</span>'
+            f'<span class="tn-meta-value">{escape(str(value))}</span></li>'
+            for label, value in items
+        )
+        + "</ul>"
+    )
+
+    scenarios = list((safety.get("playbook") or {}).values())[:3]
+    for scenario in scenarios:
+        steps = "".join(f'<li class="tn-playbook-item">{escape(s)}</li>' for s in scenario.get("steps") or [])
+        parts.append(
+            f'<div class="tn-section-block"><div class="tn-playbook-scenario-title">{escape(scenario.get("label", ""))}</div>'
+            f'<ul class="tn-playbook-list">{steps}</ul></div>'
+        )
+    return "\n        ".join(parts)
+
+
+def render_country_page(safety: dict, reference: dict = None) -> str:
+    """Static equivalent of the tn.js country view (info and crisis panels)."""
+    ref = reference or {}
+    name = safety.get("name") or ref.get("name") or safety.get("code", "")
+    region = ref.get("region") or safety.get("region") or ""
+    subregion = ref.get("subregion") or safety.get("subregion") or ""
+    region_text = region + (f" · {subregion}" if subregion else "") if region else "Region not specified"
+
+    overall = safety.get("overall_risk") or "unknown"
+    chip_label, chip_cls = RISK_CHIPS.get(overall, ("Risk: Unknown", "tn-badge tn-badge-neutral"))
+    risk_sentence = RISK_SENTENCES.get(
+        overall, "Risk levels can vary across regions within the same country, and can change over time."
+    ).format(name=name)
+
+    meta = "\n".join([
+        _meta_item("Capital", escape(ref.get("capital") or "N/A")),
+        _meta_item("Population", format_population(ref.get("population"))),
+        _meta_item("Languages", escape(", ".join(ref.get("languages") or []) or "N/A")),
+        _meta_item("Currencies", escape(", ".join(ref.get("currencies") or []) or "N/A")),
+    ])
+    flag = (ref.get("flag") or {}).get("emoji", "")
+    region_link = f'<a href="../{region_path(region)}">{escape(region_text)}</a>' if region else escape(region_text)
+
+    body = f"""        <section class="tn-tab-panels">
+          <div class="tn-panel-grid">
+            <article class="tn-card tn-card-left">
+              <header class="tn-card-header">
+                <h1 class="tn-card-title">{escape(flag + " " if flag else "")}{escape(name)}</h1>
+                <p class="tn-card-subtitle">Region: {region_link}</p>
+              </header>
+              <section class="tn-section-block tn-country-meta">
+                <ul class="tn-country-meta-list">
+{meta}
+                </ul>
+              </section>
+            </article>
+            <article class="tn-card tn-card-right">
+              <header class="tn-card-header tn-card-header-row">
+                <h2 class="tn-card-title">Safety snapshot</h2>
+                <span class="{chip_cls}">{escape(chip_label)}</span>
+              </header>
+              <section class="tn-section-block tn-risk-section">
+{_risk_bars(safety.get("risk_scores") or {})}
+              </section>
+              <section class="tn-section-block tn-advisory-section">
+                <h3 class="tn-section-title">Advisory source</h3>
+                <p class="tn-section-text">{escape(risk_sentence)}</p>
+              </section>
+            </article>
+          </div>
+          <div class="tn-panel-grid">
+            <article class="tn-card">
+              <header class="tn-card-header">
+                <h2 class="tn-card-title">If something goes wrong</h2>
+              </header>
+              <section class="tn-section-block tn-crisis-overview">
+        {_crisis_section(safety, name)}
+              </section>
+            </article>
+          </div>
+        </section>"""
+    return _page(name, body, depth=1)
+
+
+def _country_list(rows) -> str:
+    items = []
+    for row in rows:
+        label, cls = RISK_CHIPS.get(row["overall_risk"], ("Risk: Unknown", "tn-badge tn-badge-neutral"))
+        items.append(
+            f'<li class="tn-country-meta-item"><a class="tn-meta-label" href="../{country_path(row["code"])}">'
+            f'{escape(row["name"])}</a><span class="{cls}">{escape(label)}</span></li>'
+        )
+    return "\n".join(items)
+
+
+def render_region_page(region: str, rows) -> str:
+    body = f"""        <section class="tn-card">
+          <header class="tn-card-header">
+            <h1 class="tn-card-title">{escape(region or "Other")}</h1>
+            <p class="tn-card-subtitle">{len(rows)} countries</p>
+          </header>
+          <ul class="tn-country-meta-list">
+{_country_list(rows)}
+          </ul>
+        </section>"""
+    return _page(region or "Other", body, depth=1)
+
+
+def render_home_page(regions: dict) -> str:
+    items = "\n".join(
+        f'<li class="tn-country-meta-item"><a class="tn-meta-label" href="{region_path(region)}">'
+        f'{escape(region or "Other")}</a><span class="tn-meta-value">{len(rows)} countries</span></li>'
+        for region, rows in sorted(regions.items())
+    )
+    body = f"""        <section class="tn-card">
+          <header class="tn-card-header">
+            <h1 class="tn-card-title">Country safety briefs by region</h1>
+          </header>
+          <ul class="tn-country-meta-list">
+{items}
+          </ul>
+        </section>"""
+    return _page("Regions", body, depth=0)
+
+
+def _render_task(task):
+    """Worker: render one page and write it atomically. Returns its site path."""
+    kind, path, args, site_dir = task
+    if kind == "country":
+        html = render_country_page(*args)
+    elif kind == "region":
+        html = render_region_page(*args)
+    else:
+        html = render_home_page(*args)
+    out = os.path.join(site_dir, path)
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out + ".tmp", "w", encoding="utf-8") as f:
+        f.write(html)
+    os.replace(out + ".tmp", out)
+    return path
+
+
+def _hash(*parts) -> str:
+    text = json.dumps([TEMPLATE_VERSION, *parts], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def plan_pages(records, reference: dict):
+    """
+    Every page as (kind, path, args, hash). Country pages hash their safety
+    record (delta_publish.record_hash) plus reference facts; region and home
+    pages hash only the fields their listings show.
+    """
+    pages, regions = [], {}
+    for code, safety in records.items():
+        ref = reference.get(code)
+        pages.append(("country", country_path(code), (safety, ref), _hash(record_hash(safety), ref)))
+        region = (ref or {}).get("region") or safety.get("region") or ""
+        regions.setdefault(region, []).append(
+            {"code": code, "name": safety.get("name") or code, "overall_risk": safety.get("overall_risk") or "unknown"}
+        )
+    for region, rows in regions.items():
+        rows.sort(key=lambda r: r["name"])
+        pages.append(("region", region_path(region), (region, rows), _hash(region, rows)))
+    listing = {region: [r["code"] for r in rows] for region, rows in regions.items()}
+    pages.append(("home", "index.html", (regions,), _hash(listing)))
+    return pages
+
+
+def build_site(records=None, reference: dict = None, site_dir: str = None,
+               workers: int = None, force: bool = False) -> dict:
+    """
+    Render the static site incrementally with a process pool.
+
+    Only pages whose hash differs from site/pages.json (or whose file is
+    missing) are rendered; pages for countries or regions that disappeared
+    are deleted. Returns {"rendered", "unchanged", "removed"} counts.
+    """
+    records = open_processed() if records is None else records
+    reference = load_reference() if reference is None else reference
+    site_dir = site_dir or SITE_DIR
+    manifest_path = os.path.join(site_dir, MANIFEST_NAME)
+    os.makedirs(site_dir, exist_ok=True)
+
+    previous = {}
+    if os.path.exists(manifest_path) and not force:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            previous = json.load(f).get("pages", {})
+
+    pages = plan_pages(records, reference)
+    todo = [
+        (kind, path, args, site_dir)
+        for kind, path, args, digest in pages
+        if previous.get(path) != digest or not os.path.exists(os.path.join(site_dir, path))
+    ]
+    if todo:
+        workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        if workers > 1 and len(todo) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(_render_task, todo, chunksize=max(1, len(todo) // (workers * 4))))
+        else:
+            for task in todo:
+                _render_task(task)
+
+    current = {path: digest for _, path, _, digest in pages}
+    removed = [p for p in previous if p not in current]
+    for path in removed:
+        full = os.path.join(site_dir, path)
+        if os.path.exists(full):
+            os.remove(full)
+
+    css = os.path.join(BASE_DIR, "tn.css")
+    if os.path.exists(css):
+        shutil.copyfile(css, os.path.join(site_dir, "tn.css"))
+
+    with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"template_version": TEMPLATE_VERSION, "pages": current}, f, ensure_ascii=False, indent=0)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    return {"rendered": len(todo), "unchanged": len(pages) - len(todo), "removed": len(removed)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-render static country and region pages.")
+    parser.add_argument("--out", default=SITE_DIR, help="Output directory (default: site/).")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="Re-render every page.")
+    args = parser.parse_args(argv)
+
+    stats = build_site(site_dir=args.out, workers=args.workers, force=args.force)
+    print(
+        f"✓ Static site: {stats['rendered']} pages rendered, {stats['unchanged']} unchanged, "
+        f"{stats['removed']} removed. Saved to {args.out}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -4,16 +4,61 @@
 // ===============================
 
 (function () {
+  // Country facts are baked at build time (country_reference.py); index.json
+  // maps names to content-hashed per-country files, so views stay same-origin.
+  // Until a build has baked them, the REST Countries API is queried instead.
+  const REFERENCE_BASE = "data/reference/";
   const REST_COUNTRIES_BASE = "https://restcountries.com/v3.1/name/";
+  const REST_COUNTRIES_FIELDS =
+    "name,cca2,region,subregion,capital,population,languages,currencies,flag,flags";
+
+  let REFERENCE_INDEX = null;
+  async function loadReferenceIndex() {
+    if (REFERENCE_INDEX) return REFERENCE_INDEX;
+    try {
+      const resp = await fetch(REFERENCE_BASE + "index.json", { cache: "no-cache" });
+      if (!resp.ok) {
+        throw new Error("Failed to load country reference index");
+      }
+      REFERENCE_INDEX = await resp.json();
+      return REFERENCE_INDEX;
+    } catch (err) {
+      return { countries: {}, names: {} }; // fallback
+    }
+  }
 
   let COUNTRY_SAFETY = {};
+
+  // processed.json stores each record as [shape, values...]: the shape is
+  // its key list, and repeated values (contact blocks, tips, labels, tags)
+  // are indexes into "tables".
+  function expandProcessed(data) {
+    if (!data || data.format !== 2 || !data.records) return data || {};
+    const tables = data.tables || {};
+    const shapes = data.shapes || [];
+    const out = {};
+    for (const [code, record] of Object.entries(data.records)) {
+      const full = {};
+      shapes[record[0]].forEach((field, i) => {
+        const value = record[i + 1];
+        const table = tables[field];
+        if (!table) full[field] = value;
+        else if (Array.isArray(value)) full[field] = value.map((j) => table[j]);
+        else full[field] = table[value];
+      });
+      out[code] = full;
+    }
+    return out;
+  }
+
   async function loadCountrySafetyJson() {
     try {
-      const resp = await fetch("data/processed.json");
+      const index = await loadReferenceIndex();
+      const resp = await fetch("data/" + (index.safety || "processed.json"));
       if (!resp.ok) {
         throw new Error("Failed to load safety JSON");
       }
-      COUNTRY_SAFETY = await resp.json();
+      COUNTRY_SAFETY = expandProcessed(await resp.json());
     } catch (err) {
       COUNTRY_SAFETY = {}; // fallback
     }
@@ -59,63 +104,82 @@
     el.innerHTML = html;
   }
 
-  // ---------- REST Countries API ----------
+  // ---------- Country reference (static, REST Countries fallback) ----------
   async function fetchCountryFromApi(query) {
-    if (!query) throw new Error("Empty query");
     const trimmed = query.trim();
-    const url =
-      REST_COUNTRIES_BASE +
-      encodeURIComponent(trimmed) +
-      "?fullText=true&fields=name,cca2,region,subregion,capital,population,languages,currencies";
-
-    const fallbackUrl =
-      REST_COUNTRIES_BASE +
-      encodeURIComponent(trimmed) +
-      "?fields=name,cca2,region,subregion,capital,population,languages,currencies";
+    const base = REST_COUNTRIES_BASE + encodeURIComponent(trimmed);
 
     // Try fullText first, then fallback to fuzzy search
-    let res = await fetch(url);
+    let res = await fetch(base + "?fullText=true&fields=" + REST_COUNTRIES_FIELDS);
     if (!res.ok) {
-      res = await fetch(fallbackUrl);
+      res = await fetch(base + "?fields=" + REST_COUNTRIES_FIELDS);
       if (!res.ok) {
         throw new Error("Country not found in REST Countries");
       }
     }
     const data = await res.json();
-    const item = Array.isArray(data) ? data[0] : data;
-
-    return normalizeApiCountry(item);
+    return normalizeApiCountry(Array.isArray(data) ? data[0] : data);
   }
 
+  // Same shape as the baked files (country_reference.frontend_record).
   function normalizeApiCountry(item) {
     if (!item) return null;
-    const nameCommon = item.name && item.name.common ? item.name.common : "";
-    const code = item.cca2 || "";
-    const region = item.region || "";
-    const subregion = item.subregion || "";
-    const capital =
-      Array.isArray(item.capital) && item.capital.length
-        ? item.capital[0]
-        : "N/A";
-
-    const population = item.population || null;
-    const languages = item.languages ? Object.values(item.languages) : [];
-    const currencies = item.currencies
-      ? Object.values(item.currencies).map((c) => c.name)
-      : [];
-
+    const name = item.name || {};
+    const flags = item.flags || {};
     return {
-      code,
-      name: nameCommon,
-      region,
-      subregion,
-      capital,
-      population,
-      languages,
-      currencies,
+      code: (item.cca2 || "").toUpperCase(),
+      name: name.common || "",
+      official_name: name.official || "",
+      region: item.region || "",
+      subregion: item.subregion || "",
+      capital:
+        Array.isArray(item.capital) && item.capital.length
+          ? item.capital[0]
+          : "N/A",
+      population: item.population || null,
+      languages: item.languages ? Object.values(item.languages) : [],
+      currencies: item.currencies
+        ? Object.values(item.currencies).map((c) => c.name)
+        : [],
+      flag: {
+        emoji: item.flag || "",
+        png: flags.png || "",
+        svg: flags.svg || "",
+        alt: flags.alt || "",
+      },
     };
   }
 
+  async function fetchCountryReference(query) {
+    if (!query) throw new Error("Empty query");
+    const index = await loadReferenceIndex();
+    if (!Object.keys(index.countries || {}).length) {
+      return fetchCountryFromApi(query);
+    }
+    const lower = query.trim().toLowerCase();
+
+    // Exact name or code first, then a partial name match
+    let code =
+      index.names[lower] ||
+      (index.countries[lower.toUpperCase()] ? lower.toUpperCase() : null);
+    if (!code) {
+      const hit = Object.entries(index.names).find(([name]) =>
+        name.includes(lower)
+      );
+      code = hit ? hit[1] : null;
+    }
+    const entry = code ? index.countries[code] : null;
+    if (!entry) {
+      throw new Error("Country not found in reference data");
+    }
+
+    const res = await fetch(REFERENCE_BASE + entry.file);
+    if (!res.ok) {
+      throw new Error("Failed to load country reference");
+    }
+    return res.json();
+  }
+
   function formatPopulation(num) {
     if (!num || isNaN(num)) return "N/A";
     if (num >= 1_000_000_000) return (num / 1_000_000_000).toFixed(1) + "B";
@@ -215,11 +279,11 @@
     let usedFallback = false;
 
     try {
-      apiData = await fetchCountryFromApi(query);
+      apiData = await fetchCountryReference(query);
     } catch (err) {
       setText(
         errorEl,
-        "We couldn't get live data for this country. Falling back to demo countries if available."
+        "We couldn't find reference data for this country. Falling back to demo countries if available."
       );
     }
 
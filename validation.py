@@ -0,0 +1,273 @@
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+REPORT_PATH = os.path.join(BASE_DIR, "results", "validation_report.json")
+
+# Mirrors run_full_analysis.RISK_TIER_LABELS.
+RISK_TIERS = ["Safe", "Moderate", "Caution", "High Risk"]
+
+# Column rules per table:
+#   type         str | float | int | iso2 | iso3 | category
+#   required     no nulls / empty strings allowed
+#   min, max     inclusive numeric range
+#   allowed      permitted values (category)
+#   known        ISO codes must appear in the reference code list
+#   min_coverage fraction of non-null values below which a warning is raised
+SCHEMAS = {
+    "homicide": {
+        "key": ["country_wiki"],
+        "min_rows": 50,
+        "columns": {
+            "country_wiki": {"type": "str", "required": True},
+            "homicide_rate": {"type": "float", "min": 0, "max": 200, "min_coverage": 0.9},
+        },
+    },
+    "gpi": {
+        "key": ["country_gpi"],
+        "min_rows": 150,
+        "columns": {
+            "country_gpi": {"type": "str", "required": True},
+            "gpi_score": {"type": "float", "min": 1, "max": 5, "min_coverage": 0.95},
+            "gpi_rank": {"type": "int", "min": 1, "max": 250},
+        },
+    },
+    "advisory": {
+        "key": ["code_2"],
+        "columns": {
+            "code_2": {"type": "iso2", "required": True, "known": True},
+            "advisory_level": {"type": "int", "min": 1, "max": 4, "min_coverage": 1.0},
+        },
+    },
+    "merged": {
+        "key": ["code_2"],
+        "min_rows": 150,
+        "columns": {
+            "code_2": {"type": "iso2", "required": True, "known": True},
+            "code_3": {"type": "iso3"},
+            "country": {"type": "str", "required": True},
+            "population": {"type": "int", "min": 0},
+            "homicide_rate": {"type": "float", "min": 0, "max": 200, "min_coverage": 0.5},
+            "gpi_score": {"type": "float", "min": 1, "max": 5, "min_coverage": 0.5},
+            "advisory_level": {"type": "int", "min": 1, "max": 4},
+        },
+    },
+    "final": {
+        "key": ["code_2"],
+        "min_rows": 150,
+        "columns": {
+            "code_2": {"type": "iso2", "required": True, "known": True},
+            "homicide_norm": {"type": "float", "min": 0, "max": 100, "required": True},
+            "gpi_norm": {"type": "float", "min": 0, "max": 100, "required": True},
+            "advisory_norm": {"type": "float", "min": 0, "max": 100, "required": True},
+            "TSI": {"type": "float", "min": 0, "max": 100, "required": True},
+            "risk_tier": {"type": "category", "allowed": RISK_TIERS, "required": True},
+        },
+    },
+    "places": {
+        "key": ["place_key"],
+        "columns": {
+            "place_key": {"type": "str", "required": True},
+            "country": {"type": "iso2", "required": True, "known": True},
+            "level": {"type": "int", "min": 0, "max": 2, "required": True},
+            "homicide_rate": {"type": "float", "min": 0, "max": 200},
+            "advisory_level": {"type": "int", "min": 1, "max": 4},
+            "TSI": {"type": "float", "min": 0, "max": 100, "required": True},
+            "risk_tier": {"type": "category", "allowed": RISK_TIERS, "required": True},
+        },
+    },
+}
+
+SAMPLE_SIZE = 5
+
+
+def _iso_ok(values: np.ndarray, width: int) -> np.ndarray:
+    """
+    Vectorized ISO-code shape check: exactly `width` ASCII capitals.
+
+    Strings are packed into a fixed-width unicode array and viewed as code
+    points, so the check is a couple of comparisons over an (n, width+1) grid.
+    """
+    packed = np.asarray(values, dtype=f"U{width + 1}")
+    cp = packed.view(np.uint32).reshape(len(packed), width + 1)
+    letters = ((cp[:, :width] >= 65) & (cp[:, :width] <= 90)).all(axis=1)
+    return letters & (cp[:, width] == 0)
+
+
+def _sample(series: pd.Series, mask: np.ndarray):
+    picked = series.iloc[np.flatnonzero(mask)[:SAMPLE_SIZE]]
+    return [None if pd.isna(v) else (v.item() if hasattr(v, "item") else v) for v in picked]
+
+
+def _column_checks(name, series: pd.Series, rule: dict, known_codes):
+    """
+    All rules for one column.
+
+    Numeric columns are converted once and checked with array comparisons.
+    Text-like columns are factorized first, so format / membership checks run
+    over the distinct values only and are broadcast back with a take.
+    """
+    checks = []
+    n = len(series)
+    kind = rule.get("type", "str")
+    if kind in ("float", "int"):
+        empty = series.isna().to_numpy()
+    else:
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        text = np.asarray(uniques.astype(str), dtype=str)
+        blank = np.append(text == "", True)  # trailing slot for the NA sentinel
+        empty = blank[codes]
+    present = ~empty
+
+    def per_value(ok_unique: np.ndarray) -> np.ndarray:
+        """Failing-row mask from a per-distinct-value ok flag."""
+        return present & ~np.append(ok_unique, True)[codes]
+
+    def add(check, failing, severity="error", **detail):
+        count = int(failing.sum())
+        checks.append(
+            {
+                "column": name,
+                "check": check,
+                "status": "pass" if count == 0 else ("fail" if severity == "error" else "warn"),
+                "failing_rows": count,
+                "sample": _sample(series, failing) if count else [],
+                **detail,
+            }
+        )
+
+    if rule.get("required"):
+        add("required", empty)
+
+    stats = {"nulls": int(empty.sum())}
+    if kind in ("float", "int"):
+        num = pd.to_numeric(series, errors="coerce").to_numpy(dtype=float)
+        bad_type = present & np.isnan(num)
+        if kind == "int":
+            bad_type |= present & ~np.isnan(num) & (num != np.floor(num))
+        add("type", bad_type, expected=kind)
+        valid = present & ~bad_type
+        if "min" in rule or "max" in rule:
+            lo = rule.get("min", -np.inf)
+            hi = rule.get("max", np.inf)
+            add("range", valid & ((num < lo) | (num > hi)), min=rule.get("min"), max=rule.get("max"))
+        if valid.any():
+            stats["min"] = float(num[valid].min())
+            stats["max"] = float(num[valid].max())
+    elif kind in ("iso2", "iso3"):
+        width = 2 if kind == "iso2" else 3
+        ok = _iso_ok(text, width)
+        add("iso_format", per_value(ok), expected=kind)
+        if rule.get("known") and known_codes is not None:
+            known = np.isin(text, np.asarray(known_codes, dtype=str))
+            add("iso_known", per_value(known | ~ok))
+    elif kind == "category":
+        add("allowed", per_value(np.isin(text, np.asarray(rule["allowed"], dtype=str))),
+            allowed=list(rule["allowed"]))
+
+    if "min_coverage" in rule:
+        coverage = float(present.mean()) if n else 0.0
+        checks.append(
+            {
+                "column": name,
+                "check": "coverage",
+                "status": "pass" if coverage >= rule["min_coverage"] else "warn",
+                "coverage": round(coverage, 4),
+                "threshold": rule["min_coverage"],
+            }
+        )
+    return checks, stats
+
+
+def validate_table(df: pd.DataFrame, table: str, known_codes=None, schema: dict = None) -> dict:
+    """
+    Validate one pipeline table against its declarative schema.
+
+    Returns a JSON-serializable report: one entry per check with a status
+    (pass / warn / fail), failing row count and a few sample values, plus
+    per-column null counts and numeric bounds.
+    """
+    start = time.perf_counter()
+    schema = schema or SCHEMAS[table]
+    checks = []
+    stats = {}
+
+    if len(df) < schema.get("min_rows", 0):
+        checks.append(
+            {
+                "column": None,
+                "check": "min_rows",
+                "status": "fail",
+                "rows": len(df),
+                "threshold": schema["min_rows"],
+            }
+        )
+
+    for col, rule in schema["columns"].items():
+        if col not in df.columns:
+            checks.append({"column": col, "check": "present", "status": "fail"})
+            continue
+        col_checks, col_stats = _column_checks(col, df[col], rule, known_codes)
+        checks.extend(col_checks)
+        stats[col] = col_stats
+
+    key = [k for k in schema.get("key", []) if k in df.columns]
+    if key:
+        dup = df.duplicated(subset=key, keep=False).to_numpy()
+        sample = df.loc[dup, key].drop_duplicates().head(SAMPLE_SIZE)
+        checks.append(
+            {
+                "column": ",".join(key),
+                "check": "unique",
+                "status": "pass" if not dup.any() else "fail",
+                "failing_rows": int(dup.sum()),
+                "sample": sample.astype(object).where(sample.notna(), None).values.tolist(),
+            }
+        )
+
+    return {
+        "table": table,
+        "rows": int(len(df)),
+        "passed": not any(c["status"] == "fail" for c in checks),
+        "failed": sum(c["status"] == "fail" for c in checks),
+        "warnings": sum(c["status"] == "warn" for c in checks),
+        "checks": checks,
+        "stats": stats,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 3),
+    }
+
+
+def save_report(reports, path: str = None) -> str:
+    path = path or REPORT_PATH
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"passed": all(r["passed"] for r in reports), "tables": reports},
+            f,
+            ensure_ascii=False,
+            indent=2,
+        )
+    return path
+
+
+def print_report(report: dict):
+    status = "✓" if report["passed"] else "✗"
+    print(
+        f"   {status} {report['table']}: {report['rows']} rows, "
+        f"{report['failed']} failed, {report['warnings']} warnings"
+    )
+    for c in report["checks"]:
+        if c["status"] == "pass":
+            continue
+        where = f"{c['column']}." if c["column"] else ""
+        detail = f"{c['failing_rows']} rows" if "failing_rows" in c else ""
+        if c["check"] == "coverage":
+            detail = f"coverage {c['coverage']:.0%} < {c['threshold']:.0%}"
+        elif c["check"] == "min_rows":
+            detail = f"{c['rows']} < {c['threshold']}"
+        print(f"     [{c['status'].upper()}] {where}{c['check']} {detail}".rstrip())
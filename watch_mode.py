@@ -0,0 +1,297 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from aggregate_cube import CUBE_PATH, AggregateCube, cube_rows
+from run_full_analysis import (
+    TIER_FEATURES,
+    TSI_WEIGHTS,
+    advisory_to_score,
+    assign_risk_tiers,
+    match_source_names,
+)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+RESULTS_CSV = os.path.join(BASE_DIR, "results", "TravelSafe_Final_Analysis.csv")
+
+# Watched input -> how to key it and which result columns it feeds.
+SOURCES = {
+    "advisory": {
+        "path": os.path.join(BASE_DIR, "us_advisories_manual.csv"),
+        "join": "code_2",
+        "columns": ["advisory_level"],
+    },
+    "gpi": {
+        "path": os.path.join(BASE_DIR, "gpi_2025_extracted.csv"),
+        "join": "name_norm",
+        "columns": ["gpi_score", "gpi_rank"],
+    },
+    "homicide": {
+        "path": os.path.join(BASE_DIR, "homicide_rates_extracted.csv"),
+        "join": "name_norm",
+        "columns": ["homicide_rate"],
+    },
+}
+
+
+def load_source(name: str, path: str, df_master: pd.DataFrame) -> pd.DataFrame:
+    """Load a watched input keyed the same way run_analysis merges it."""
+    df = pd.read_csv(path, keep_default_na=False, na_values=[""])
+    if name == "advisory":
+        df = df.rename(columns={"country_code": "code_2"})
+        df["code_2"] = df["code_2"].astype(str).str.upper()
+    elif name == "gpi":
+        df["name_norm"] = match_source_names(df["country_gpi"], df_master, "gpi")
+    elif name == "homicide":
+        df["name_norm"] = match_source_names(df["country_wiki"], df_master, "homicide")
+    key = SOURCES[name]["join"]
+    cols = SOURCES[name]["columns"]
+    df = df.drop_duplicates(subset=[key]).set_index(key)
+    return df[cols].apply(pd.to_numeric, errors="coerce")
+
+
+def diff_source(old: pd.DataFrame, new: pd.DataFrame):
+    """Keys whose values were added, removed or changed between two loads."""
+    keys = old.index.union(new.index)
+    a = old.reindex(keys)
+    b = new.reindex(keys)
+    same = (a == b) | (a.isna() & b.isna())
+    return list(keys[~same.all(axis=1).to_numpy()])
+
+
+class ComponentScale:
+    """
+    Median imputation + min-max bounds for one TSI component, maintained
+    incrementally.
+
+    Mirrors compute_tsi(): values are median-filled, optionally log1p'd and
+    scaled to 0–100 (inverted so higher = safer).
+    """
+
+    def __init__(self, raw_col: str, filled_col: str, norm_col: str, log: bool):
+        self.raw_col = raw_col
+        self.filled_col = filled_col
+        self.norm_col = norm_col
+        self.log = log
+        self.median = np.nan
+        self.lo = np.nan
+        self.hi = np.nan
+
+    def _filled(self, raw: np.ndarray) -> np.ndarray:
+        filled = np.where(np.isnan(raw), self.median, raw)
+        return np.log1p(filled) if self.log else filled
+
+    def fit(self, df: pd.DataFrame):
+        raw = df[self.raw_col].to_numpy(dtype=float)
+        self.median = float(np.nanmedian(raw)) if (~np.isnan(raw)).any() else np.nan
+        filled = self._filled(raw)
+        self.lo = float(np.nanmin(filled))
+        self.hi = float(np.nanmax(filled))
+
+    def transform(self, df: pd.DataFrame, rows: np.ndarray):
+        raw = df[self.raw_col].to_numpy(dtype=float)[rows]
+        filled = self._filled(raw)
+        span = self.hi - self.lo
+        scaled = (filled - self.lo) / span * 100 if span else np.zeros_like(filled)
+        df.loc[df.index[rows], self.filled_col] = filled
+        df.loc[df.index[rows], self.norm_col] = 100 - scaled
+
+    def update(self, df: pd.DataFrame, rows: np.ndarray, old_filled: np.ndarray):
+        """
+        Refresh stats after `rows` changed. Returns (extra_rows, rescale):
+        rows whose imputed value moved with the median, and whether the global
+        min/max moved so every row needs rescaling.
+        """
+        raw = df[self.raw_col].to_numpy(dtype=float)
+        old_median = self.median
+        self.median = float(np.nanmedian(raw)) if (~np.isnan(raw)).any() else np.nan
+
+        extra = np.array([], dtype=int)
+        if not (old_median == self.median or (np.isnan(old_median) and np.isnan(self.median))):
+            extra = np.flatnonzero(np.isnan(raw))
+
+        touched = np.union1d(rows, extra)
+        new_filled = self._filled(raw[touched])
+        lo, hi = self.lo, self.hi
+        # A row that used to sit on a boundary may have moved inward, in which
+        # case the bound can only be found again with a full column scan.
+        if np.isin(old_filled, [lo, hi]).any() or len(extra):
+            filled = self._filled(raw)
+            lo, hi = float(np.nanmin(filled)), float(np.nanmax(filled))
+        elif len(new_filled):
+            lo = min(lo, float(np.nanmin(new_filled)))
+            hi = max(hi, float(np.nanmax(new_filled)))
+
+        rescale = (lo, hi) != (self.lo, self.hi)
+        self.lo, self.hi = lo, hi
+        return extra, rescale
+
+
+class WatchSession:
+    """
+    Long-running incremental re-scorer over the results CSV.
+
+    Each poll reloads only inputs whose mtime changed, diffs them against the
+    previous load and recomputes advisory_norm / TSI / tier for the affected
+    countries. A full rescale (and KMeans refit) happens only when a global
+    min/max actually moves.
+    """
+
+    def __init__(self, results_csv: str = None, sources: dict = None, cube_path: str = None):
+        self.results_csv = results_csv or RESULTS_CSV
+        self.cube_path = cube_path if cube_path is not None else CUBE_PATH
+        self.sources = {name: dict(spec) for name, spec in SOURCES.items()}
+        for name, path in (sources or {}).items():
+            self.sources[name]["path"] = path
+
+        self.df = pd.read_csv(self.results_csv, keep_default_na=False, na_values=[""])
+        self.scales = {
+            "homicide": ComponentScale("homicide_rate", "homicide_log", "homicide_norm", log=True),
+            "gpi": ComponentScale("gpi_score", "gpi_filled", "gpi_norm", log=False),
+        }
+        for scale in self.scales.values():
+            scale.fit(self.df)
+        self._fit_centroids()
+
+        self.snapshots = {}
+        self.mtimes = {}
+        for name, spec in self.sources.items():
+            if os.path.exists(spec["path"]):
+                self.snapshots[name] = load_source(name, spec["path"], self.df)
+                self.mtimes[name] = os.path.getmtime(spec["path"])
+
+    def _fit_centroids(self):
+        X = self.df[TIER_FEATURES].fillna(50)
+        self.centroids = X.groupby(self.df["cluster"]).mean()
+        tiers = self.df.groupby("cluster")["risk_tier"].first()
+        self.cluster_tier = tiers.to_dict()
+
+    def _assign_nearest(self, rows: np.ndarray):
+        X = self.df.loc[self.df.index[rows], TIER_FEATURES].fillna(50).to_numpy(dtype=float)
+        C = self.centroids.to_numpy(dtype=float)
+        nearest = ((X[:, None, :] - C[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+        clusters = self.centroids.index.to_numpy()[nearest]
+        self.df.loc[self.df.index[rows], "cluster"] = clusters
+        self.df.loc[self.df.index[rows], "risk_tier"] = [self.cluster_tier[c] for c in clusters]
+
+    def apply_changes(self, name: str, new: pd.DataFrame) -> dict:
+        """Apply a freshly loaded source and re-score the affected countries."""
+        start = time.perf_counter()
+        old = self.snapshots.get(name, new.iloc[0:0])
+        changed_keys = diff_source(old, new)
+        self.snapshots[name] = new
+        if not changed_keys:
+            return {"source": name, "changed_keys": 0, "rows": 0, "rescaled": False}
+
+        spec = self.sources[name]
+        join = self.df[spec["join"]]
+        rows = np.flatnonzero(join.isin(changed_keys).to_numpy())
+        values = new.reindex(join.iloc[rows].to_numpy())
+        old_filled = {}
+        for comp, scale in self.scales.items():
+            old_filled[comp] = self.df[scale.filled_col].to_numpy(dtype=float)[rows]
+        for col in spec["columns"]:
+            self.df.loc[self.df.index[rows], col] = values[col].to_numpy()
+
+        rescaled = False
+        affected = rows
+        if name in self.scales:
+            scale = self.scales[name]
+            extra, rescale = scale.update(self.df, rows, old_filled[name])
+            affected = np.union1d(rows, extra)
+            if rescale:
+                rescaled = True
+                affected = np.arange(len(self.df))
+            scale.transform(self.df, affected)
+        else:
+            levels = self.df["advisory_level"].iloc[affected]
+            self.df.loc[self.df.index[affected], "advisory_norm"] = levels.apply(advisory_to_score).to_numpy()
+
+        idx = self.df.index[affected]
+        self.df.loc[idx, "TSI"] = sum(w * self.df.loc[idx, col] for col, w in TSI_WEIGHTS.items())
+
+        if rescaled:
+            self.df = assign_risk_tiers(self.df)
+            self._fit_centroids()
+        else:
+            self._assign_nearest(affected)
+
+        return {
+            "source": name,
+            "changed_keys": len(changed_keys),
+            "rows": int(len(affected)),
+            "codes": self.df["code_2"].iloc[affected].tolist() if not rescaled else None,
+            "rescaled": rescaled,
+            "elapsed_ms": (time.perf_counter() - start) * 1000,
+        }
+
+    def save(self, codes=None):
+        self.df.to_csv(self.results_csv, index=False)
+        if self.cube_path and os.path.exists(self.cube_path):
+            cube = AggregateCube.load(self.cube_path)
+            safety = {
+                code: {"overall_risk": cube.rows.at[code, "overall_risk"]}
+                for code in cube.rows.index
+            }
+            if codes is None:
+                cube = AggregateCube.build(self.df, safety)
+            else:
+                changed = self.df[self.df["code_2"].isin(codes)]
+                cube.update(cube_rows(changed, safety))
+            cube.save(self.cube_path)
+
+    def poll(self):
+        """Check every watched input once; returns one report per changed source."""
+        reports = []
+        for name, spec in self.sources.items():
+            path = spec["path"]
+            if not os.path.exists(path):
+                continue
+            mtime = os.path.getmtime(path)
+            if self.mtimes.get(name) == mtime:
+                continue
+            self.mtimes[name] = mtime
+            try:
+                new = load_source(name, path, self.df)
+            except Exception as e:
+                print(f"[WARN] Could not reload {name} ({path}): {e}")
+                continue
+            report = self.apply_changes(name, new)
+            if report["changed_keys"]:
+                self.save(report["codes"])
+            reports.append(report)
+        return reports
+
+    def run(self, interval: float = 2.0):
+        print(f"Watching {', '.join(s['path'] for s in self.sources.values())}")
+        try:
+            while True:
+                for r in self.poll():
+                    if not r["changed_keys"]:
+                        continue
+                    mode = "full rescale" if r["rescaled"] else ", ".join(r["codes"])
+                    print(
+                        f"✓ {r['source']}: {r['changed_keys']} changed -> {mode} "
+                        f"({r['elapsed_ms']:.1f} ms)"
+                    )
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            print("Stopped watching.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Re-score only the countries whose advisory/GPI/homicide inputs change."
+    )
+    parser.add_argument("--interval", type=float, default=2.0, help="Poll interval in seconds")
+    parser.add_argument("--results", default=RESULTS_CSV)
+    args = parser.parse_args(argv)
+    WatchSession(results_csv=args.results).run(interval=args.interval)
+
+
+if __name__ == "__main__":
+    main()